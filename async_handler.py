@@ -15,7 +15,10 @@ import time
 
 import config
 from retry_handler import calculate_backoff_time, is_retryable_error
-from cache_manager import cache_api_response
+from cache_manager import async_cache_api_response, CacheKeySpec
+from async_perplexity_client import perplexity_transport
+from async_runtime import runtime
+from http_instrumentation import aiohttp_trace_config
 
 
 # ========================================================================
@@ -33,6 +36,10 @@ DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=30)
 API_TIMEOUT = aiohttp.ClientTimeout(total=60)
 IMAGE_TIMEOUT = aiohttp.ClientTimeout(total=120)
 
+# Параметры генерации изображений (входят в ключ кеша изображений)
+IMAGE_SIZE = "1536x1024"
+IMAGE_QUALITY = "medium"
+
 
 # ========================================================================
 # АСИНХРОННЫЕ HTTP КЛИЕНТЫ
@@ -66,7 +73,8 @@ class AsyncHTTPClient:
             )
             self.session = aiohttp.ClientSession(
                 connector=self.connector,
-                timeout=DEFAULT_TIMEOUT
+                timeout=DEFAULT_TIMEOUT,
+                trace_configs=[aiohttp_trace_config()]
             )
     
     async def close(self):
@@ -155,34 +163,66 @@ class AsyncHTTPClient:
 # АСИНХРОННЫЕ ОПЕРАЦИИ С API
 # ========================================================================
 
+_shared_http_client: Optional[AsyncHTTPClient] = None
+
+
+async def shared_http_client() -> AsyncHTTPClient:
+    """
+    Общий HTTP клиент для loop runtime
+    
+    Сессия открывается один раз на процесс и закрывается при остановке runtime.
+    
+    Returns:
+        AsyncHTTPClient с открытой сессией
+    """
+    global _shared_http_client
+    if _shared_http_client is None:
+        _shared_http_client = AsyncHTTPClient()
+        runtime.on_shutdown(_shared_http_client.close)
+    await _shared_http_client.start()
+    return _shared_http_client
+
+
 class AsyncAPIOperations:
     """Класс для асинхронных операций с различными API"""
     
-    def __init__(self):
-        self.http_client = AsyncHTTPClient()
+    def __init__(self, http_client: Optional[AsyncHTTPClient] = None):
+        self.http_client = http_client
+        self._owns_client = False
     
     async def __aenter__(self):
+        if self.http_client is None:
+            if runtime.in_runtime_thread():
+                # В loop runtime пользуемся общей сессией, а не открываем новую на задачу
+                self.http_client = await shared_http_client()
+            else:
+                self.http_client = AsyncHTTPClient()
+                self._owns_client = True
         await self.http_client.start()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.http_client.close()
+        if self._owns_client:
+            await self.http_client.close()
+            self.http_client = None
+            self._owns_client = False
     
+    @async_cache_api_response(
+        key_spec=CacheKeySpec(fingerprint=lambda self, prompt: config.PERPLEXITY_MODEL)
+    )
     async def fetch_perplexity_news(self, prompt: str) -> Optional[Dict]:
         """
         Асинхронно получает новости от Perplexity API
         
+        Использует общий пул соединений perplexity_transport. Ответы
+        кешируются так же, как у синхронного сбора (cache_api_response).
+        
         Args:
             prompt: Промпт для генерации
             
         Returns:
             Dict с ответом или None при ошибке
         """
-        headers = {
-            "Authorization": f"Bearer {config.PERPLEXITY_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": config.PERPLEXITY_MODEL,
             "messages": [{"role": "user", "content": prompt}],
@@ -191,14 +231,7 @@ class AsyncAPIOperations:
         }
         
         try:
-            result = await self.http_client.request_with_retry(
-                method="POST",
-                url=config.PERPLEXITY_API_URL,
-                headers=headers,
-                json_data=payload,
-                timeout=API_TIMEOUT
-            )
-            return result.get('data')
+            return await perplexity_transport.chat_completion(payload, timeout=API_TIMEOUT.total)
         except Exception as e:
             logger.error(f"Ошибка при запросе к Perplexity: {e}")
             return None
@@ -207,6 +240,9 @@ class AsyncAPIOperations:
         """
         Асинхронно генерирует изображение через OpenAI
         
+        Результат не кешируется здесь: готовые изображения кеширует коллектор
+        в ImageCache (content.image_cache).
+        
         Args:
             prompt: Промпт для генерации
             
@@ -221,8 +257,8 @@ class AsyncAPIOperations:
         payload = {
             "model": config.OPENAI_IMAGE_MODEL,
             "prompt": prompt,
-            "size": "1536x1024",
-            "quality": "medium",
+            "size": IMAGE_SIZE,
+            "quality": IMAGE_QUALITY,
             "n": 1
         }
         
@@ -477,21 +513,16 @@ def run_async(coro: Coroutine) -> Any:
     """
     Запускает асинхронную функцию из синхронного контекста
     
+    Корутина выполняется в общем event loop процесса (async_runtime): loop,
+    пул потоков и HTTP сессии не создаются заново на каждый вызов.
+    
     Args:
         coro: Корутина для выполнения
         
     Returns:
         Результат выполнения
     """
-    try:
-        # Пробуем получить текущий event loop
-        loop = asyncio.get_running_loop()
-        # Если loop уже запущен, используем thread executor
-        processor = ParallelProcessor()
-        return processor.run_async_in_thread(coro)
-    except RuntimeError:
-        # Если нет запущенного loop, создаем новый
-        return asyncio.run(coro)
+    return runtime.run(coro)
 
 
 async def measure_async_performance(
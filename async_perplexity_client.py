@@ -0,0 +1,372 @@
+"""
+Асинхронный транспорт Perplexity API для NEWSMAKER
+
+Один долгоживущий пул соединений aiohttp (keep-alive, кеш DNS) на весь
+процесс. Сессия живёт в общем event loop процесса (async_runtime), поэтому
+ей одинаково пользуются синхронный код (NewsCollector, legacy scheduler,
+PerplexityRetryHandler) и корутины из любого другого event loop.
+
+Ошибки транспорта приводятся к исключениям requests, чтобы существующие
+retry-декораторы и обработчики ошибок работали без изменений.
+"""
+
+import asyncio
+import json
+import queue
+from typing import Any, Dict, Iterator, Optional
+
+import aiohttp
+import requests
+from loguru import logger
+
+import config
+from async_runtime import runtime
+from http_instrumentation import aiohttp_trace_config
+
+
+# ========================================================================
+# НАСТРОЙКИ ПУЛА СОЕДИНЕНИЙ
+# ========================================================================
+
+# Максимум одновременных соединений с Perplexity
+PERPLEXITY_POOL_SIZE = 4
+
+# Сколько секунд держать простаивающее соединение открытым
+KEEPALIVE_TIMEOUT = 120
+
+# Время жизни записей кеша DNS в секундах
+DNS_CACHE_TTL = 300
+
+# Ожидание ответа на синхронный вызов сверх таймаута запроса
+SYNC_WAIT_MARGIN = 5
+
+_STREAM_END = object()
+
+
+# ========================================================================
+# ОТВЕТ ТРАНСПОРТА
+# ========================================================================
+
+class TransportResponse:
+    """Ответ пула соединений с интерфейсом, совместимым с requests.Response"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], url: str,
+                 content: bytes = b'', lines: Optional[queue.Queue] = None,
+                 future=None):
+        """
+        Args:
+            status_code: HTTP статус
+            headers: Заголовки ответа
+            url: URL запроса
+            content: Тело ответа (для обычных запросов)
+            lines: Очередь строк тела (для потоковых запросов)
+            future: Фоновая задача чтения потока
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.url = url
+        self.content = content
+        self._lines = lines
+        self._future = future
+
+    @property
+    def text(self) -> str:
+        """Тело ответа как строка"""
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        """Разбирает тело ответа как JSON"""
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        """Бросает requests.HTTPError для статусов 4xx/5xx"""
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error for url: {self.url}: {self.text[:200]}",
+                response=self
+            )
+
+    def iter_lines(self) -> Iterator[bytes]:
+        """
+        Отдаёт строки тела ответа по мере их поступления
+
+        Yields:
+            bytes: Строка без завершающего перевода строки
+        """
+        if self._lines is None:
+            yield from self.content.splitlines()
+            return
+
+        while True:
+            item = self._lines.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, BaseException):
+                raise _to_requests_error(item)
+            yield item
+
+    def close(self):
+        """Прекращает чтение потока (соединение вернётся в пул или закроется)"""
+        if self._future is not None and not self._future.done():
+            self._future.cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _to_requests_error(error: BaseException) -> Exception:
+    """
+    Приводит ошибку aiohttp/asyncio к исключению requests
+
+    Args:
+        error: Исходное исключение
+
+    Returns:
+        Exception: Эквивалентное исключение requests (или исходное)
+    """
+    if isinstance(error, requests.RequestException):
+        return error
+    if isinstance(error, asyncio.TimeoutError):
+        return requests.exceptions.Timeout(str(error) or "Превышен таймаут запроса")
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return requests.exceptions.ConnectionError(str(error))
+    if isinstance(error, aiohttp.ClientError):
+        return requests.exceptions.RequestException(str(error))
+    return error
+
+
+# ========================================================================
+# КЛИЕНТ
+# ========================================================================
+
+class AsyncPerplexityClient:
+    """Асинхронный клиент Perplexity API на долгоживущем пуле соединений"""
+
+    def __init__(self, api_url: Optional[str] = None, api_key: Optional[str] = None,
+                 pool_size: int = PERPLEXITY_POOL_SIZE):
+        """
+        Инициализация клиента (сессия создаётся при первом запросе)
+
+        Args:
+            api_url: URL Chat Completions API (по умолчанию из config)
+            api_key: API ключ (по умолчанию из config)
+            pool_size: Максимум одновременных соединений
+        """
+        self.api_url = api_url or config.PERPLEXITY_API_URL
+        self.api_key = api_key or config.PERPLEXITY_API_KEY
+        self.pool_size = pool_size
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        runtime.on_shutdown(self._close_session)
+
+    @property
+    def default_headers(self) -> Dict[str, str]:
+        """Заголовки авторизации по умолчанию"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    # --------------------------------------------------------------------
+    # Сессия в общем event loop
+    # --------------------------------------------------------------------
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает общую сессию (создаётся в loop runtime)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                trace_configs=[aiohttp_trace_config('perplexity')]
+            )
+            logger.debug("🔌 Открыт пул соединений Perplexity")
+        return self._session
+
+    async def _close_session(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.debug("🔌 Пул соединений Perplexity закрыт")
+        self._session = None
+
+    def _submit(self, coro):
+        """Планирует корутину в loop runtime и возвращает concurrent Future"""
+        if runtime.in_runtime_thread():
+            # Синхронное ожидание в самом loop runtime никогда не завершится
+            coro.close()
+            raise RuntimeError("Синхронный вызов Perplexity из loop runtime - используйте await post()")
+        return runtime.submit(coro)
+
+    # --------------------------------------------------------------------
+    # Запросы (выполняются в loop пула)
+    # --------------------------------------------------------------------
+
+    async def _post(self, url: str, headers: Dict, payload: Dict,
+                    timeout: float) -> TransportResponse:
+        """Обычный POST запрос с чтением всего тела"""
+        session = await self._get_session()
+        async with session.post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            content = await response.read()
+            return TransportResponse(response.status, dict(response.headers), url, content)
+
+    async def _stream(self, url: str, headers: Dict, payload: Dict, timeout: float,
+                      lines: queue.Queue):
+        """
+        POST запрос с построчной передачей тела в очередь
+
+        Первым элементом очереди идёт кортеж (status, headers, body), где
+        body заполнен только для ошибочных статусов.
+        """
+        try:
+            session = await self._get_session()
+            async with session.post(
+                url,
+                headers=headers,
+                json=payload,
+                # Deep Research отвечает долго: ограничиваем паузу между чанками, а не весь ответ
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+            ) as response:
+                body = await response.read() if response.status >= 400 else b''
+                lines.put((response.status, dict(response.headers), body))
+
+                if response.status < 400:
+                    async for line in response.content:
+                        lines.put(line.rstrip(b'\r\n'))
+        except Exception as e:
+            # До статуса ошибка получит _stream_sync, после - iter_lines()
+            lines.put(e)
+        finally:
+            lines.put(_STREAM_END)
+
+    # --------------------------------------------------------------------
+    # Публичный API
+    # --------------------------------------------------------------------
+
+    async def post(self, payload: Dict, timeout: Optional[float] = None,
+                   url: Optional[str] = None, headers: Optional[Dict] = None) -> TransportResponse:
+        """
+        Асинхронный POST в Perplexity API через общий пул
+
+        Args:
+            payload: Тело запроса
+            timeout: Таймаут запроса в секундах
+            url: URL (по умолчанию Chat Completions)
+            headers: Заголовки (по умолчанию авторизация из config)
+
+        Returns:
+            TransportResponse: Ответ API
+        """
+        try:
+            return await runtime.call(self._post(
+                url or self.api_url,
+                headers or self.default_headers,
+                payload,
+                timeout or config.REQUEST_TIMEOUT
+            ))
+        except Exception as e:
+            raise _to_requests_error(e) from e
+
+    async def chat_completion(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """
+        Выполняет запрос Chat Completions и возвращает разобранный JSON
+
+        Args:
+            payload: Тело запроса
+            timeout: Таймаут запроса в секундах
+
+        Returns:
+            Dict: Ответ API
+        """
+        response = await self.post(payload, timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def post_sync(self, payload: Dict, timeout: Optional[float] = None,
+                  url: Optional[str] = None, headers: Optional[Dict] = None,
+                  stream: bool = False) -> TransportResponse:
+        """
+        Синхронный POST через общий пул
+
+        Args:
+            payload: Тело запроса
+            timeout: Таймаут запроса в секундах
+            url: URL (по умолчанию Chat Completions)
+            headers: Заголовки (по умолчанию авторизация из config)
+            stream: Отдавать тело построчно через iter_lines() по мере поступления
+
+        Returns:
+            TransportResponse: Ответ API
+        """
+        url = url or self.api_url
+        headers = headers or self.default_headers
+        timeout = timeout or config.REQUEST_TIMEOUT
+
+        if stream:
+            return self._stream_sync(url, headers, payload, timeout)
+
+        future = self._submit(self._post(url, headers, payload, timeout))
+        try:
+            return future.result(timeout=timeout + SYNC_WAIT_MARGIN)
+        except Exception as e:
+            future.cancel()
+            raise _to_requests_error(e) from e
+
+    def _stream_sync(self, url: str, headers: Dict, payload: Dict,
+                     timeout: float) -> TransportResponse:
+        """Запускает потоковый запрос и ждёт статус ответа"""
+        lines = queue.Queue()
+        future = self._submit(self._stream(url, headers, payload, timeout, lines))
+
+        try:
+            head = lines.get(timeout=timeout + SYNC_WAIT_MARGIN)
+        except queue.Empty:
+            future.cancel()
+            raise requests.exceptions.Timeout("Превышен таймаут ожидания ответа Perplexity")
+
+        if isinstance(head, BaseException):
+            raise _to_requests_error(head) from head
+
+        status, response_headers, body = head
+        if status >= 400:
+            return TransportResponse(status, response_headers, url, body)
+        return TransportResponse(status, response_headers, url, lines=lines, future=future)
+
+    def chat_completion_sync(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """
+        Синхронный запрос Chat Completions
+
+        Args:
+            payload: Тело запроса
+            timeout: Таймаут запроса в секундах
+
+        Returns:
+            Dict: Ответ API
+        """
+        response = self.post_sync(payload, timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        """Закрывает сессию (event loop runtime продолжает работать)"""
+        if not runtime.is_running:
+            return
+        try:
+            runtime.run(self._close_session(), timeout=SYNC_WAIT_MARGIN)
+        except Exception as e:
+            logger.debug(f"Ошибка при закрытии сессии Perplexity: {e}")
+
+
+# Глобальный экземпляр: один пул соединений на процесс
+perplexity_transport = AsyncPerplexityClient()
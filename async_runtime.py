@@ -0,0 +1,156 @@
+"""
+Общий asyncio runtime процесса NEWSMAKER
+
+Один долгоживущий event loop в фоновом потоке вместо asyncio.run() и
+нового loop на каждую задачу. На нем работают корутины сбора, генерации
+изображений и публикации, поэтому пул соединений Perplexity, общая
+aiohttp сессия, бот Telegram и пул потоков asyncio.to_thread создаются
+один раз на процесс.
+
+Синхронный код (задачи планировщика) запускает корутины через
+runtime.run(), корутины из другого event loop - через runtime.call().
+Контекст вызывающего (текущий span трассировки) переносится в задачу.
+"""
+
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Coroutine, List, Optional
+from loguru import logger
+
+
+RUNTIME_THREAD_NAME = "newsmaker-runtime"
+
+# Ожидание закрытия ресурсов при остановке, сек
+SHUTDOWN_TIMEOUT = 10
+
+
+class AsyncRuntime:
+    """Долгоживущий event loop в фоновом потоке"""
+
+    def __init__(self, name: str = RUNTIME_THREAD_NAME):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._shutdown_callbacks: List[Callable[[], Awaitable[None]]] = []
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop runtime (запускается при первом обращении)"""
+        return self.start()
+
+    @property
+    def is_running(self) -> bool:
+        return self._loop is not None and not self._loop.is_closed()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Запускает фоновый поток с event loop (один раз)"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                logger.debug("🔁 Запущен общий asyncio runtime")
+        return self._loop
+
+    def in_runtime_thread(self) -> bool:
+        """Выполняется ли код в потоке runtime"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Планирует корутину в runtime и сразу возвращает concurrent Future
+
+        Args:
+            coro: Корутина
+
+        Returns:
+            concurrent.futures.Future с результатом
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Выполняет корутину в runtime и ждет результат (из синхронного кода)
+
+        Args:
+            coro: Корутина
+            timeout: Максимальное ожидание в секундах
+
+        Returns:
+            Результат корутины
+
+        Raises:
+            RuntimeError: При вызове из самого runtime (ожидание заблокировало бы loop)
+        """
+        if self.in_runtime_thread():
+            coro.close()
+            raise RuntimeError("runtime.run() вызван из потока runtime - используйте await")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def call(self, coro: Coroutine) -> Any:
+        """
+        Выполняет корутину в runtime из любого event loop
+
+        Если вызывающий уже работает в runtime, корутина просто ожидается.
+        """
+        loop = self.start()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def on_shutdown(self, callback: Callable[[], Awaitable[None]]):
+        """
+        Регистрирует корутинную функцию закрытия ресурса (сессии, бота)
+
+        Вызывается в loop runtime при shutdown() в обратном порядке регистрации.
+        """
+        self._shutdown_callbacks.append(callback)
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Закрывает зарегистрированные ресурсы и останавливает event loop"""
+        with self._lock:
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                return
+
+            async def close_resources():
+                for callback in reversed(self._shutdown_callbacks):
+                    try:
+                        await callback()
+                    except Exception as e:
+                        logger.debug(f"Ошибка при закрытии ресурса runtime: {e}")
+                await loop.shutdown_default_executor()
+
+            if not self.in_runtime_thread():
+                try:
+                    asyncio.run_coroutine_threadsafe(close_resources(), loop).result(timeout=timeout)
+                except Exception as e:
+                    logger.debug(f"Ошибка при остановке runtime: {e}")
+
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None and not self.in_runtime_thread():
+                self._thread.join(timeout=timeout)
+                if not self._thread.is_alive():
+                    loop.close()
+            self._loop = None
+            self._thread = None
+            logger.debug("🔁 Общий asyncio runtime остановлен")
+
+
+# Глобальный runtime: один event loop на процесс
+runtime = AsyncRuntime()
+atexit.register(runtime.shutdown)
@@ -0,0 +1,278 @@
+"""
+Кодеки файлового кеша для NEWSMAKER
+
+Компактный формат записей FileCache вместо JSON с отступами и pickle:
+8-байтовый заголовок (сигнатура, версия формата, кодек, сжатие), затем
+данные. Кодек выбирается по типу значения: bytes и str пишутся как есть,
+JSON-совместимые структуры - через orjson или msgpack (если установлены),
+остальное - pickle. Крупные записи сжимаются zstd (или zlib без zstandard)
+и читаются через mmap без промежуточной копии файла.
+"""
+
+import json
+import mmap
+import pickle
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MAGIC = b'NMC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>3sBBBxx')  # сигнатура, версия, кодек, сжатие
+HEADER_SIZE = HEADER.size
+
+# Записи меньше этого размера не сжимаются
+COMPRESS_MIN_BYTES = 4096
+# Сжатие сохраняется, только если экономит хотя бы 10%
+COMPRESS_MIN_RATIO = 0.9
+# Объём пробы для оценки сжимаемости крупных записей
+COMPRESS_PROBE_BYTES = 64 * 1024
+# Файлы больше этого размера читаются через mmap
+MMAP_MIN_BYTES = 64 * 1024
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class Codec(NamedTuple):
+    """Способ сериализации значения"""
+    codec_id: int
+    name: str
+    encode: Callable[[Any], bytes]
+    decode: Callable[[Buffer], Any]
+
+
+class CacheCodecError(ValueError):
+    """Запись кеша не в формате кодека или повреждена"""
+
+
+def _json_encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _json_decode(data: Buffer) -> Any:
+    # json.loads не принимает memoryview; str() декодирует прямо из буфера
+    # (в том числе из mmap) без промежуточной копии в bytes
+    return json.loads(str(data, 'utf-8'))
+
+
+def _orjson_encode(value: Any) -> bytes:
+    return orjson.dumps(value)
+
+
+def _msgpack_encode(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _msgpack_decode(data: Buffer) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+CODEC_RAW = Codec(1, 'raw', bytes, bytes)
+CODEC_TEXT = Codec(2, 'text', lambda value: value.encode('utf-8'), lambda data: str(data, 'utf-8'))
+CODEC_JSON = Codec(3, 'json', _json_encode, _json_decode)
+CODEC_ORJSON = Codec(4, 'orjson', _orjson_encode, lambda data: orjson.loads(data))
+CODEC_MSGPACK = Codec(5, 'msgpack', _msgpack_encode, _msgpack_decode)
+CODEC_PICKLE = Codec(6, 'pickle', lambda value: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads)
+
+# Зарегистрированные кодеки по идентификатору из заголовка
+CODECS: Dict[int, Codec] = {
+    codec.codec_id: codec
+    for codec in (CODEC_RAW, CODEC_TEXT, CODEC_JSON, CODEC_ORJSON, CODEC_MSGPACK, CODEC_PICKLE)
+}
+
+
+def register_codec(codec: Codec):
+    """
+    Регистрирует дополнительный кодек
+
+    Args:
+        codec: Кодек с уникальным codec_id
+    """
+    if codec.codec_id in CODECS and CODECS[codec.codec_id] != codec:
+        raise ValueError(f"Кодек с id {codec.codec_id} уже зарегистрирован: {CODECS[codec.codec_id].name}")
+    CODECS[codec.codec_id] = codec
+
+
+def structured_codecs():
+    """Кодеки для JSON-совместимых структур в порядке предпочтения"""
+    if orjson is not None:
+        yield CODEC_ORJSON
+    if msgpack is not None:
+        yield CODEC_MSGPACK
+    yield CODEC_JSON
+
+
+def _compress(payload: bytes):
+    """Сжимает данные, если это выгодно. Возвращает (данные, метод сжатия)"""
+    if len(payload) < COMPRESS_MIN_BYTES:
+        return payload, COMPRESSION_NONE
+
+    if zstandard is not None:
+        compress, method = zstandard.ZstdCompressor(level=3).compress, COMPRESSION_ZSTD
+    else:
+        compress, method = lambda data: zlib.compress(data, 1), COMPRESSION_ZLIB
+
+    # Уже сжатые данные (PNG, WebP) не пытаемся сжимать целиком: хватает пробы начала
+    if len(payload) > COMPRESS_PROBE_BYTES:
+        probe = payload[:COMPRESS_PROBE_BYTES]
+        if len(compress(probe)) > len(probe) * COMPRESS_MIN_RATIO:
+            return payload, COMPRESSION_NONE
+
+    compressed = compress(payload)
+
+    if len(compressed) <= len(payload) * COMPRESS_MIN_RATIO:
+        return compressed, method
+    return payload, COMPRESSION_NONE
+
+
+def _decompress(data: Buffer, method: int) -> Buffer:
+    if method == COMPRESSION_NONE:
+        return data
+    if method == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise CacheCodecError("Запись сжата zstd, а zstandard не установлен")
+        try:
+            return zstandard.ZstdDecompressor().decompress(data)
+        except zstandard.ZstdError as e:
+            raise CacheCodecError(f"Повреждённые данные zstd: {e}") from None
+    if method == COMPRESSION_ZLIB:
+        try:
+            return zlib.decompress(data)
+        except zlib.error as e:
+            raise CacheCodecError(f"Повреждённые данные zlib: {e}") from None
+    raise CacheCodecError(f"Неизвестный метод сжатия: {method}")
+
+
+def encode(value: Any) -> bytes:
+    """
+    Сериализует значение в запись кеша
+
+    Args:
+        value: Значение для кеша
+
+    Returns:
+        bytes: Заголовок + данные
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        candidates = [CODEC_RAW]
+    elif isinstance(value, str):
+        candidates = [CODEC_TEXT]
+    elif isinstance(value, (dict, list, int, float, bool, type(None))):
+        candidates = list(structured_codecs())
+    else:
+        candidates = []
+    candidates.append(CODEC_PICKLE)
+
+    for codec in candidates:
+        try:
+            payload = codec.encode(value)
+            break
+        except (TypeError, ValueError, OverflowError):
+            # Например, orjson не принимает нестроковые ключи словаря
+            continue
+
+    payload, compression = _compress(payload)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, codec.codec_id, compression) + payload
+
+
+def decode(data: Buffer) -> Any:
+    """
+    Восстанавливает значение из записи кеша
+
+    Args:
+        data: Содержимое файла (bytes, memoryview или mmap)
+
+    Returns:
+        Any: Значение
+
+    Raises:
+        CacheCodecError: Если запись не в формате кодека или повреждена
+    """
+    view = memoryview(data)
+    if len(view) < HEADER_SIZE:
+        raise CacheCodecError("Запись короче заголовка")
+
+    magic, version, codec_id, compression = HEADER.unpack_from(view)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise CacheCodecError("Запись не в формате кодека кеша")
+
+    codec = CODECS.get(codec_id)
+    if codec is None:
+        raise CacheCodecError(f"Неизвестный кодек: {codec_id}")
+
+    payload = _decompress(view[HEADER_SIZE:], compression)
+    try:
+        return codec.decode(payload)
+    except (ValueError, EOFError, pickle.UnpicklingError) as e:
+        raise CacheCodecError(f"Повреждённая запись {codec.name}: {e}") from None
+
+
+def read_file(path: Union[str, Path]) -> Any:
+    """
+    Читает запись кеша из файла
+
+    Файлы от MMAP_MIN_BYTES отображаются в память: декодер получает срез
+    mmap без чтения файла в промежуточный буфер.
+
+    Args:
+        path: Путь к файлу записи
+
+    Returns:
+        Any: Значение
+
+    Raises:
+        CacheCodecError: Если запись не в формате кодека или повреждена
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        if size < MMAP_MIN_BYTES:
+            f.seek(0)
+            return decode(f.read())
+
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            value = decode(view)
+            # Значение не должно ссылаться на закрываемое отображение
+            if isinstance(value, memoryview):
+                value = value.tobytes()
+            return value
+        except Exception as e:
+            # Исключение и его трейсбек держат срезы отображения, и mmap
+            # не закрылся бы (BufferError) - наружу уходит только текст
+            error = f"{e}"
+        finally:
+            view.release()
+            mapped.close()
+
+    raise CacheCodecError(error)
+
+
+def available_codecs() -> Dict[str, bool]:
+    """Какие опциональные библиотеки доступны (для статистики)"""
+    return {
+        'orjson': orjson is not None,
+        'msgpack': msgpack is not None,
+        'zstandard': zstandard is not None
+    }
@@ -5,18 +5,32 @@
 и снижения нагрузки на API.
 """
 
+import os
+import re
+import asyncio
 import json
+import shutil
 import hashlib
+import inspect
 import pickle
+import sqlite3
+import threading
+import time
+import unicodedata
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Any, Optional, Callable, Dict, Union
+from typing import Any, Awaitable, Optional, Callable, Dict, List, Tuple, Union
+from contextlib import contextmanager
 from functools import wraps
 from loguru import logger
 from cachetools import TTLCache, LRUCache
 
 import config
-from file_utils import safe_json_read, safe_json_write, ensure_directory
+from file_utils import (
+    safe_json_read, safe_json_write, ensure_directory, atomic_write, safe_delete_file, FileLock
+)
+from monitoring import metrics_collector
+import cache_codec
 
 
 # ========================================================================
@@ -33,6 +47,37 @@ NEWS_CACHE_TTL = 86400  # 24 часа для новостей
 IMAGE_CACHE_TTL = 604800  # 7 дней для изображений
 API_CACHE_TTL = 300  # 5 минут для API ответов
 
+# Ограничения файлового кеша
+FILE_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 200 МБ
+FILE_CACHE_EVICT_TARGET = 0.9  # Вытеснение до 90% бюджета, чтобы не вытеснять на каждой записи
+FILE_CACHE_INDEX = "file_index.db"
+FILE_CACHE_SUFFIX = ".bin"  # Записи в формате cache_codec
+
+FILE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    cache_type TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (cache_type, digest)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at);
+"""
+
+# Файлы кеша старого формата: md5-имя прямо в папке типа
+LEGACY_CACHE_FILE_RE = re.compile(r'^[0-9a-f]{32}\.(cache|json)$')
+
+# Single-flight: сколько ждать чужое вычисление (Deep Research отвечает до десятков минут)
+SINGLE_FLIGHT_TIMEOUT = 1800
+SINGLE_FLIGHT_LOCK_DIR = CACHE_DIR / "locks"
+
+# Ограничения хранилища сгенерированных изображений
+IMAGE_CACHE_MAX_BYTES = 500 * 1024 * 1024  # 500 МБ
+IMAGE_CACHE_MAX_ITEMS = 1000
+
 
 # ========================================================================
 # IN-MEMORY КЕШИ
@@ -122,10 +167,18 @@ memory_cache = MemoryCache()
 # ========================================================================
 
 class FileCache:
-    """Менеджер файлового кеша для долгосрочного хранения"""
+    """
+    Файловый кеш для долгосрочного хранения с ограничением размера
+    
+    Файлы лежат в двухуровневых шардах cache/<тип>/ab/cd/<хеш>.bin (формат cache_codec),
+    а размер, время последнего обращения и срок жизни записей хранятся в
+    индексе SQLite. Суммарный размер поддерживается счётчиком, поэтому
+    ни статистика, ни вытеснение не обходят дерево файлов.
+    """
     
-    def __init__(self, cache_dir: Path = CACHE_DIR):
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = FILE_CACHE_MAX_BYTES):
         self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
         ensure_directory(self.cache_dir)
         
         # Создаем поддиректории для разных типов кеша
@@ -136,6 +189,17 @@ class FileCache:
         ensure_directory(self.news_cache_dir)
         ensure_directory(self.image_cache_dir)
         ensure_directory(self.api_cache_dir)
+        
+        self._lock = threading.Lock()
+        self.index_path = self.cache_dir / FILE_CACHE_INDEX
+        self._db = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        with self._db:
+            self._db.executescript(FILE_CACHE_SCHEMA)
+        
+        self._total_bytes = self._sum_sizes()
+        self._drop_legacy_files()
     
     def _get_cache_key(self, key: str) -> str:
         """
@@ -149,20 +213,78 @@ class FileCache:
         """
         return hashlib.md5(key.encode()).hexdigest()
     
-    def _get_cache_path(self, cache_type: str, key: str) -> Path:
+    def _get_cache_dir(self, cache_type: str) -> Path:
+        """Папка типа кеша ('news', 'image', 'api' или произвольный тип)"""
+        return getattr(self, f"{cache_type}_cache_dir", self.cache_dir / cache_type)
+    
+    def _get_cache_path(self, cache_type: str, digest: str, suffix: str = FILE_CACHE_SUFFIX) -> Path:
         """
-        Получает путь к файлу кеша
+        Получает путь к файлу кеша в шарде
         
         Args:
             cache_type: Тип кеша ('news', 'image', 'api')
-            key: Ключ
+            digest: Хеш ключа
+            suffix: Расширение файла записи
             
         Returns:
             Path: Путь к файлу кеша
         """
-        cache_key = self._get_cache_key(key)
-        cache_subdir = getattr(self, f"{cache_type}_cache_dir", self.cache_dir)
-        return cache_subdir / f"{cache_key}.cache"
+        return self._get_cache_dir(cache_type) / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+    
+    def _sum_sizes(self) -> int:
+        """Суммарный размер записей по индексу"""
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    
+    def _remove_entry(self, cache_type: str, digest: str, path: str, size: int):
+        """Удаляет файл и запись индекса (вызывается под self._lock)"""
+        try:
+            Path(path).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Ошибка удаления кеша {path}: {e}")
+        self._db.execute("DELETE FROM entries WHERE cache_type = ? AND digest = ?", (cache_type, digest))
+        self._total_bytes -= size
+    
+    def _lookup_path(self, cache_type: str, key: str, max_age: Optional[int] = None) -> Optional[str]:
+        """
+        Находит файл актуальной записи и отмечает обращение в индексе
+        
+        Args:
+            cache_type: Тип кеша
+            key: Ключ
+            max_age: Максимальный возраст в секундах (None = без проверки)
+            
+        Returns:
+            str: Путь к файлу записи или None
+        """
+        digest = self._get_cache_key(key)
+        now = time.time()
+        
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, size, created_at, expires_at FROM entries WHERE cache_type = ? AND digest = ?",
+                (cache_type, digest)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            path, size, created_at, expires_at = row
+            expired = (expires_at is not None and expires_at < now) or (max_age and now - created_at > max_age)
+            if expired or not Path(path).exists():
+                if expired:
+                    logger.debug(f"Кеш устарел для {key[:50]} (возраст: {now - created_at:.0f} сек)")
+                with self._db:
+                    self._remove_entry(cache_type, digest, path, size)
+                return None
+            
+            with self._db:
+                self._db.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE cache_type = ? AND digest = ?",
+                    (now, cache_type, digest)
+                )
+        
+        return path
     
     def get(self, cache_type: str, key: str, max_age: Optional[int] = None) -> Optional[Any]:
         """
@@ -176,32 +298,23 @@ class FileCache:
         Returns:
             Закешированное значение или None
         """
-        cache_path = self._get_cache_path(cache_type, key)
-        
-        if not cache_path.exists():
+        path = self._lookup_path(cache_type, key, max_age)
+        if path is None:
             return None
         
-        # Проверяем возраст файла
-        if max_age:
-            file_age = datetime.now().timestamp() - cache_path.stat().st_mtime
-            if file_age > max_age:
-                logger.debug(f"Кеш устарел для {key} (возраст: {file_age:.0f} сек)")
-                cache_path.unlink()  # Удаляем устаревший кеш
-                return None
-        
         try:
-            # Пробуем загрузить как JSON
-            if cache_path.suffix == '.json' or cache_type == 'api':
-                return safe_json_read(cache_path)
-            else:
-                # Иначе используем pickle
-                with open(cache_path, 'rb') as f:
+            # Записи до перехода на кодек: JSON с отступами или pickle
+            if path.endswith('.json'):
+                return safe_json_read(path)
+            if path.endswith('.cache'):
+                with open(path, 'rb') as f:
                     return pickle.load(f)
+            return cache_codec.read_file(path)
         except Exception as e:
-            logger.error(f"Ошибка чтения кеша {cache_path}: {e}")
+            logger.error(f"Ошибка чтения кеша {path}: {e}")
             return None
     
-    def set(self, cache_type: str, key: str, value: Any) -> bool:
+    def set(self, cache_type: str, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """
         Сохраняет значение в файловый кеш
         
@@ -209,25 +322,53 @@ class FileCache:
             cache_type: Тип кеша
             key: Ключ
             value: Значение
+            ttl: Время жизни в секундах (None = до вытеснения)
             
         Returns:
             bool: Успешность операции
         """
-        cache_path = self._get_cache_path(cache_type, key)
+        digest = self._get_cache_key(key)
         
         try:
-            # Сохраняем как JSON если возможно
-            if isinstance(value, (dict, list, str, int, float, bool, type(None))):
-                cache_path = cache_path.with_suffix('.json')
-                return safe_json_write(cache_path, value)
-            else:
-                # Иначе используем pickle
-                with open(cache_path, 'wb') as f:
-                    pickle.dump(value, f)
-                return True
+            data = cache_codec.encode(value)
         except Exception as e:
-            logger.error(f"Ошибка записи кеша {cache_path}: {e}")
+            logger.error(f"Ошибка сериализации кеша {key[:50]}: {e}")
             return False
+        
+        cache_path = self._get_cache_path(cache_type, digest)
+        now = time.time()
+        
+        with self._lock:
+            try:
+                with atomic_write(cache_path, 'wb', encoding=None) as f:
+                    f.write(data)
+            except Exception as e:
+                logger.error(f"Ошибка записи кеша {cache_path}: {e}")
+                return False
+            
+            with self._db:
+                previous = self._db.execute(
+                    "SELECT path, size FROM entries WHERE cache_type = ? AND digest = ?",
+                    (cache_type, digest)
+                ).fetchone()
+                if previous:
+                    # Запись старого формата (.json/.cache) заменена - старый файл больше не нужен
+                    if previous[0] != str(cache_path):
+                        safe_delete_file(previous[0])
+                    self._total_bytes -= previous[1]
+                
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(cache_type, digest, path, size, created_at, accessed_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (cache_type, digest, str(cache_path), len(data), now, now, now + ttl if ttl else None)
+                )
+                self._total_bytes += len(data)
+                
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+        
+        return True
     
     def delete(self, cache_type: str, key: str) -> bool:
         """
@@ -240,58 +381,105 @@ class FileCache:
         Returns:
             bool: Успешность операции
         """
-        cache_path = self._get_cache_path(cache_type, key)
+        digest = self._get_cache_key(key)
         
-        if cache_path.exists():
-            try:
-                cache_path.unlink()
-                return True
-            except Exception as e:
-                logger.error(f"Ошибка удаления кеша {cache_path}: {e}")
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, size FROM entries WHERE cache_type = ? AND digest = ?",
+                (cache_type, digest)
+            ).fetchone()
+            if row is None:
                 return False
+            
+            with self._db:
+                self._remove_entry(cache_type, digest, row[0], row[1])
+            return True
+    
+    def _evict(self):
+        """
+        Вытесняет давно не использованные записи до бюджета по размеру
         
-        # Проверяем JSON версию
-        json_path = cache_path.with_suffix('.json')
-        if json_path.exists():
-            try:
-                json_path.unlink()
-                return True
-            except Exception as e:
-                logger.error(f"Ошибка удаления кеша {json_path}: {e}")
-                return False
+        Вызывается под self._lock внутри транзакции. Записи выбираются по
+        индексу accessed_at, пока суммарный размер не станет меньше
+        FILE_CACHE_EVICT_TARGET от бюджета.
+        """
+        # Другие процессы могли изменить кеш - сверяем счётчик с индексом
+        self._total_bytes = self._sum_sizes()
+        target = int(self.max_bytes * FILE_CACHE_EVICT_TARGET)
+        evicted = 0
         
-        return False
+        while self._total_bytes > target:
+            rows = self._db.execute(
+                "SELECT cache_type, digest, path, size FROM entries ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for cache_type, digest, path, size in rows:
+                if self._total_bytes <= target:
+                    break
+                self._remove_entry(cache_type, digest, path, size)
+                evicted += 1
+        
+        if evicted:
+            metrics_collector.counters['file_cache_evicted'] += evicted
+            logger.debug(f"Из файлового кеша вытеснено {evicted} записей")
     
     def clear_old_cache(self, max_age_days: int = 7):
         """
-        Удаляет старые файлы кеша
+        Удаляет устаревшие записи кеша (по индексу, включая JSON)
         
         Args:
-            max_age_days: Максимальный возраст файлов в днях
+            max_age_days: Максимальный возраст записей в днях
         """
-        cutoff_time = datetime.now() - timedelta(days=max_age_days)
+        now = time.time()
+        cutoff_time = now - max_age_days * 86400
         
-        for cache_file in self.cache_dir.rglob("*.cache"):
-            try:
-                if datetime.fromtimestamp(cache_file.stat().st_mtime) < cutoff_time:
-                    cache_file.unlink()
-                    logger.debug(f"Удален старый кеш: {cache_file.name}")
-            except Exception as e:
-                logger.error(f"Ошибка при удалении старого кеша {cache_file}: {e}")
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT cache_type, digest, path, size FROM entries "
+                "WHERE created_at < ? OR (expires_at IS NOT NULL AND expires_at < ?)",
+                (cutoff_time, now)
+            ).fetchall()
+            with self._db:
+                for cache_type, digest, path, size in rows:
+                    self._remove_entry(cache_type, digest, path, size)
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+        
+        if rows:
+            logger.debug(f"Удалено устаревших записей кеша: {len(rows)}")
+    
+    def clear(self):
+        """Удаляет все записи файлового кеша"""
+        with self._lock:
+            rows = self._db.execute("SELECT cache_type, digest, path, size FROM entries").fetchall()
+            with self._db:
+                for cache_type, digest, path, size in rows:
+                    self._remove_entry(cache_type, digest, path, size)
+            self._total_bytes = 0
+    
+    def _drop_legacy_files(self):
+        """Удаляет файлы кеша старого формата (без шардов и индекса)"""
+        legacy_dirs = {self.cache_dir, self.news_cache_dir, self.api_cache_dir, self.image_cache_dir}
+        for cache_dir in legacy_dirs:
+            for cache_file in cache_dir.glob("*"):
+                if cache_file.is_file() and LEGACY_CACHE_FILE_RE.match(cache_file.name):
+                    safe_delete_file(cache_file)
     
     def get_cache_size(self) -> Dict[str, int]:
         """
-        Получает размер кеша по типам
+        Получает размер кеша по типам (по индексу, без обхода файлов)
         
         Returns:
             Dict с размерами в байтах
         """
-        sizes = {}
-        for cache_type in ['news', 'image', 'api']:
-            cache_dir = getattr(self, f"{cache_type}_cache_dir")
-            total_size = sum(f.stat().st_size for f in cache_dir.rglob("*") if f.is_file())
-            sizes[cache_type] = total_size
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT cache_type, SUM(size) FROM entries GROUP BY cache_type"
+            ).fetchall()
         
+        sizes = {'news': 0, 'image': 0, 'api': 0}
+        sizes.update({cache_type: size for cache_type, size in rows})
         sizes['total'] = sum(sizes.values())
         return sizes
 
@@ -300,15 +488,630 @@ class FileCache:
 file_cache = FileCache()
 
 
+# ========================================================================
+# КЕШ ИЗОБРАЖЕНИЙ (CONTENT-ADDRESSED)
+# ========================================================================
+
+def normalize_news_text(text: str) -> str:
+    """
+    Нормализует текст новости для сравнения по содержанию
+    
+    Args:
+        text: Исходный текст
+        
+    Returns:
+        str: Текст в NFKC, нижнем регистре, без ссылок и лишних пробелов
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    text = re.sub(r'https?://\S+', '', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class ImageCache:
+    """
+    Хранилище сгенерированных изображений с адресацией по содержимому
+    
+    Ключ - sha256 от нормализованного текста новости и параметров генерации
+    (модель, размер, качество), поэтому та же новость при повторном сборе
+    или на следующий день не генерируется заново. Вытеснение LRU по
+    количеству, суммарному размеру и возрасту файлов.
+    """
+    
+    def __init__(self, cache_dir: Path = CACHE_DIR / "images",
+                 max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 max_items: int = IMAGE_CACHE_MAX_ITEMS,
+                 ttl: int = IMAGE_CACHE_TTL):
+        self.cache_dir = ensure_directory(cache_dir)
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        
+        index = safe_json_read(self.index_path, default={})
+        self.entries: Dict[str, Dict] = index.get('entries', {})
+        self.hits = index.get('hits', 0)
+        self.misses = index.get('misses', 0)
+    
+    @staticmethod
+    def make_key(text: str, model: str, size: str, quality: str, variant: str = '') -> str:
+        """
+        Вычисляет ключ изображения
+        
+        Args:
+            text: Текст новости
+            model: Модель генерации
+            size: Размер изображения
+            quality: Качество изображения
+            variant: Параметры постобработки (перекодирования), если она включена
+            
+        Returns:
+            str: sha256 в hex
+        """
+        parts = [normalize_news_text(text), model, size, quality]
+        if variant:
+            parts.append(variant)
+        payload = json.dumps(parts, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.png"
+    
+    def _save_index(self):
+        """Сохраняет индекс (вызывается под self._lock)"""
+        safe_json_write(self.index_path, {
+            'entries': self.entries,
+            'hits': self.hits,
+            'misses': self.misses
+        })
+    
+    def _drop(self, key: str):
+        """Удаляет запись и файл (вызывается под self._lock)"""
+        self.entries.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Ошибка удаления изображения из кеша {key[:12]}: {e}")
+    
+    def _is_expired(self, entry: Dict) -> bool:
+        return datetime.now().timestamp() - entry.get('last_used', 0) > self.ttl
+    
+    def get_path(self, key: str) -> Optional[Path]:
+        """
+        Ищет изображение в кеше (учитывается в статистике попаданий)
+        
+        Args:
+            key: Ключ из make_key
+            
+        Returns:
+            Path: Путь к файлу в кеше или None
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            path = self._path(key)
+            
+            if entry and (self._is_expired(entry) or not path.exists()):
+                self._drop(key)
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                self._save_index()
+                return None
+            
+            entry['last_used'] = datetime.now().timestamp()
+            entry['hits'] = entry.get('hits', 0) + 1
+            self.hits += 1
+            self._save_index()
+            return path
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Возвращает байты изображения из кеша
+        
+        Args:
+            key: Ключ из make_key
+            
+        Returns:
+            bytes: Данные изображения или None
+        """
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError as e:
+            logger.error(f"Ошибка чтения изображения из кеша {key[:12]}: {e}")
+            return None
+    
+    def get_entry(self, key: str) -> Optional[Dict]:
+        """Метаданные изображения в кеше (без учёта в статистике)"""
+        with self._lock:
+            entry = self.entries.get(key)
+            return dict(entry) if entry else None
+    
+    def put(self, key: str, image_bytes: bytes, original_size: Optional[int] = None) -> Optional[Path]:
+        """
+        Сохраняет изображение в кеш
+        
+        Args:
+            key: Ключ из make_key
+            image_bytes: Данные изображения
+            original_size: Размер до постобработки (если изображение перекодировано)
+            
+        Returns:
+            Path: Путь к файлу в кеше или None при ошибке
+        """
+        path = self._path(key)
+        
+        with self._lock:
+            try:
+                with atomic_write(path, 'wb', encoding=None) as f:
+                    f.write(image_bytes)
+            except Exception as e:
+                logger.error(f"Ошибка записи изображения в кеш {key[:12]}: {e}")
+                return None
+            
+            now = datetime.now().timestamp()
+            self.entries[key] = {
+                'size': len(image_bytes),
+                'original_size': original_size or len(image_bytes),
+                'created_at': now,
+                'last_used': now,
+                'hits': 0
+            }
+            self._evict()
+            self._save_index()
+        
+        return path if path.exists() else None
+    
+    def link_into(self, key: str, destination: Path) -> bool:
+        """
+        Размещает изображение из кеша по указанному пути
+        
+        Используется жёсткая ссылка (без копирования данных), при
+        невозможности - копия файла.
+        
+        Args:
+            key: Ключ из make_key
+            destination: Целевой путь (например, data/images/<date>/<id>.png)
+            
+        Returns:
+            bool: True если файл размещён
+        """
+        source = self.get_path(key)
+        if source is None:
+            return False
+        
+        try:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            if destination.exists():
+                destination.unlink()
+            try:
+                os.link(source, destination)
+            except OSError:
+                shutil.copy2(source, destination)
+            return True
+        except OSError as e:
+            logger.error(f"Ошибка размещения изображения из кеша в {destination}: {e}")
+            return False
+    
+    def _evict(self):
+        """Вытесняет устаревшие и давно не использованные изображения (под self._lock)"""
+        for key in [k for k, entry in self.entries.items() if self._is_expired(entry)]:
+            self._drop(key)
+        
+        total_bytes = sum(entry.get('size', 0) for entry in self.entries.values())
+        if total_bytes <= self.max_bytes and len(self.entries) <= self.max_items:
+            return
+        
+        evicted = 0
+        for key in sorted(self.entries, key=lambda k: self.entries[k].get('last_used', 0)):
+            if total_bytes <= self.max_bytes and len(self.entries) <= self.max_items:
+                break
+            total_bytes -= self.entries[key].get('size', 0)
+            self._drop(key)
+            evicted += 1
+        
+        logger.debug(f"Из кеша изображений вытеснено {evicted} файлов")
+    
+    def clear(self):
+        """Удаляет все изображения из кеша"""
+        with self._lock:
+            for key in list(self.entries):
+                self._drop(key)
+            self._save_index()
+    
+    def cleanup(self):
+        """Применяет ограничения по возрасту и размеру"""
+        with self._lock:
+            self._evict()
+            self._save_index()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Статистика кеша изображений
+        
+        Returns:
+            Dict: Количество, размер, попадания и промахи
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'items': len(self.entries),
+                'total_bytes': sum(entry.get('size', 0) for entry in self.entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+# Глобальный экземпляр кеша изображений
+image_cache = ImageCache()
+
+
+# ========================================================================
+# КЛЮЧИ КЕША
+# ========================================================================
+
+# Версия схемы ключей: меняется при изменении канонического представления
+CACHE_KEY_VERSION = 1
+
+# Ключи пользовательских key_func длиннее этого значения хешируются
+MAX_CACHE_KEY_LENGTH = 250
+
+# Адрес объекта в repr ("<... at 0x7f...>") - такой ключ не переживает перезапуск
+_MEMORY_ADDRESS_RE = re.compile(r' at 0x[0-9a-fA-F]+')
+
+
+class UnstableCacheKeyError(ValueError):
+    """Аргумент нельзя стабильно представить в ключе кеша"""
+
+
+def _canonical(value: Any) -> Any:
+    """
+    Приводит значение к JSON-совместимому виду, не зависящему от процесса
+    
+    Args:
+        value: Аргумент функции
+        
+    Returns:
+        Any: Каноническое представление
+        
+    Raises:
+        UnstableCacheKeyError: Если значение зависит от адреса в памяти
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        return {'__bytes__': hashlib.sha256(value).hexdigest()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, Path):
+        return {'__path__': str(value)}
+    
+    # Объекты с собственным представлением для кеша
+    if hasattr(value, 'cache_key') and callable(value.cache_key):
+        return {'__object__': type(value).__qualname__, 'key': _canonical(value.cache_key())}
+    
+    representation = repr(value)
+    if _MEMORY_ADDRESS_RE.search(representation):
+        raise UnstableCacheKeyError(f"{type(value).__qualname__} не имеет стабильного представления")
+    return {'__repr__': type(value).__qualname__, 'value': representation}
+
+
+def stable_hash(value: Any) -> str:
+    """
+    Стабильный хеш значения (одинаковый в разных процессах)
+    
+    Args:
+        value: Значение для хеширования
+        
+    Returns:
+        str: sha256 в hex
+    """
+    payload = json.dumps(_canonical(value), sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CacheKeySpec:
+    """
+    Описание ключа кеша для декоратора cache_result
+    
+    Ключ строится из имени функции, версии, отпечатка конфигурации и
+    хеша выбранных аргументов. self/cls не учитываются, поэтому ключ
+    метода не зависит от экземпляра и переживает перезапуск процесса.
+    """
+    
+    def __init__(self, namespace: Optional[str] = None,
+                 include: Optional[List[str]] = None,
+                 exclude: Tuple[str, ...] = ('self', 'cls'),
+                 fingerprint: Optional[Callable[..., Any]] = None,
+                 version: str = '1'):
+        """
+        Args:
+            namespace: Префикс ключа (по умолчанию module.qualname функции)
+            include: Учитываемые аргументы (по умолчанию все, кроме exclude)
+            exclude: Аргументы, которые не входят в ключ
+            fingerprint: Функция от аргументов вызова, возвращающая отпечаток
+                конфигурации (модель, промпт, параметры парсера)
+            version: Версия результата: смена инвалидирует кеш функции
+        """
+        self.namespace = namespace
+        self.include = set(include) if include else None
+        self.exclude = set(exclude)
+        self.fingerprint = fingerprint
+        self.version = version
+    
+    def build(self, func: Callable, args: tuple, kwargs: dict) -> str:
+        """
+        Строит ключ для вызова
+        
+        Args:
+            func: Декорируемая функция
+            args: Позиционные аргументы вызова
+            kwargs: Именованные аргументы вызова
+            
+        Returns:
+            str: Ключ фиксированной длины
+            
+        Raises:
+            UnstableCacheKeyError: Если аргумент нельзя стабильно представить
+        """
+        bound = _get_signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        
+        key_args = {
+            name: value for name, value in bound.arguments.items()
+            if name not in self.exclude and (self.include is None or name in self.include)
+        }
+        
+        fingerprint = self.fingerprint(*args, **kwargs) if self.fingerprint else None
+        namespace = self.namespace or f"{func.__module__}.{func.__qualname__}"
+        
+        return (
+            f"{namespace}:v{CACHE_KEY_VERSION}.{self.version}:"
+            f"{stable_hash(fingerprint)[:16]}:{stable_hash(key_args)}"
+        )
+
+
+_signatures: Dict[Callable, inspect.Signature] = {}
+
+
+def _get_signature(func: Callable) -> inspect.Signature:
+    """Сигнатура функции (кешируется)"""
+    signature = _signatures.get(func)
+    if signature is None:
+        signature = _signatures[func] = inspect.signature(func)
+    return signature
+
+
+class _KeyGuard:
+    """Контроль ключей пользовательских key_func: размер и коллизии"""
+    
+    def __init__(self, max_tracked: int = 1000):
+        # Ключ -> хеш аргументов, из которых он получен
+        self._origins = LRUCache(maxsize=max_tracked)
+        self._lock = threading.Lock()
+    
+    def check(self, func: Callable, cache_key: str, args: tuple, kwargs: dict) -> str:
+        """
+        Проверяет ключ и при необходимости сокращает его
+        
+        Args:
+            func: Декорируемая функция
+            cache_key: Ключ от key_func
+            args: Позиционные аргументы вызова
+            kwargs: Именованные аргументы вызова
+            
+        Returns:
+            str: Ключ для использования
+        """
+        cache_key = str(cache_key)
+        
+        if len(cache_key) > MAX_CACHE_KEY_LENGTH:
+            metrics_collector.counters['cache_key_oversize'] += 1
+            logger.debug(f"Ключ кеша {func.__name__} длиной {len(cache_key)} сокращён до хеша")
+            cache_key = f"{func.__qualname__}:{hashlib.sha256(cache_key.encode('utf-8')).hexdigest()}"
+        
+        try:
+            origin = CacheKeySpec().build(func, args, kwargs)
+        except (UnstableCacheKeyError, TypeError):
+            return cache_key
+        
+        with self._lock:
+            previous = self._origins.get(cache_key)
+            self._origins[cache_key] = origin
+        
+        if previous is not None and previous != origin:
+            metrics_collector.counters['cache_key_collision'] += 1
+            logger.warning(f"⚠️ Коллизия ключа кеша {func.__name__}: разные аргументы дают ключ {cache_key[:50]}")
+        
+        return cache_key
+
+
+_key_guard = _KeyGuard()
+
+
 # ========================================================================
 # ДЕКОРАТОРЫ ДЛЯ КЕШИРОВАНИЯ
 # ========================================================================
 
+class SingleFlight:
+    """
+    Одно вычисление на ключ среди одновременных вызовов
+    
+    Потоки одного процесса ждут на блокировке ключа, процессы - на
+    lock-файле в cache/locks. Дождавшийся вызов повторно проверяет кеш
+    и получает результат, посчитанный первым, вместо повторного запроса.
+    """
+    
+    def __init__(self, lock_dir: Path = SINGLE_FLIGHT_LOCK_DIR, timeout: float = SINGLE_FLIGHT_TIMEOUT):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        # Ключ -> [блокировка, количество ожидающих]
+        self._locks: Dict[str, list] = {}
+        self._guard = threading.Lock()
+        # (цикл событий, ключ) -> future выполняющегося асинхронного вычисления
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+    
+    @contextmanager
+    def _thread_lock(self, key: str):
+        """Блокировка ключа в пределах процесса (удаляется, когда не нужна)"""
+        with self._guard:
+            slot = self._locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._guard:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    self._locks.pop(key, None)
+    
+    def do(self, key: str, compute: Callable[[], Any], lookup: Callable[[], Any],
+           cross_process: bool = False) -> Any:
+        """
+        Выполняет compute() один раз для всех одновременных вызовов с ключом
+        
+        Args:
+            key: Ключ кеша
+            compute: Вычисление результата (сохраняет его в кеш)
+            lookup: Поиск результата в кеше (None если нет)
+            cross_process: Координировать также процессы (через файловый кеш)
+            
+        Returns:
+            Any: Результат вычисления или значение, посчитанное другим вызовом
+        """
+        with self._thread_lock(key):
+            cached_value = lookup()
+            if cached_value is not None:
+                metrics_collector.counters['single_flight_shared'] += 1
+                return cached_value
+            
+            if not cross_process:
+                return compute()
+            
+            ensure_directory(self.lock_dir)
+            digest = hashlib.md5(key.encode()).hexdigest()
+            process_lock = FileLock(self.lock_dir / digest, timeout=self.timeout)
+            if not process_lock.acquire():
+                # Держатель блокировки завис - не ждём бесконечно
+                metrics_collector.counters['single_flight_timeout'] += 1
+                return compute()
+            
+            try:
+                cached_value = lookup()
+                if cached_value is not None:
+                    metrics_collector.counters['single_flight_shared'] += 1
+                    return cached_value
+                return compute()
+            finally:
+                process_lock.release()
+
+    
+    async def do_async(self, key: str, compute: Callable[[], Awaitable[Any]],
+                       lookup: Callable[[], Awaitable[Any]], cross_process: bool = False) -> Any:
+        """
+        Асинхронный вариант do(): корутины ждут первую, не блокируя цикл событий
+        
+        Корутины одного цикла событий ждут future первого вызова, процессы -
+        lock-файл (захватывается в пуле потоков). Если первый вызов не дал
+        результата, ожидавшие вычисляют его сами.
+        
+        Args:
+            key: Ключ кеша
+            compute: Корутина-функция вычисления (сохраняет результат в кеш)
+            lookup: Корутина-функция поиска в кеше (None если нет)
+            cross_process: Координировать также процессы (через файловый кеш)
+            
+        Returns:
+            Any: Результат вычисления или значение, посчитанное другим вызовом
+        """
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)
+        
+        inflight = self._inflight.get(slot)
+        if inflight is not None:
+            result = await asyncio.shield(inflight)
+            if result is not None:
+                metrics_collector.counters['single_flight_shared'] += 1
+                return result
+            return await compute()
+        
+        future = loop.create_future()
+        self._inflight[slot] = future
+        result = None
+        try:
+            result = await self._run_async(key, compute, lookup, cross_process)
+            return result
+        finally:
+            self._inflight.pop(slot, None)
+            future.set_result(result)
+    
+    async def _run_async(self, key: str, compute: Callable[[], Awaitable[Any]],
+                         lookup: Callable[[], Awaitable[Any]], cross_process: bool) -> Any:
+        """Вычисление первой корутиной с повторной проверкой кеша под lock-файлом"""
+        if not cross_process:
+            return await compute()
+        
+        ensure_directory(self.lock_dir)
+        digest = hashlib.md5(key.encode()).hexdigest()
+        process_lock = FileLock(self.lock_dir / digest, timeout=self.timeout)
+        if not await asyncio.to_thread(process_lock.acquire):
+            metrics_collector.counters['single_flight_timeout'] += 1
+            return await compute()
+        
+        try:
+            cached_value = await lookup()
+            if cached_value is not None:
+                metrics_collector.counters['single_flight_shared'] += 1
+                return cached_value
+            return await compute()
+        finally:
+            process_lock.release()
+
+
+# Глобальный координатор одновременных вычислений
+single_flight = SingleFlight()
+
+
+def _make_cache_key(func: Callable, spec: CacheKeySpec, key_func: Optional[Callable],
+                    args: tuple, kwargs: dict) -> Optional[str]:
+    """
+    Генерирует ключ кеша для вызова
+    
+    Returns:
+        str: Ключ или None, если вызов нужно выполнить без кеша
+    """
+    if key_func:
+        return _key_guard.check(func, key_func(*args, **kwargs), args, kwargs)
+    
+    try:
+        return spec.build(func, args, kwargs)
+    except UnstableCacheKeyError as e:
+        # Ключ не переживёт перезапуск - вызываем без кеша
+        metrics_collector.counters['cache_key_unstable'] += 1
+        logger.warning(f"⚠️ Кеш {func.__name__} пропущен: {e}")
+        return None
+
+
 def cache_result(
     cache_type: str = 'processed',
     ttl: Optional[int] = None,
     key_func: Optional[Callable] = None,
-    use_file_cache: bool = False
+    use_file_cache: bool = False,
+    key_spec: Optional[CacheKeySpec] = None
 ):
     """
     Декоратор для кеширования результатов функции
@@ -318,47 +1121,138 @@ def cache_result(
         ttl: Время жизни в секундах (None = без ограничения)
         key_func: Функция для генерации ключа кеша
         use_file_cache: Использовать ли файловый кеш
+        key_spec: Описание ключа (по умолчанию - все аргументы, кроме self/cls)
     """
+    spec = key_spec or CacheKeySpec()
+    
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Генерируем ключ кеша
-            if key_func:
-                cache_key = key_func(*args, **kwargs)
-            else:
-                # Дефолтный ключ на основе имени функции и аргументов
-                key_parts = [func.__name__]
-                key_parts.extend(str(arg) for arg in args)
-                key_parts.extend(f"{k}={v}" for k, v in sorted(kwargs.items()))
-                cache_key = ":".join(key_parts)
-            
-            # Проверяем memory cache
-            cached_value = memory_cache.get(cache_type, cache_key)
+            cache_key = _make_cache_key(func, spec, key_func, args, kwargs)
+            if cache_key is None:
+                return func(*args, **kwargs)
+            
+            def lookup():
+                # Проверяем memory cache
+                cached_value = memory_cache.get(cache_type, cache_key)
+                if cached_value is not None:
+                    logger.debug(f"Cache hit (memory) для {func.__name__}: {cache_key[:50]}")
+                    metrics_collector.counters[f'cache_{cache_type}_hit_memory'] += 1
+                    return cached_value
+                
+                # Проверяем файловый кеш если нужно
+                if use_file_cache:
+                    cached_value = file_cache.get(cache_type, cache_key, max_age=ttl)
+                    if cached_value is not None:
+                        logger.debug(f"Cache hit (file) для {func.__name__}: {cache_key[:50]}")
+                        metrics_collector.counters[f'cache_{cache_type}_hit_file'] += 1
+                        # Сохраняем в memory cache для быстрого доступа
+                        memory_cache.set(cache_type, cache_key, cached_value)
+                        return cached_value
+                
+                return None
+            
+            def compute():
+                # Cache miss - выполняем функцию
+                logger.debug(f"Cache miss для {func.__name__}: {cache_key[:50]}")
+                metrics_collector.counters[f'cache_{cache_type}_miss'] += 1
+                result = func(*args, **kwargs)
+                
+                # Сохраняем результат в кеш
+                memory_cache.set(cache_type, cache_key, result)
+                if use_file_cache:
+                    file_cache.set(cache_type, cache_key, result, ttl=ttl)
+                
+                return result
+            
+            cached_value = lookup()
             if cached_value is not None:
-                logger.debug(f"Cache hit (memory) для {func.__name__}: {cache_key[:50]}")
                 return cached_value
             
-            # Проверяем файловый кеш если нужно
-            if use_file_cache:
-                cached_value = file_cache.get(cache_type, cache_key, max_age=ttl)
+            # Одновременные вызовы с тем же ключом ждут первый (single-flight)
+            return single_flight.do(cache_key, compute, lookup, cross_process=use_file_cache)
+        
+        # Добавляем метод для очистки кеша этой функции
+        def clear_cache():
+            memory_cache.clear(cache_type)
+            logger.info(f"Кеш очищен для {func.__name__}")
+        
+        wrapper.clear_cache = clear_cache
+        return wrapper
+    
+    return decorator
+
+
+def async_cache_result(
+    cache_type: str = 'processed',
+    ttl: Optional[int] = None,
+    key_func: Optional[Callable] = None,
+    use_file_cache: bool = False,
+    key_spec: Optional[CacheKeySpec] = None
+):
+    """
+    Декоратор для кеширования результатов корутин
+    
+    Использует те же memory и файловый кеши, что и cache_result. Файловые
+    операции выполняются в пуле потоков (asyncio.to_thread), поэтому
+    проверка кеша не блокирует цикл событий. None не кешируется: так
+    асинхронные клиенты сообщают об ошибке.
+    
+    Args:
+        cache_type: Тип кеша ('api', 'processed', 'prompt'; для типов без
+            memory-кеша, например 'image', используется только файловый кеш)
+        ttl: Время жизни в секундах (None = без ограничения)
+        key_func: Функция для генерации ключа кеша
+        use_file_cache: Использовать ли файловый кеш
+        key_spec: Описание ключа (по умолчанию - все аргументы, кроме self/cls)
+    """
+    spec = key_spec or CacheKeySpec()
+    
+    def decorator(func: Callable) -> Callable:
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError(f"async_cache_result применим только к корутинам, получено {func.__qualname__}")
+        
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = _make_cache_key(func, spec, key_func, args, kwargs)
+            if cache_key is None:
+                return await func(*args, **kwargs)
+            
+            async def lookup():
+                cached_value = memory_cache.get(cache_type, cache_key)
                 if cached_value is not None:
-                    logger.debug(f"Cache hit (file) для {func.__name__}: {cache_key[:50]}")
-                    # Сохраняем в memory cache для быстрого доступа
-                    memory_cache.set(cache_type, cache_key, cached_value)
+                    logger.debug(f"Cache hit (memory) для {func.__name__}: {cache_key[:50]}")
+                    metrics_collector.counters[f'cache_{cache_type}_hit_memory'] += 1
                     return cached_value
+                
+                if use_file_cache:
+                    cached_value = await asyncio.to_thread(file_cache.get, cache_type, cache_key, ttl)
+                    if cached_value is not None:
+                        logger.debug(f"Cache hit (file) для {func.__name__}: {cache_key[:50]}")
+                        metrics_collector.counters[f'cache_{cache_type}_hit_file'] += 1
+                        memory_cache.set(cache_type, cache_key, cached_value)
+                        return cached_value
+                
+                return None
             
-            # Cache miss - выполняем функцию
-            logger.debug(f"Cache miss для {func.__name__}: {cache_key[:50]}")
-            result = func(*args, **kwargs)
+            async def compute():
+                logger.debug(f"Cache miss для {func.__name__}: {cache_key[:50]}")
+                metrics_collector.counters[f'cache_{cache_type}_miss'] += 1
+                result = await func(*args, **kwargs)
+                
+                if result is not None:
+                    memory_cache.set(cache_type, cache_key, result)
+                    if use_file_cache:
+                        await asyncio.to_thread(file_cache.set, cache_type, cache_key, result, ttl)
+                
+                return result
             
-            # Сохраняем результат в кеш
-            memory_cache.set(cache_type, cache_key, result)
-            if use_file_cache:
-                file_cache.set(cache_type, cache_key, result)
+            cached_value = await lookup()
+            if cached_value is not None:
+                return cached_value
             
-            return result
+            return await single_flight.do_async(cache_key, compute, lookup, cross_process=use_file_cache)
         
-        # Добавляем метод для очистки кеша этой функции
         def clear_cache():
             memory_cache.clear(cache_type)
             logger.info(f"Кеш очищен для {func.__name__}")
@@ -369,31 +1263,51 @@ def cache_result(
     return decorator
 
 
-def cache_api_response(ttl: int = API_CACHE_TTL):
+def cache_api_response(ttl: int = API_CACHE_TTL, key_spec: Optional[CacheKeySpec] = None):
     """
     Специализированный декоратор для кеширования API ответов
     
     Args:
         ttl: Время жизни кеша в секундах
+        key_spec: Описание ключа кеша
     """
     return cache_result(
         cache_type='api',
         ttl=ttl,
-        use_file_cache=True
+        use_file_cache=True,
+        key_spec=key_spec
+    )
+
+
+def async_cache_api_response(ttl: int = API_CACHE_TTL, key_spec: Optional[CacheKeySpec] = None):
+    """
+    Декоратор для кеширования ответов асинхронных API клиентов
+    
+    Args:
+        ttl: Время жизни кеша в секундах
+        key_spec: Описание ключа кеша
+    """
+    return async_cache_result(
+        cache_type='api',
+        ttl=ttl,
+        use_file_cache=True,
+        key_spec=key_spec
     )
 
 
-def cache_news_data(ttl: int = NEWS_CACHE_TTL):
+def cache_news_data(ttl: int = NEWS_CACHE_TTL, key_spec: Optional[CacheKeySpec] = None):
     """
     Специализированный декоратор для кеширования новостных данных
     
     Args:
         ttl: Время жизни кеша в секундах
+        key_spec: Описание ключа кеша
     """
     return cache_result(
         cache_type='processed',
         ttl=ttl,
-        use_file_cache=True
+        use_file_cache=True,
+        key_spec=key_spec
     )
 
 
@@ -407,15 +1321,19 @@ class CacheManager:
     def __init__(self):
         self.memory = memory_cache
         self.file = file_cache
+        self.image = image_cache
     
     def clear_all(self):
         """Очищает весь кеш"""
         self.memory.clear()
         logger.info("Memory кеш очищен")
         
-        # Удаляем все файлы кеша
+        self.image.clear()
+        self.file.clear()
+        
+        # Удаляем остальные файлы кеша (индекс файлового кеша открыт и остаётся)
         for cache_file in CACHE_DIR.rglob("*"):
-            if cache_file.is_file():
+            if cache_file.is_file() and not cache_file.name.startswith(FILE_CACHE_INDEX):
                 try:
                     cache_file.unlink()
                 except Exception as e:
@@ -442,8 +1360,10 @@ class CacheManager:
                 'news_size': file_sizes.get('news', 0),
                 'image_size': file_sizes.get('image', 0),
                 'api_size': file_sizes.get('api', 0),
-                'total_size': file_sizes.get('total', 0)
-            }
+                'total_size': file_sizes.get('total', 0),
+                'codecs': cache_codec.available_codecs()
+            },
+            'image_cache': self.image.get_stats()
         }
     
     def cleanup(self, max_age_days: int = 7):
@@ -455,6 +1375,7 @@ class CacheManager:
         """
         logger.info(f"Очистка кеша старше {max_age_days} дней...")
         self.file.clear_old_cache(max_age_days)
+        self.image.cleanup()
         logger.info("Очистка завершена")
 
 
@@ -0,0 +1,290 @@
+"""
+Checkpoint ежедневного сбора новостей для NEWSMAKER
+
+Манифест рядом с daily_news_YYYY-MM-DD.json фиксирует, какие стадии
+сбора уже выполнены для каждой новости (ответ получен, разобрана,
+изображение сохранено, проверена). Повторная попытка или перезапуск
+процесса продолжают сбор с места остановки и не тратят повторно
+запрос Deep Research и генерации изображений.
+"""
+
+import copy
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from loguru import logger
+
+from file_utils import safe_json_read, safe_json_write, atomic_write, safe_delete_file
+from timezone_utils import now_msk
+
+
+# Стадии обработки новости в порядке выполнения
+STAGE_RAW_FETCHED = 'raw_fetched'
+STAGE_PARSED = 'parsed'
+STAGE_IMAGE_SAVED = 'image_saved'
+STAGE_VALIDATED = 'validated'
+
+NEWS_STAGES = (STAGE_PARSED, STAGE_IMAGE_SAVED, STAGE_VALIDATED)
+
+CHECKPOINT_PREFIX = 'checkpoint_'
+MANIFEST_VERSION = 1
+
+# Поля новости, которые описывают сохранённое изображение
+IMAGE_FIELDS = ('image_path', 'image_generated', 'image_size', 'image_original_size', 'image_format')
+
+
+class CollectionCheckpoint:
+    """Манифест стадий сбора новостей за одну дату"""
+
+    def __init__(self, data_dir: Path, date: datetime):
+        """
+        Инициализация checkpoint и загрузка существующего манифеста
+
+        Args:
+            data_dir: Папка с файлами новостей
+            date: Дата сбора
+        """
+        self.date_str = date.strftime('%Y-%m-%d')
+        self.manifest_path = Path(data_dir) / f"{CHECKPOINT_PREFIX}{self.date_str}.json"
+        self.raw_path = Path(data_dir) / f"{CHECKPOINT_PREFIX}{self.date_str}.raw.txt"
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _new_manifest(self) -> Dict:
+        """Создает пустой манифест"""
+        return {
+            'version': MANIFEST_VERSION,
+            'date': self.date_str,
+            'created_at': now_msk().isoformat(),
+            'updated_at': None,
+            STAGE_RAW_FETCHED: None,
+            'completed': False,
+            'news': {}
+        }
+
+    def _load(self) -> Dict:
+        """Загружает манифест с диска (или создает пустой)"""
+        data = safe_json_read(self.manifest_path)
+
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            if data is not None:
+                logger.warning(f"⚠️ Манифест {self.manifest_path.name} несовместим, начинаем заново")
+            return self._new_manifest()
+
+        return data
+
+    def _save(self) -> bool:
+        """Сохраняет манифест на диск (вызывается под self._lock)"""
+        self.data['updated_at'] = now_msk().isoformat()
+        return safe_json_write(self.manifest_path, self.data)
+
+    @property
+    def exists(self) -> bool:
+        """Есть ли на диске манифест с сохранённым прогрессом"""
+        return self.manifest_path.exists()
+
+    @property
+    def completed(self) -> bool:
+        """Был ли сбор за эту дату доведён до конца"""
+        return bool(self.data.get('completed'))
+
+    # ====================================================================
+    # СЫРОЙ ОТВЕТ DEEP RESEARCH
+    # ====================================================================
+
+    def has_raw(self) -> bool:
+        """Сохранён ли полный ответ Deep Research"""
+        return bool(self.data.get(STAGE_RAW_FETCHED)) and self.raw_path.exists()
+
+    def load_raw(self) -> Optional[str]:
+        """
+        Читает сохранённый ответ Deep Research
+
+        Returns:
+            str: Сырой контент или None если его нет
+        """
+        if not self.has_raw():
+            return None
+
+        try:
+            return self.raw_path.read_text(encoding='utf-8')
+        except OSError as e:
+            logger.error(f"Ошибка чтения {self.raw_path.name}: {e}")
+            return None
+
+    def mark_raw_fetched(self, raw_content: str) -> bool:
+        """
+        Сохраняет полный ответ Deep Research рядом с манифестом
+
+        Args:
+            raw_content: Сырой контент от API
+
+        Returns:
+            bool: True если ответ сохранён
+        """
+        with self._lock:
+            try:
+                with atomic_write(self.raw_path) as f:
+                    f.write(raw_content)
+            except Exception as e:
+                logger.error(f"Ошибка сохранения ответа в {self.raw_path.name}: {e}")
+                return False
+
+            self.data[STAGE_RAW_FETCHED] = {
+                'at': now_msk().isoformat(),
+                'size': len(raw_content)
+            }
+            return self._save()
+
+    # ====================================================================
+    # СТАДИИ НОВОСТЕЙ
+    # ====================================================================
+
+    def _record(self, news_item: Dict, stage: str):
+        """Фиксирует стадию новости в памяти (вызывается под self._lock)"""
+        entry = self.data['news'].setdefault(news_item['id'], {'stages': {}})
+        entry['stages'][stage] = now_msk().isoformat()
+        entry['item'] = copy.deepcopy(news_item)
+
+    def mark_stage(self, news_item: Dict, stage: str) -> bool:
+        """
+        Отмечает стадию как выполненную для новости
+
+        Args:
+            news_item: Новость (с назначенным ID)
+            stage: Одна из NEWS_STAGES
+
+        Returns:
+            bool: True если манифест сохранён
+        """
+        with self._lock:
+            self._record(news_item, stage)
+            return self._save()
+
+    def mark_parsed(self, news_list: List[Dict]) -> bool:
+        """
+        Отмечает разбор сразу для списка новостей (одна запись на диск)
+
+        Args:
+            news_list: Разобранные новости с назначенными ID
+
+        Returns:
+            bool: True если манифест сохранён
+        """
+        with self._lock:
+            for news_item in news_list:
+                self._record(news_item, STAGE_PARSED)
+            return self._save()
+
+    def has_stage(self, news_id: str, stage: str) -> bool:
+        """Выполнена ли стадия для новости"""
+        entry = self.data['news'].get(news_id)
+        return bool(entry and stage in entry['stages'])
+
+    def get_parsed_news(self) -> List[Dict]:
+        """
+        Возвращает разобранные новости в последнем сохранённом состоянии
+
+        Returns:
+            List[Dict]: Копии новостей, отсортированные по приоритету
+        """
+        with self._lock:
+            news_list = [
+                copy.deepcopy(entry['item'])
+                for entry in self.data['news'].values()
+                if STAGE_PARSED in entry['stages']
+            ]
+        return sorted(news_list, key=lambda x: x.get('priority', 0))
+
+    def restore_image(self, news_item: Dict) -> bool:
+        """
+        Восстанавливает поля изображения, если оно уже было сохранено
+
+        Args:
+            news_item: Новость для обновления
+
+        Returns:
+            bool: True если файл изображения на месте и генерацию можно пропустить
+        """
+        news_id = news_item.get('id')
+        if not news_id or not self.has_stage(news_id, STAGE_IMAGE_SAVED):
+            return False
+
+        saved_item = self.data['news'][news_id]['item']
+        image_path = saved_item.get('image_path')
+        if not image_path or not Path(image_path).exists():
+            logger.warning(f"⚠️ Изображение {news_id} отмечено в checkpoint, но файл отсутствует")
+            return False
+
+        news_item.update({field: saved_item.get(field) for field in IMAGE_FIELDS})
+        news_item.pop('image_error', None)
+        return True
+
+    # ====================================================================
+    # ЖИЗНЕННЫЙ ЦИКЛ
+    # ====================================================================
+
+    def reset(self):
+        """Сбрасывает прогресс (перед новым запросом к Deep Research)"""
+        with self._lock:
+            self.data = self._new_manifest()
+            safe_delete_file(self.raw_path)
+            if self.manifest_path.exists():
+                self._save()
+
+    def mark_completed(self, news_list: List[Dict]) -> bool:
+        """
+        Отмечает сбор завершённым и сохраняет финальное состояние новостей
+
+        Args:
+            news_list: Итоговый список новостей
+
+        Returns:
+            bool: True если манифест сохранён
+        """
+        with self._lock:
+            for news_item in news_list:
+                entry = self.data['news'].get(news_item['id'])
+                if entry:
+                    entry['item'] = copy.deepcopy(news_item)
+            self.data['completed'] = True
+            return self._save()
+
+    def summary(self) -> Dict:
+        """
+        Сводка прогресса для логов и статуса
+
+        Returns:
+            Dict: Количество новостей на каждой стадии
+        """
+        entries = list(self.data['news'].values())
+        summary = {
+            STAGE_RAW_FETCHED: bool(self.data.get(STAGE_RAW_FETCHED)),
+            'completed': self.completed,
+            'news': len(entries)
+        }
+        for stage in NEWS_STAGES:
+            summary[stage] = sum(1 for entry in entries if stage in entry['stages'])
+        return summary
+
+
+def cleanup_old_checkpoints(data_dir: Path, cutoff_date: datetime):
+    """
+    Удаляет манифесты и сохранённые ответы старше указанной даты
+
+    Args:
+        data_dir: Папка с файлами новостей
+        cutoff_date: Граничная дата
+    """
+    for file_path in Path(data_dir).glob(f"{CHECKPOINT_PREFIX}*"):
+        try:
+            date_part = file_path.name[len(CHECKPOINT_PREFIX):][:10]
+            file_date = datetime.strptime(date_part, '%Y-%m-%d').date()
+
+            if file_date < cutoff_date.date():
+                file_path.unlink()
+                logger.info(f"Удален старый checkpoint: {file_path.name}")
+
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ошибка при обработке файла {file_path}: {e}")
@@ -0,0 +1,240 @@
+"""
+Индекс почти-дубликатов для NEWSMAKER
+
+Каждое опубликованное сообщение хранится как MinHash-сигнатура множества
+символьных шинглов полного очищенного текста (а не первых 100 символов).
+Сигнатура разбита на полосы (LSH): кандидатами в дубликаты считаются только
+записи, совпавшие с новым текстом хотя бы в одной полосе, поэтому проверка
+не перебирает всю историю и не зависит от длины текстов.
+
+Порог задается так же, как для difflib.SequenceMatcher.ratio() (2M/T),
+и переводится в порог коэффициента Жаккара шинглов: ratio = 2J / (1 + J).
+"""
+
+import base64
+import hashlib
+import random
+import struct
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from loguru import logger
+
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+
+# Короче этого тексты не сравниваются по схожести (только точное совпадение)
+MIN_TEXT_LENGTH = 50
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# Фиксированное зерно: сигнатуры сохраняются в файл и сравниваются между запусками
+_rng = random.Random(0x4E455753)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+_SIGNATURE_FORMAT = f'<{NUM_PERM}Q'
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """
+    Символьные шинглы текста
+
+    Args:
+        text: Очищенный текст
+        size: Длина шингла
+
+    Returns:
+        Set[str]: Множество шинглов (весь текст, если он короче шингла)
+    """
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _hash_shingle(shingle: str) -> int:
+    """Стабильный между процессами 32-битный хеш шингла"""
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """
+    MinHash-сигнатура текста
+
+    Args:
+        text: Очищенный текст
+
+    Returns:
+        Tuple[int, ...]: NUM_PERM минимальных хешей
+    """
+    hashes = [_hash_shingle(shingle) for shingle in shingles(text)]
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimate_jaccard(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Оценка коэффициента Жаккара по двум сигнатурам"""
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERM
+
+
+def jaccard_to_ratio(jaccard: float) -> float:
+    """Коэффициент Жаккара -> схожесть в шкале SequenceMatcher.ratio()"""
+    return 2 * jaccard / (1 + jaccard)
+
+
+def ratio_to_jaccard(ratio: float) -> float:
+    """Схожесть в шкале SequenceMatcher.ratio() -> коэффициент Жаккара"""
+    return ratio / (2 - ratio)
+
+
+def choose_bands(jaccard_threshold: float) -> Tuple[int, int]:
+    """
+    Разбиение сигнатуры на полосы LSH под порог
+
+    Выбирается самое строгое разбиение, у которого точка перегиба S-кривой
+    (1/b)^(1/r) с запасом ниже порога - похожие тексты почти наверняка
+    попадут в кандидаты, а точную оценку дает сравнение сигнатур.
+
+    Args:
+        jaccard_threshold: Порог коэффициента Жаккара
+
+    Returns:
+        Tuple[int, int]: (полос, строк в полосе)
+    """
+    for rows in (16, 8, 4, 2):
+        bands = NUM_PERM // rows
+        if (1 / bands) ** (1 / rows) <= jaccard_threshold * 0.9:
+            return bands, rows
+    return NUM_PERM, 1
+
+
+def encode_signature(signature: Tuple[int, ...]) -> str:
+    """Сигнатура -> base64 для JSON"""
+    return base64.b64encode(struct.pack(_SIGNATURE_FORMAT, *signature)).decode('ascii')
+
+
+def decode_signature(encoded: str) -> Tuple[int, ...]:
+    """base64 из JSON -> сигнатура"""
+    return struct.unpack(_SIGNATURE_FORMAT, base64.b64decode(encoded))
+
+
+class DedupIndex:
+    """LSH-индекс MinHash-сигнатур опубликованных сообщений"""
+
+    def __init__(self, similarity_threshold: float):
+        """
+        Args:
+            similarity_threshold: Порог схожести в шкале SequenceMatcher.ratio()
+        """
+        self.similarity_threshold = similarity_threshold
+        self.bands, self.rows = choose_bands(ratio_to_jaccard(similarity_threshold))
+        self.records: List[Dict] = []
+        self._signatures: List[Tuple[int, ...]] = []
+        self._by_hash: Dict[str, Dict] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], similarity_threshold: float) -> 'DedupIndex':
+        """
+        Восстанавливает индекс из сохраненных записей
+
+        Args:
+            records: Записи {'hash', 'timestamp', 'preview', 'signature'}
+            similarity_threshold: Порог схожести
+
+        Returns:
+            DedupIndex
+        """
+        index = cls(similarity_threshold)
+        for record in records:
+            try:
+                index._insert(record, decode_signature(record['signature']))
+            except (KeyError, ValueError, struct.error, TypeError):
+                logger.debug("Пропущена повреждённая запись индекса дубликатов")
+        return index
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def _insert(self, record: Dict, signature: Tuple[int, ...]):
+        position = len(self.records)
+        self.records.append(record)
+        self._signatures.append(signature)
+        self._by_hash.setdefault(record.get('hash'), record)
+        for key in self._band_keys(signature):
+            self._buckets[key].append(position)
+
+    def add(self, text: str, content_hash: str, timestamp: Optional[str] = None) -> Dict:
+        """
+        Добавляет сообщение в индекс
+
+        Args:
+            text: Очищенный текст сообщения
+            content_hash: SHA-256 очищенного текста
+            timestamp: Время публикации (ISO)
+
+        Returns:
+            Dict: Сохраняемая запись
+        """
+        signature = minhash(text)
+        record = {
+            'hash': content_hash,
+            'timestamp': timestamp or datetime.now().isoformat(),
+            'preview': text[:100],
+            'signature': encode_signature(signature)
+        }
+        self._insert(record, signature)
+        return record
+
+    def query(self, text: str) -> Optional[Tuple[Dict, float]]:
+        """
+        Ищет самое похожее сообщение не ниже порога
+
+        Args:
+            text: Очищенный текст нового сообщения
+
+        Returns:
+            Tuple: (запись, схожесть в шкале ratio) или None
+        """
+        if len(text) < MIN_TEXT_LENGTH or not self.records:
+            return None
+
+        signature = minhash(text)
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        best = None
+        for position in candidates:
+            similarity = jaccard_to_ratio(estimate_jaccard(signature, self._signatures[position]))
+            if similarity >= self.similarity_threshold and (best is None or similarity > best[1]):
+                best = (self.records[position], similarity)
+
+        logger.debug(f"Индекс дубликатов: {len(candidates)} кандидатов из {len(self.records)} записей")
+        return best
+
+    def find_exact(self, content_hash: str) -> Optional[Dict]:
+        """Запись с тем же хешем очищенного текста"""
+        return self._by_hash.get(content_hash)
+
+    def to_records(self, cutoff: Optional[datetime] = None) -> List[Dict]:
+        """
+        Записи для сохранения (новые первыми)
+
+        Args:
+            cutoff: Отбросить записи старше этого момента
+
+        Returns:
+            List[Dict]: Записи индекса
+        """
+        records = self.records
+        if cutoff is not None:
+            cutoff_str = cutoff.isoformat()
+            records = [record for record in records if record.get('timestamp', '') >= cutoff_str]
+        return sorted(records, key=lambda record: record.get('timestamp', ''), reverse=True)
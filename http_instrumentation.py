@@ -0,0 +1,424 @@
+"""
+Учет исходящих HTTP запросов NEWSMAKER
+
+Хуки на уровне транспорта записывают каждый запрос к внешним API в
+metrics_collector.record_api_call, без ручных замеров вокруг вызовов:
+
+- aiohttp: TraceConfig для сессий (пул Perplexity, AsyncHTTPClient);
+- httpx: обертки транспорта (OpenAI SDK, HTTPXRequest бота Telegram);
+- requests: HTTPAdapter для сессии (загрузка изображений по URL).
+
+Для каждого запроса записываются общее время (до конца чтения тела),
+время до первого байта ответа, статус и размеры тела запроса и ответа, а
+также фазы установки соединения, которые дает транспорт: aiohttp - DNS и
+соединение (вместе с TLS), httpx - соединение и TLS раздельно (DNS
+входит в соединение), requests - фаз соединения не дает.
+"""
+
+import re
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterator, AsyncIterator, Optional
+from urllib.parse import urlsplit
+from loguru import logger
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+    HTTPAdapter = object
+
+from monitoring import metrics_collector
+from tracing import add_event
+
+
+# Названия API по хосту (совпадают с именами в счетчиках api_<name>_*)
+API_HOSTS = {
+    'api.perplexity.ai': 'perplexity',
+    'api.openai.com': 'openai',
+    'api.telegram.org': 'telegram',
+}
+
+# Токен бота в пути запросов к Telegram не должен попадать в метрики
+BOT_TOKEN_RE = re.compile(r'/bot[^/]+')
+
+# События трассировки httpcore -> фаза запроса
+HTTPCORE_PHASES = {
+    'connection.connect_tcp': 'connect',
+    'connection.start_tls': 'tls',
+}
+
+
+def api_name_for_url(url: str) -> str:
+    """
+    Название API для счетчиков по URL запроса
+
+    Args:
+        url: URL запроса
+
+    Returns:
+        str: perplexity, openai, telegram или хост с '_' вместо точек
+    """
+    host = (urlsplit(str(url)).hostname or 'unknown').lower()
+    return API_HOSTS.get(host, host.replace('.', '_'))
+
+
+def sanitize_url(url: str) -> str:
+    """URL для метрик: без query string и токена бота"""
+    parts = urlsplit(str(url))
+    return f"{parts.scheme}://{parts.netloc}{BOT_TOKEN_RE.sub('/bot***', parts.path)}"
+
+
+def _content_length(headers) -> Optional[int]:
+    value = headers.get('content-length') if headers is not None else None
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class HTTPCall:
+    """Замер одного HTTP запроса: фазы, размеры и итоговая запись метрики"""
+
+    __slots__ = ('api_name', 'endpoint', 'method', 'status_code', 'request_bytes',
+                 'response_bytes', 'phases', '_started', '_phase_started', '_finished')
+
+    def __init__(self, method: str, url: str, api_name: Optional[str] = None):
+        self.api_name = api_name or api_name_for_url(url)
+        self.endpoint = sanitize_url(url)
+        self.method = str(method).upper()
+        self.status_code: Optional[int] = None
+        self.request_bytes: Optional[int] = None
+        self.response_bytes: Optional[int] = None
+        self.phases: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._phase_started: Dict[str, float] = {}
+        self._finished = False
+
+    def _elapsed_ms(self, since: Optional[float] = None) -> float:
+        return round((time.perf_counter() - (since or self._started)) * 1000, 3)
+
+    def phase_started(self, phase: str):
+        self._phase_started[phase] = time.perf_counter()
+
+    def phase_finished(self, phase: str):
+        started = self._phase_started.pop(phase, None)
+        if started is not None:
+            self.phases[phase] = self._elapsed_ms(started)
+
+    def add_request_bytes(self, size: int):
+        self.request_bytes = (self.request_bytes or 0) + size
+
+    def add_response_bytes(self, size: int):
+        self.response_bytes = (self.response_bytes or 0) + size
+
+    def headers_received(self, status_code: int):
+        """Получены заголовки ответа (время до первого байта)"""
+        self.status_code = status_code
+        self.phases['ttfb'] = self._elapsed_ms()
+
+    def httpcore_trace(self, event_name: str, info: Dict[str, Any]):
+        """Обработчик расширения trace httpcore (события установки соединения)"""
+        name, _, stage = event_name.rpartition('.')
+        phase = HTTPCORE_PHASES.get(name)
+        if phase is None:
+            return
+        if stage == 'started':
+            self.phase_started(phase)
+        else:
+            self.phase_finished(phase)
+
+    async def httpcore_trace_async(self, event_name: str, info: Dict[str, Any]):
+        self.httpcore_trace(event_name, info)
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Записывает метрику (повторный вызов ничего не делает)"""
+        if self._finished:
+            return
+        self._finished = True
+
+        elapsed_ms = self._elapsed_ms()
+        success = error is None and self.status_code is not None and self.status_code < 400
+        if error is not None:
+            error_text = str(error)[:500] or type(error).__name__
+        elif not success:
+            error_text = f"HTTP {self.status_code}"
+        else:
+            error_text = None
+
+        try:
+            metrics_collector.record_api_call(
+                self.api_name, self.endpoint, self.method, self.status_code, elapsed_ms, success, error_text,
+                dns_ms=self.phases.get('dns'),
+                connect_ms=self.phases.get('connect'),
+                tls_ms=self.phases.get('tls'),
+                ttfb_ms=self.phases.get('ttfb'),
+                request_bytes=self.request_bytes,
+                response_bytes=self.response_bytes
+            )
+            add_event(
+                'http_request',
+                api=self.api_name, method=self.method, status_code=self.status_code,
+                duration_ms=elapsed_ms, ttfb_ms=self.phases.get('ttfb'), response_bytes=self.response_bytes
+            )
+        except Exception as e:
+            # Учет не должен ломать запрос
+            logger.debug(f"Ошибка записи метрики HTTP запроса: {e}")
+
+
+# ========================================================================
+# AIOHTTP
+# ========================================================================
+
+def aiohttp_trace_config(api_name: Optional[str] = None) -> 'aiohttp.TraceConfig':
+    """
+    TraceConfig для aiohttp.ClientSession(trace_configs=[...])
+
+    Метрика записывается, когда тело ответа дочитано. Если ответ закрыт
+    без чтения тела, метрика записывается при освобождении ответа.
+
+    Args:
+        api_name: Название API (по умолчанию определяется по хосту)
+
+    Returns:
+        aiohttp.TraceConfig
+    """
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, ctx, params):
+        ctx.call = HTTPCall(params.method, str(params.url), api_name)
+
+    async def on_dns_resolvehost_start(session, ctx, params):
+        ctx.call.phase_started('dns')
+
+    async def on_dns_resolvehost_end(session, ctx, params):
+        ctx.call.phase_finished('dns')
+
+    async def on_connection_create_start(session, ctx, params):
+        ctx.call.phase_started('connect')
+
+    async def on_connection_create_end(session, ctx, params):
+        ctx.call.phase_finished('connect')
+
+    async def on_request_chunk_sent(session, ctx, params):
+        ctx.call.add_request_bytes(len(params.chunk))
+
+    async def on_request_end(session, ctx, params):
+        call = ctx.call
+        response = params.response
+        content = response.content
+        call.headers_received(response.status)
+
+        def finish():
+            call.response_bytes = content.total_bytes
+            call.finish()
+
+        content.on_eof(finish)
+        weakref.finalize(response, finish)
+
+    async def on_request_exception(session, ctx, params):
+        ctx.call.finish(error=params.exception)
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+# ========================================================================
+# HTTPX
+# ========================================================================
+
+def _chain_trace(first: Callable, second: Optional[Callable]) -> Callable:
+    """Объединяет наш обработчик trace httpcore с уже заданным в запросе"""
+    if second is None:
+        return first
+
+    def chained(event_name, info):
+        first(event_name, info)
+        return second(event_name, info)
+
+    return chained
+
+
+if httpx is not None:
+
+    class _MeteredStream(httpx.SyncByteStream):
+        """Тело ответа, считающее байты и записывающее метрику при закрытии"""
+
+        def __init__(self, stream, call: HTTPCall):
+            self._stream = stream
+            self._call = call
+
+        def __iter__(self) -> Iterator[bytes]:
+            try:
+                for chunk in self._stream:
+                    self._call.add_response_bytes(len(chunk))
+                    yield chunk
+            except Exception as e:
+                self._call.finish(error=e)
+                raise
+
+        def close(self):
+            try:
+                self._stream.close()
+            finally:
+                self._call.finish()
+
+    class _AsyncMeteredStream(httpx.AsyncByteStream):
+        """Асинхронное тело ответа с подсчетом байт"""
+
+        def __init__(self, stream, call: HTTPCall):
+            self._stream = stream
+            self._call = call
+
+        async def __aiter__(self) -> AsyncIterator[bytes]:
+            try:
+                async for chunk in self._stream:
+                    self._call.add_response_bytes(len(chunk))
+                    yield chunk
+            except Exception as e:
+                self._call.finish(error=e)
+                raise
+
+        async def aclose(self):
+            try:
+                await self._stream.aclose()
+            finally:
+                self._call.finish()
+
+    class InstrumentedTransport(httpx.BaseTransport):
+        """Обертка синхронного транспорта httpx с записью метрик"""
+
+        def __init__(self, transport: Optional[httpx.BaseTransport] = None,
+                     api_name: Optional[str] = None, **transport_kwargs):
+            """
+            Args:
+                transport: Исходный транспорт (по умолчанию httpx.HTTPTransport)
+                api_name: Название API (по умолчанию определяется по хосту)
+                **transport_kwargs: Параметры httpx.HTTPTransport (limits, http2...)
+            """
+            self._transport = transport or httpx.HTTPTransport(**transport_kwargs)
+            self.api_name = api_name
+
+        def handle_request(self, request: 'httpx.Request') -> 'httpx.Response':
+            call = HTTPCall(request.method, str(request.url), self.api_name)
+            call.request_bytes = _content_length(request.headers)
+            request.extensions['trace'] = _chain_trace(call.httpcore_trace, request.extensions.get('trace'))
+
+            try:
+                response = self._transport.handle_request(request)
+            except Exception as e:
+                call.finish(error=e)
+                raise
+
+            call.headers_received(response.status_code)
+            response.stream = _MeteredStream(response.stream, call)
+            return response
+
+        def close(self):
+            self._transport.close()
+
+    class InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+        """Обертка асинхронного транспорта httpx с записью метрик"""
+
+        def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None,
+                     api_name: Optional[str] = None, **transport_kwargs):
+            """
+            Args:
+                transport: Исходный транспорт (по умолчанию httpx.AsyncHTTPTransport)
+                api_name: Название API (по умолчанию определяется по хосту)
+                **transport_kwargs: Параметры httpx.AsyncHTTPTransport (limits, http2...)
+            """
+            self._transport = transport or httpx.AsyncHTTPTransport(**transport_kwargs)
+            self.api_name = api_name
+
+        async def handle_async_request(self, request: 'httpx.Request') -> 'httpx.Response':
+            call = HTTPCall(request.method, str(request.url), self.api_name)
+            call.request_bytes = _content_length(request.headers)
+            previous = request.extensions.get('trace')
+
+            async def trace(event_name, info):
+                await call.httpcore_trace_async(event_name, info)
+                if previous is not None:
+                    await previous(event_name, info)
+
+            request.extensions['trace'] = trace
+
+            try:
+                response = await self._transport.handle_async_request(request)
+            except Exception as e:
+                call.finish(error=e)
+                raise
+
+            call.headers_received(response.status_code)
+            response.stream = _AsyncMeteredStream(response.stream, call)
+            return response
+
+        async def aclose(self):
+            await self._transport.aclose()
+
+
+# ========================================================================
+# REQUESTS
+# ========================================================================
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter для requests.Session с записью метрик"""
+
+    def __init__(self, api_name: Optional[str] = None, **kwargs):
+        self.api_name = api_name
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        call = HTTPCall(request.method, request.url, self.api_name)
+        call.request_bytes = _content_length(request.headers)
+
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+            call.headers_received(response.status_code)
+            if stream:
+                # Тело читает вызывающий код - размер известен только из заголовков
+                call.response_bytes = _content_length(response.headers)
+            else:
+                # Session все равно дочитает тело сразу после send
+                call.response_bytes = len(response.content)
+        except Exception as e:
+            call.finish(error=e)
+            raise
+
+        call.finish()
+        return response
+
+
+def instrumented_session(api_name: Optional[str] = None) -> 'requests.Session':
+    """
+    requests.Session, все запросы которой записываются в метрики
+
+    Args:
+        api_name: Название API (по умолчанию определяется по хосту)
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = InstrumentedHTTPAdapter(api_name)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
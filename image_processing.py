@@ -0,0 +1,185 @@
+"""
+Постобработка изображений для NEWSMAKER
+
+Перекодирует сгенерированные комиксы (PNG от gpt-image-1, 1-3 МБ) в WebP,
+JPEG или оптимизированный PNG с ограничением размера стороны. Кодирование
+выполняется в пуле процессов, чтобы не блокировать event loop конвейера.
+"""
+
+import io
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from loguru import logger
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# Поддерживаемые форматы: имя в настройках -> (формат Pillow, расширение файла)
+TRANSCODE_FORMATS = {
+    'webp': ('WEBP', '.webp'),
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png')
+}
+
+DEFAULT_FORMAT = 'webp'
+DEFAULT_QUALITY = 85
+DEFAULT_MAX_DIMENSION = 1280
+DEFAULT_WORKERS = 2
+
+
+def transcode_image(image_bytes: bytes, image_format: str = DEFAULT_FORMAT,
+                    quality: int = DEFAULT_QUALITY,
+                    max_dimension: Optional[int] = DEFAULT_MAX_DIMENSION) -> bytes:
+    """
+    Перекодирует изображение (выполняется в дочернем процессе)
+
+    Args:
+        image_bytes: Исходные данные изображения
+        image_format: Ключ TRANSCODE_FORMATS
+        quality: Качество 1-100 (для PNG не используется)
+        max_dimension: Максимальная длина большей стороны (None - без уменьшения)
+
+    Returns:
+        bytes: Перекодированное изображение
+    """
+    pillow_format, _ = TRANSCODE_FORMATS[image_format]
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.load()
+
+        if max_dimension and max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        # JPEG не поддерживает прозрачность
+        if pillow_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        output = io.BytesIO()
+        if pillow_format == 'PNG':
+            image.save(output, format='PNG', optimize=True)
+        elif pillow_format == 'JPEG':
+            image.save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+        else:
+            image.save(output, format='WEBP', quality=quality, method=6)
+
+        return output.getvalue()
+
+
+class ImageTranscoder:
+    """Стадия перекодирования изображений в пуле процессов"""
+
+    def __init__(self, image_format: str = DEFAULT_FORMAT, quality: int = DEFAULT_QUALITY,
+                 max_dimension: Optional[int] = DEFAULT_MAX_DIMENSION,
+                 workers: int = DEFAULT_WORKERS):
+        """
+        Инициализация (процессы запускаются при первом перекодировании)
+
+        Args:
+            image_format: Целевой формат ('webp', 'jpeg', 'png')
+            quality: Качество 1-100
+            max_dimension: Максимальная длина большей стороны
+            workers: Количество процессов кодирования
+        """
+        if image_format not in TRANSCODE_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат изображения: {image_format}")
+
+        self.image_format = image_format
+        self.quality = quality
+        self.max_dimension = max_dimension
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, transcode_config: Optional[Dict]) -> Optional['ImageTranscoder']:
+        """
+        Создает транскодер из секции content.image_transcode веб-конфига
+
+        Args:
+            transcode_config: Настройки ({'enabled', 'format', 'quality', 'max_dimension', 'workers'})
+
+        Returns:
+            ImageTranscoder или None если стадия выключена или Pillow не установлен
+        """
+        if not transcode_config or not transcode_config.get('enabled', False):
+            return None
+
+        if Image is None:
+            logger.warning("⚠️ Перекодирование изображений включено, но Pillow не установлен - пропускаем")
+            return None
+
+        return cls(
+            image_format=transcode_config.get('format', DEFAULT_FORMAT),
+            quality=transcode_config.get('quality', DEFAULT_QUALITY),
+            max_dimension=transcode_config.get('max_dimension', DEFAULT_MAX_DIMENSION),
+            workers=transcode_config.get('workers', DEFAULT_WORKERS)
+        )
+
+    @property
+    def extension(self) -> str:
+        """Расширение файла для целевого формата"""
+        return TRANSCODE_FORMATS[self.image_format][1]
+
+    @property
+    def variant(self) -> str:
+        """Идентификатор настроек (для ключа кеша изображений)"""
+        return f"{self.image_format}-q{self.quality}-{self.max_dimension or 'orig'}"
+
+    async def transcode_async(self, image_bytes: bytes) -> Tuple[bytes, bool]:
+        """
+        Перекодирует изображение в пуле процессов
+
+        При ошибке кодирования возвращает исходные байты: изображение
+        важнее экономии места.
+
+        Args:
+            image_bytes: Исходные данные изображения
+
+        Returns:
+            Tuple: (перекодированное или исходное изображение, удалось ли перекодирование)
+        """
+        if self._executor is None:
+            # spawn вместо fork: процесс многопоточный (сэмплер, экспорт метрик,
+            # event loop рантайма), и fork мог бы унести в дочерний процесс
+            # захваченные чужими потоками блокировки
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+
+        loop = asyncio.get_running_loop()
+        try:
+            transcoded = await loop.run_in_executor(
+                self._executor, transcode_image,
+                image_bytes, self.image_format, self.quality, self.max_dimension
+            )
+            return transcoded, True
+        except Exception as e:
+            logger.error(f"💥 Ошибка перекодирования изображения: {e}")
+            return image_bytes, False
+
+    def shutdown(self):
+        """Останавливает пул процессов"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def detect_image_extension(image_bytes: bytes) -> str:
+    """
+    Определяет расширение файла по сигнатуре изображения
+
+    Args:
+        image_bytes: Данные изображения
+
+    Returns:
+        str: '.webp', '.jpg' или '.png' (по умолчанию)
+    """
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return '.webp'
+    if image_bytes[:3] == b'\xff\xd8\xff':
+        return '.jpg'
+    return '.png'
@@ -19,6 +19,10 @@ from perplexity_client import PerplexityClient
 from telegram_client import TelegramClient
 from news_collector import NewsCollector
 from news_publisher import NewsPublisher
+from monitoring import metrics_collector, load_merged_timers, TIMER_RETENTION_DAYS
+from metrics_exporter import start_metrics_exporter
+from file_utils import safe_json_read
+from async_runtime import runtime
 
 # Импорт планировщиков - используем wrapper для совместимости
 from scheduler import NewsmakerScheduler  # Это wrapper с автовыбором архитектуры
@@ -64,6 +68,8 @@ def scheduler_mode():
     """Режим планировщика - постоянная работа"""
     logger.info("⏰ Запуск в режиме планировщика...")
     
+    # Один event loop на процесс: сбор, изображения и публикации идут в нем
+    runtime.start()
     scheduler = NewsmakerScheduler()
     
     # Сначала тестируем компоненты
@@ -75,6 +81,12 @@ def scheduler_mode():
     
     logger.info("✅ Компоненты готовы к работе")
     
+    # Системные метрики снимаются в фоне, чтобы проверки здоровья не ждали замер CPU
+    web_config = safe_json_read(Path("config_web.json")) if Path("config_web.json").exists() else None
+    monitoring_config = web_config.get('monitoring', {}) if web_config else {}
+    metrics_collector.start_system_sampler(monitoring_config.get('system_sample_interval'))
+    start_metrics_exporter(web_config)
+    
     # Запускаем планировщик
     try:
         scheduler.start_scheduler()
@@ -83,6 +95,9 @@ def scheduler_mode():
     except Exception as e:
         logger.error(f"💥 Критическая ошибка планировщика: {e}")
         return False
+    finally:
+        # Закрываем общие HTTP сессии и пул соединений Telegram до выхода интерпретатора
+        runtime.shutdown()
     
     return True
 
@@ -103,6 +118,25 @@ def collect_news_mode():
         sys.exit(1)
 
 
+def import_json_mode():
+    """Перенос файлов новостей в SQLite хранилище"""
+    from news_store import SQLiteNewsStore, DEFAULT_SQLITE_FILE
+    from file_utils import safe_json_read
+    
+    web_config = safe_json_read(Path("config_web.json")) if Path("config_web.json").exists() else None
+    storage_config = web_config.get('storage', {}) if web_config else {}
+    db_path = Path(storage_config.get('sqlite_path') or Path(config.DATA_DIR) / DEFAULT_SQLITE_FILE)
+    
+    logger.info(f"📥 Импорт файлов новостей в {db_path}...")
+    store = SQLiteNewsStore(db_path)
+    imported = store.import_json_files(Path(config.DATA_DIR), overwrite=True)
+    store.close()
+    
+    logger.info(f"✅ Импортировано подборок: {imported}")
+    if storage_config.get('news_backend') != 'sqlite':
+        logger.info("💡 Чтобы использовать базу, укажите storage.news_backend = \"sqlite\" в config_web.json")
+
+
 def publish_next_mode():
     """Публикация следующей новости"""
     logger.info("📱 Публикация следующей новости...")
@@ -205,6 +239,20 @@ def status_mode():
     else:
         logger.info("   ❌ Нет данных о публикациях")
     
+    # Гистограммы, сохранённые всеми процессами (планировщик, сбор, публикация)
+    timers = load_merged_timers()
+    
+    logger.info(f"\n⏱️ ВРЕМЯ ОПЕРАЦИЙ (все процессы, {TIMER_RETENTION_DAYS} дн.):")
+    if timers:
+        for operation, histogram in sorted(timers.items()):
+            summary = histogram.summary()
+            logger.info(
+                f"   {operation}: {summary['count']} шт., p50 {summary['p50_ms']:.0f} мс, "
+                f"p90 {summary['p90_ms']:.0f} мс, p99 {summary['p99_ms']:.0f} мс"
+            )
+    else:
+        logger.info("   ❌ Нет сохранённых замеров")
+    
     logger.info("=" * 50)
 
 
@@ -298,6 +346,8 @@ def main():
                       help='Принудительная публикация приоритет N (1-5)')
     group.add_argument('--test-publish-all', action='store_true',
                       help='🧪 ТЕСТ: Опубликовать все новости подряд с интервалом 6 сек')
+    group.add_argument('--import-json', action='store_true',
+                      help='Перенести файлы новостей в SQLite хранилище')
     
     # Legacy команды
     group.add_argument('--run', action='store_true',
@@ -347,6 +397,10 @@ def main():
             test_publish_all_mode()
             sys.exit(0)
             
+        elif args.import_json:
+            import_json_mode()
+            sys.exit(0)
+            
         # Legacy команды
         elif args.run:
             manual_run()
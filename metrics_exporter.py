@@ -0,0 +1,251 @@
+"""
+Экспорт метрик NEWSMAKER в формате OpenMetrics (Prometheus)
+
+HTTP endpoint /metrics в отдельном потоке процесса планировщика. Отдает
+счетчики metrics_collector, перцентили длительностей операций и API
+вызовов, число вызовов и долю ошибок по API, долю попаданий в кеши и
+последний замер системных метрик. Включается в config_web.json:
+monitoring.exporter_enabled = true.
+"""
+
+import re
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from loguru import logger
+
+from monitoring import metrics_collector, LatencyHistogram
+
+
+DEFAULT_EXPORTER_HOST = "127.0.0.1"
+DEFAULT_EXPORTER_PORT = 9108
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRIC_PREFIX = "newsmaker"
+QUANTILES = (0.5, 0.9, 0.99)
+
+API_COUNTER_RE = re.compile(r'^api_(.+)_(total|success|failed)$')
+CACHE_COUNTER_RE = re.compile(r'^cache_(.+)_(hit_memory|hit_file|miss)$')
+
+
+def _escape(value: str) -> str:
+    """Экранирует значение метки"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class _Family:
+    """Одно семейство метрик (строки TYPE/HELP и сэмплы)"""
+
+    def __init__(self, name: str, metric_type: str, help_text: str):
+        self.name = f"{METRIC_PREFIX}_{name}"
+        self.lines = [f"# TYPE {self.name} {metric_type}", f"# HELP {self.name} {help_text}"]
+
+    def add(self, value: float, suffix: str = '', **labels):
+        self.lines.append(f"{self.name}{suffix}{_labels(**labels)} {_number(value)}")
+
+    def add_summary(self, histogram: LatencyHistogram, **labels):
+        """Перцентили гистограммы (в секундах) как OpenMetrics summary"""
+        for quantile in QUANTILES:
+            self.add(histogram.quantile(quantile) / 1000, **labels, quantile=str(quantile))
+        self.add(histogram.total / 1000, '_sum', **labels)
+        self.add(histogram.count, '_count', **labels)
+
+
+def render_metrics() -> str:
+    """
+    Формирует текст метрик в формате OpenMetrics
+
+    Returns:
+        str: Текст для ответа /metrics
+    """
+    counters = dict(metrics_collector.counters)
+    families: List[_Family] = []
+
+    # Все счетчики коллектора как есть
+    events = _Family('events', 'counter', 'Счетчики metrics_collector')
+    for name, value in sorted(counters.items()):
+        events.add(value, '_total', name=name)
+    families.append(events)
+
+    # Операции: результаты и перцентили длительности
+    operations = _Family('operations', 'counter', 'Выполненные операции по результату')
+    durations = _Family('operation_duration_seconds', 'summary', 'Длительность операций')
+    for operation, histogram in sorted(metrics_collector.timers.copy().items()):
+        operations.add(counters.get(f"{operation}_success", 0), '_total', operation=operation, outcome='success')
+        operations.add(counters.get(f"{operation}_failed", 0), '_total', operation=operation, outcome='failed')
+        durations.add_summary(histogram, operation=operation)
+    families.extend([operations, durations])
+
+    # API: вызовы, доля ошибок и время ответа
+    api_totals: Dict[str, Dict[str, int]] = {}
+    for name, value in counters.items():
+        match = API_COUNTER_RE.match(name)
+        if match:
+            api_totals.setdefault(match.group(1), {})[match.group(2)] = value
+
+    api_calls = _Family('api_calls', 'counter', 'Вызовы внешних API по результату')
+    api_error_ratio = _Family('api_error_ratio', 'gauge', 'Доля неуспешных вызовов API')
+    for api_name, totals in sorted(api_totals.items()):
+        api_calls.add(totals.get('success', 0), '_total', api=api_name, outcome='success')
+        api_calls.add(totals.get('failed', 0), '_total', api=api_name, outcome='failed')
+        total = totals.get('total', 0)
+        api_error_ratio.add(totals.get('failed', 0) / total if total else 0.0, api=api_name)
+
+    api_latency = _Family('api_latency_seconds', 'summary', 'Время ответа внешних API')
+    for api_name, histogram in sorted(metrics_collector.api_timers.copy().items()):
+        api_latency.add_summary(histogram, api=api_name)
+
+    api_phases = _Family('api_phase_seconds', 'summary', 'Фазы HTTP запросов к API: DNS, соединение, TLS, первый байт')
+    for (api_name, phase), histogram in sorted(metrics_collector.api_phase_timers.copy().items()):
+        api_phases.add_summary(histogram, api=api_name, phase=phase)
+    families.extend([api_calls, api_error_ratio, api_latency, api_phases])
+
+    # Кеши: обращения и доля попаданий
+    cache_totals: Dict[str, Dict[str, int]] = {}
+    for name, value in counters.items():
+        match = CACHE_COUNTER_RE.match(name)
+        if match:
+            cache_totals.setdefault(match.group(1), {})[match.group(2)] = value
+    # Хранилище изображений считает попадания отдельно
+    if 'image_cache_hit' in counters or 'image_cache_miss' in counters:
+        cache_totals['image_store'] = {
+            'hit_file': counters.get('image_cache_hit', 0),
+            'miss': counters.get('image_cache_miss', 0)
+        }
+
+    cache_requests = _Family('cache_requests', 'counter', 'Обращения к кешу по результату')
+    cache_hit_ratio = _Family('cache_hit_ratio', 'gauge', 'Доля попаданий в кеш')
+    for cache_name, totals in sorted(cache_totals.items()):
+        for result in ('hit_memory', 'hit_file', 'miss'):
+            if result in totals:
+                cache_requests.add(totals[result], '_total', cache=cache_name, result=result)
+        hits = totals.get('hit_memory', 0) + totals.get('hit_file', 0)
+        requests_count = hits + totals.get('miss', 0)
+        cache_hit_ratio.add(hits / requests_count if requests_count else 0.0, cache=cache_name)
+    families.extend([cache_requests, cache_hit_ratio])
+
+    # Мгновенные значения (глубина очередей и т.п.)
+    gauges = _Family('gauge', 'gauge', 'Мгновенные значения metrics_collector')
+    for name, value in sorted(dict(metrics_collector.gauges).items()):
+        if isinstance(value, (int, float)):
+            gauges.add(value, name=name)
+    families.append(gauges)
+
+    # Последний замер системных метрик (без ожидания)
+    system_metric = metrics_collector.system_sampler.latest()
+    if system_metric is not None:
+        system = _Family('system', 'gauge', 'Последний замер системных метрик')
+        for field in ('cpu_percent', 'memory_percent', 'disk_percent', 'rss_mb', 'open_fds'):
+            system.add(getattr(system_metric, field), resource=field)
+        families.append(system)
+
+    uptime = _Family('uptime_seconds', 'gauge', 'Время работы процесса')
+    uptime.add(time.time() - metrics_collector.start_time)
+    families.append(uptime)
+
+    lines = []
+    for family in families:
+        lines.extend(family.lines)
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Обработчик GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        try:
+            body = render_metrics().encode('utf-8')
+        except Exception as e:
+            logger.error(f"Ошибка формирования метрик: {e}")
+            self.send_error(500)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Запросы скрейпера не пишем в лог
+        pass
+
+
+class MetricsExporter:
+    """HTTP сервер метрик в фоновом потоке"""
+
+    def __init__(self, host: str = DEFAULT_EXPORTER_HOST, port: int = DEFAULT_EXPORTER_PORT):
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """
+        Запускает сервер
+
+        Returns:
+            bool: True если сервер запущен
+        """
+        if self._server is not None:
+            return True
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            logger.error(f"❌ Не удалось запустить экспорт метрик на {self.host}:{self.port}: {e}")
+            return False
+
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        logger.info(f"📈 Метрики доступны на http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        """Останавливает сервер"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+
+
+def start_metrics_exporter(web_config: Optional[Dict] = None) -> Optional[MetricsExporter]:
+    """
+    Запускает экспорт метрик, если он включен в конфигурации
+
+    Args:
+        web_config: Конфигурация из веб-интерфейса (раздел monitoring)
+
+    Returns:
+        MetricsExporter или None, если экспорт выключен или не запустился
+    """
+    monitoring_config = web_config.get('monitoring', {}) if web_config else {}
+    if not monitoring_config.get('exporter_enabled', False):
+        return None
+
+    exporter = MetricsExporter(
+        host=monitoring_config.get('exporter_host', DEFAULT_EXPORTER_HOST),
+        port=int(monitoring_config.get('exporter_port', DEFAULT_EXPORTER_PORT))
+    )
+    return exporter if exporter.start() else None
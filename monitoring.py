@@ -4,20 +4,26 @@
 Обеспечивает отслеживание производительности, сбор метрик и алертинг.
 """
 
+import os
+import math
 import time
 import json
+import socket
+import threading
 import psutil
 import platform
+import inspect
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List, Callable
+from typing import Dict, Any, Optional, List, Callable, Tuple
 from dataclasses import dataclass, asdict
 from collections import deque, defaultdict
 from functools import wraps
 from loguru import logger
 
 import config
-from file_utils import safe_json_write, safe_json_read, ensure_directory
+from file_utils import safe_json_write, safe_json_read, ensure_directory, atomic_write, FileLock
+from tracing import tracer
 
 
 # ========================================================================
@@ -32,6 +38,20 @@ PERFORMANCE_METRICS_FILE = METRICS_DIR / "performance.json"
 API_METRICS_FILE = METRICS_DIR / "api_calls.json"
 ERROR_METRICS_FILE = METRICS_DIR / "errors.json"
 DAILY_STATS_FILE = METRICS_DIR / "daily_stats.json"
+TIMER_METRICS_FILE = METRICS_DIR / "timers.json"
+
+# Гистограммы времени выполнения
+HISTOGRAM_RELATIVE_ERROR = 0.02  # Погрешность перцентилей не более 2%
+HISTOGRAM_MIN_MS = 0.01  # Меньшие значения попадают в нижний бакет
+TIMER_RETENTION_DAYS = 7  # Снимки завершившихся процессов хранятся неделю
+
+# Фоновый сбор системных метрик
+SYSTEM_SAMPLE_INTERVAL = 15.0  # Секунд между замерами
+SYSTEM_SAMPLE_BUFFER = 240  # Кольцевой буфер: час истории при интервале 15 сек
+SYSTEM_CPU_MIN_WINDOW = 0.5  # Минимальное окно для замера загрузки CPU, сек
+
+# Фазы HTTP запросов с отдельными гистограммами
+API_PHASES = ('dns', 'connect', 'tls', 'ttfb')
 
 # Лимиты для алертов
 ALERT_THRESHOLDS = {
@@ -41,6 +61,8 @@ ALERT_THRESHOLDS = {
     'api_error_rate': 0.3,  # 30% ошибок
     'response_time_ms': 5000,  # 5 секунд
 }
+# Пока набор превышенных системных порогов не меняется, алерт повторяется не чаще
+SYSTEM_ALERT_REPEAT_INTERVAL = 30 * 60  # секунд
 
 
 # ========================================================================
@@ -71,7 +93,14 @@ class APICallMetric:
     response_time_ms: float
     success: bool
     error: Optional[str] = None
-    
+    # Фазы запроса (заполняются транспортными хуками, None - фаза не измерялась)
+    dns_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    tls_ms: Optional[float] = None
+    ttfb_ms: Optional[float] = None
+    request_bytes: Optional[int] = None
+    response_bytes: Optional[int] = None
+
     def to_dict(self) -> Dict:
         return asdict(self)
 
@@ -86,6 +115,8 @@ class SystemMetric:
     disk_percent: float
     disk_free_gb: float
     process_count: int
+    rss_mb: float = 0.0
+    open_fds: int = 0
     
     def to_dict(self) -> Dict:
         return asdict(self)
@@ -112,6 +143,268 @@ class DailyStats:
         return asdict(self)
 
 
+class LatencyHistogram:
+    """
+    Гистограмма длительностей с фиксированной памятью
+    
+    Логарифмические бакеты (как в HDR/DDSketch): значение попадает в бакет
+    с границами, растущими в (1 + 2·погрешность) раз, поэтому любой
+    перцентиль оценивается с относительной погрешностью не более
+    HISTOGRAM_RELATIVE_ERROR. Диапазон от 0.01 мс до суток укладывается
+    примерно в 800 бакетов независимо от числа замеров. Гистограммы с
+    одинаковой погрешностью складываются (merge), что позволяет сводить
+    замеры разных процессов.
+    """
+    
+    def __init__(self, relative_error: float = HISTOGRAM_RELATIVE_ERROR):
+        self.relative_error = relative_error
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+    
+    def _bucket(self, value: float) -> int:
+        return math.ceil(math.log(max(value, HISTOGRAM_MIN_MS)) / self._log_gamma)
+    
+    def _bucket_value(self, index: int) -> float:
+        # Середина бакета в смысле относительной погрешности
+        return 2 * self._gamma ** index / (1 + self._gamma)
+    
+    def record(self, value: float):
+        """
+        Добавляет замер
+        
+        Args:
+            value: Длительность в миллисекундах
+        """
+        self.buckets[self._bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def quantile(self, q: float) -> float:
+        """
+        Оценка перцентиля
+        
+        Args:
+            q: Доля от 0 до 1 (0.99 = p99)
+            
+        Returns:
+            float: Значение в миллисекундах (0.0 если замеров нет)
+        """
+        if not self.count:
+            return 0.0
+        
+        # Ранг по методу ближайшего ранга: ceil(q·n)-й по порядку замер
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+    
+    def merge(self, other: 'LatencyHistogram'):
+        """
+        Добавляет замеры другой гистограммы
+        
+        Args:
+            other: Гистограмма с той же погрешностью
+        """
+        if other.relative_error != self.relative_error:
+            raise ValueError("Нельзя сложить гистограммы с разной погрешностью")
+        
+        for index, bucket_count in other.buckets.items():
+            self.buckets[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    
+    def summary(self) -> Dict[str, float]:
+        """Сводка: количество, среднее, p50/p90/p99 и максимум"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean, 2),
+            'p50_ms': round(self.quantile(0.5), 2),
+            'p90_ms': round(self.quantile(0.9), 2),
+            'p99_ms': round(self.quantile(0.99), 2),
+            'max_ms': round(self.max, 2)
+        }
+    
+    def to_dict(self) -> Dict:
+        return {
+            'relative_error': self.relative_error,
+            'count': self.count,
+            'total': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max,
+            'buckets': {str(index): bucket_count for index, bucket_count in self.buckets.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        histogram = cls(data.get('relative_error', HISTOGRAM_RELATIVE_ERROR))
+        histogram.buckets.update({int(index): bucket_count for index, bucket_count in data.get('buckets', {}).items()})
+        histogram.count = data.get('count', 0)
+        histogram.total = data.get('total', 0.0)
+        histogram.min = data['min'] if data.get('min') is not None else math.inf
+        histogram.max = data.get('max', 0.0)
+        return histogram
+
+
+# ========================================================================
+# ФОНОВЫЙ СБОР СИСТЕМНЫХ МЕТРИК
+# ========================================================================
+
+class SystemSampler:
+    """
+    Фоновый поток, снимающий системные метрики с заданным интервалом
+    
+    Замеры складываются в кольцевой буфер фиксированного размера, последний
+    читается за O(1). CPU считается неблокирующим psutil.cpu_percent(None)
+    как загрузка между соседними замерами, поэтому ни поток, ни читатели
+    не ждут секундное окно измерения.
+    """
+    
+    def __init__(self, buffer: deque, interval: float = SYSTEM_SAMPLE_INTERVAL,
+                 on_sample: Optional[Callable[['SystemMetric'], None]] = None):
+        """
+        Args:
+            buffer: Кольцевой буфер замеров (deque с maxlen)
+            interval: Интервал между замерами в секундах
+            on_sample: Вызывается для каждого нового замера (алерты)
+        """
+        self.buffer = buffer
+        self.interval = interval
+        self.on_sample = on_sample
+        self._process = psutil.Process()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        
+        # Первый вызов без интервала задаёт точку отсчета для следующего
+        psutil.cpu_percent(interval=None)
+        self._cpu_reference = time.monotonic()
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, interval: Optional[float] = None):
+        """
+        Запускает фоновый сбор (повторный вызов меняет интервал)
+        
+        Args:
+            interval: Интервал между замерами в секундах
+        """
+        if interval:
+            self.interval = max(1.0, float(interval))
+        
+        with self._lock:
+            if self.running:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+            self._thread.start()
+        
+        logger.debug(f"📈 Фоновый сбор системных метрик: каждые {self.interval:.0f} сек")
+    
+    def stop(self):
+        """Останавливает фоновый сбор"""
+        self._stop_event.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Ошибка сбора системных метрик: {e}")
+            self._stop_event.wait(self.interval)
+    
+    def sample(self) -> 'SystemMetric':
+        """
+        Снимает замер без блокировки и добавляет его в буфер
+        
+        Returns:
+            SystemMetric с текущими показателями
+        """
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        
+        with self._process.oneshot():
+            rss = self._process.memory_info().rss
+            open_fds = self._process.num_fds() if hasattr(self._process, 'num_fds') else self._process.num_handles()
+        
+        metric = SystemMetric(
+            timestamp=datetime.now().isoformat(),
+            cpu_percent=self._cpu_percent(),
+            memory_percent=memory.percent,
+            memory_mb=memory.used / (1024 * 1024),
+            disk_percent=disk.percent,
+            disk_free_gb=disk.free / (1024 * 1024 * 1024),
+            process_count=len(psutil.pids()),
+            rss_mb=rss / (1024 * 1024),
+            open_fds=open_fds
+        )
+        
+        # deque.append атомарен - читателям блокировка не нужна
+        self.buffer.append(metric)
+        
+        if self.on_sample:
+            self.on_sample(metric)
+        
+        return metric
+    
+    def _cpu_percent(self) -> float:
+        """Загрузка CPU с предыдущего замера (без ожидания)"""
+        now = time.monotonic()
+        if now - self._cpu_reference >= SYSTEM_CPU_MIN_WINDOW:
+            self._cpu_reference = now
+            return psutil.cpu_percent(interval=None)
+        
+        # Окно слишком короткое для осмысленного значения
+        previous = self.latest()
+        if previous is not None:
+            return previous.cpu_percent
+        load_1m = psutil.getloadavg()[0]
+        return min(100.0, load_1m / (psutil.cpu_count() or 1) * 100)
+    
+    def latest(self, max_age: Optional[float] = None) -> Optional['SystemMetric']:
+        """
+        Последний замер за O(1)
+        
+        Args:
+            max_age: Максимальный возраст замера в секундах (None = любой)
+            
+        Returns:
+            SystemMetric или None, если подходящего замера нет
+        """
+        try:
+            metric = self.buffer[-1]
+        except IndexError:
+            return None
+        
+        if max_age is not None:
+            age = (datetime.now() - datetime.fromisoformat(metric.timestamp)).total_seconds()
+            if age > max_age:
+                return None
+        
+        return metric
+
+
 # ========================================================================
 # КОЛЛЕКТОРЫ МЕТРИК
 # ========================================================================
@@ -123,14 +416,29 @@ class MetricsCollector:
         self.performance_buffer = deque(maxlen=1000)
         self.api_buffer = deque(maxlen=1000)
         self.error_buffer = deque(maxlen=500)
-        self.system_metrics_buffer = deque(maxlen=100)
+        self.system_metrics_buffer = deque(maxlen=SYSTEM_SAMPLE_BUFFER)
+        self.system_sampler = SystemSampler(self.system_metrics_buffer, on_sample=self._check_system_alerts)
         
         # Счетчики для быстрого доступа
         self.counters = defaultdict(int)
-        self.timers = defaultdict(list)
+        # Гистограммы длительностей по операциям (память не растёт с числом замеров)
+        self.timers: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.api_timers: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        # Фазы HTTP запросов по ключу (api, фаза): dns, connect, tls, ttfb
+        self.api_phase_timers: Dict[Tuple[str, str], LatencyHistogram] = defaultdict(LatencyHistogram)
+        
+        # Мгновенные значения (глубина очередей конвейера и т.п.)
+        self.gauges = {}
         
         # Время запуска для расчета uptime
         self.start_time = time.time()
+        
+        # Последний залогированный набор системных алертов (сэмплер проверяет каждые 15 сек)
+        self._system_alerts = frozenset()
+        self._system_alerts_logged_at = 0.0
+        
+        # Раздел этого процесса в общем файле гистограмм
+        self.process_id = f"{socket.gethostname()}:{os.getpid()}:{int(self.start_time)}"
     
     def record_performance(
         self,
@@ -166,12 +474,25 @@ class MetricsCollector:
             self.counters[f"{operation}_failed"] += 1
         
         # Записываем время выполнения
-        self.timers[operation].append(duration_ms)
+        self.timers[operation].record(duration_ms)
         
         # Логируем если операция медленная
         if duration_ms > ALERT_THRESHOLDS['response_time_ms']:
             logger.warning(f"Медленная операция {operation}: {duration_ms:.0f}ms")
     
+    def record_queue_depth(self, queue_name: str, depth: int):
+        """
+        Записывает текущую глубину очереди и её максимум
+        
+        Args:
+            queue_name: Название очереди (стадии конвейера)
+            depth: Текущее количество элементов в очереди
+        """
+        self.gauges[f"queue_{queue_name}_depth"] = depth
+        max_key = f"queue_{queue_name}_max_depth"
+        if depth > self.gauges.get(max_key, 0):
+            self.gauges[max_key] = depth
+    
     def record_api_call(
         self,
         api_name: str,
@@ -180,7 +501,13 @@ class MetricsCollector:
         status_code: Optional[int],
         response_time_ms: float,
         success: bool,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        dns_ms: Optional[float] = None,
+        connect_ms: Optional[float] = None,
+        tls_ms: Optional[float] = None,
+        ttfb_ms: Optional[float] = None,
+        request_bytes: Optional[int] = None,
+        response_bytes: Optional[int] = None
     ):
         """
         Записывает метрику API вызова
@@ -193,7 +520,17 @@ class MetricsCollector:
             response_time_ms: Время ответа в мс
             success: Успешность вызова
             error: Описание ошибки
+            dns_ms: Время DNS-запроса (None - фаза не измерялась)
+            connect_ms: Время установки TCP соединения
+            tls_ms: Время TLS рукопожатия
+            ttfb_ms: Время до первого байта ответа
+            request_bytes: Размер тела запроса
+            response_bytes: Размер тела ответа
         """
+        phases = {
+            'dns_ms': dns_ms, 'connect_ms': connect_ms, 'tls_ms': tls_ms, 'ttfb_ms': ttfb_ms,
+            'request_bytes': request_bytes, 'response_bytes': response_bytes
+        }
         metric = APICallMetric(
             timestamp=datetime.now().isoformat(),
             api_name=api_name,
@@ -202,7 +539,8 @@ class MetricsCollector:
             status_code=status_code,
             response_time_ms=response_time_ms,
             success=success,
-            error=error
+            error=error,
+            **phases
         )
         
         self.api_buffer.append(metric)
@@ -214,6 +552,12 @@ class MetricsCollector:
         else:
             self.counters[f"api_{api_name}_failed"] += 1
         
+        self.api_timers[api_name].record(response_time_ms)
+        for phase in API_PHASES:
+            value = phases.get(f"{phase}_ms")
+            if value is not None:
+                self.api_phase_timers[(api_name, phase)].record(value)
+        
         # Проверяем error rate
         self._check_api_error_rate(api_name)
     
@@ -253,44 +597,37 @@ class MetricsCollector:
     
     def collect_system_metrics(self) -> SystemMetric:
         """
-        Собирает метрики системы
+        Возвращает текущие метрики системы без блокировки
+        
+        Берется последний замер фонового сборщика (он запускается при
+        первом обращении). Если свежего замера нет, замер снимается сразу,
+        тоже без ожидания.
         
         Returns:
             SystemMetric с текущими показателями
         """
-        # CPU
-        cpu_percent = psutil.cpu_percent(interval=1)
+        if not self.system_sampler.running:
+            self.system_sampler.start()
         
-        # Память
-        memory = psutil.virtual_memory()
-        memory_percent = memory.percent
-        memory_mb = memory.used / (1024 * 1024)
-        
-        # Диск
-        disk = psutil.disk_usage('/')
-        disk_percent = disk.percent
-        disk_free_gb = disk.free / (1024 * 1024 * 1024)
-        
-        # Процессы
-        process_count = len(psutil.pids())
-        
-        metric = SystemMetric(
-            timestamp=datetime.now().isoformat(),
-            cpu_percent=cpu_percent,
-            memory_percent=memory_percent,
-            memory_mb=memory_mb,
-            disk_percent=disk_percent,
-            disk_free_gb=disk_free_gb,
-            process_count=process_count
-        )
-        
-        self.system_metrics_buffer.append(metric)
-        
-        # Проверяем пороги для алертов
-        self._check_system_alerts(metric)
+        metric = self.system_sampler.latest(max_age=self.system_sampler.interval * 2)
+        if metric is None:
+            metric = self.system_sampler.sample()
         
         return metric
     
+    def start_system_sampler(self, interval: Optional[float] = None):
+        """
+        Запускает фоновый сбор системных метрик
+        
+        Args:
+            interval: Интервал между замерами в секундах (по умолчанию SYSTEM_SAMPLE_INTERVAL)
+        """
+        self.system_sampler.start(interval)
+    
+    def stop_system_sampler(self):
+        """Останавливает фоновый сбор системных метрик"""
+        self.system_sampler.stop()
+    
     def _check_api_error_rate(self, api_name: str):
         """Проверяет error rate для API"""
         total = self.counters[f"api_{api_name}_total"]
@@ -305,20 +642,35 @@ class MetricsCollector:
                 )
     
     def _check_system_alerts(self, metric: SystemMetric):
-        """Проверяет системные метрики на превышение порогов"""
-        alerts = []
+        """
+        Проверяет системные метрики на превышение порогов
+        
+        Алерт логируется, когда меняется набор превышенных порогов, а пока
+        он прежний - не чаще SYSTEM_ALERT_REPEAT_INTERVAL.
+        """
+        alerts = {}
         
         if metric.cpu_percent > ALERT_THRESHOLDS['cpu_percent']:
-            alerts.append(f"CPU: {metric.cpu_percent:.1f}%")
+            alerts['cpu'] = f"CPU: {metric.cpu_percent:.1f}%"
         
         if metric.memory_percent > ALERT_THRESHOLDS['memory_percent']:
-            alerts.append(f"Memory: {metric.memory_percent:.1f}%")
+            alerts['memory'] = f"Memory: {metric.memory_percent:.1f}%"
         
         if metric.disk_percent > ALERT_THRESHOLDS['disk_percent']:
-            alerts.append(f"Disk: {metric.disk_percent:.1f}%")
+            alerts['disk'] = f"Disk: {metric.disk_percent:.1f}%"
+        
+        tripped = frozenset(alerts)
+        now = time.monotonic()
+        if tripped == self._system_alerts:
+            if not alerts or now - self._system_alerts_logged_at < SYSTEM_ALERT_REPEAT_INTERVAL:
+                return
         
         if alerts:
-            logger.warning(f"⚠️ Системные алерты: {', '.join(alerts)}")
+            logger.warning(f"⚠️ Системные алерты: {', '.join(alerts.values())}")
+        else:
+            logger.info("✅ Системные метрики вернулись в норму")
+        self._system_alerts = tripped
+        self._system_alerts_logged_at = now
     
     def get_summary(self) -> Dict[str, Any]:
         """
@@ -330,16 +682,19 @@ class MetricsCollector:
         uptime_seconds = time.time() - self.start_time
         uptime_hours = uptime_seconds / 3600
         
-        # Считаем средние времена
-        avg_times = {}
-        for operation, times in self.timers.items():
-            if times:
-                avg_times[operation] = sum(times) / len(times)
+        # Средние времена и перцентили по гистограммам
+        timers = {operation: histogram.summary() for operation, histogram in list(self.timers.items())}
+        avg_times = {operation: summary['mean_ms'] for operation, summary in timers.items()}
+        
+        latest_system = self.system_sampler.latest()
         
         return {
             'uptime_hours': round(uptime_hours, 2),
             'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
             'average_times_ms': avg_times,
+            'timers': timers,
+            'system': latest_system.to_dict() if latest_system else None,
             'buffer_sizes': {
                 'performance': len(self.performance_buffer),
                 'api': len(self.api_buffer),
@@ -366,11 +721,46 @@ class MetricsCollector:
                 error_data = list(self.error_buffer)
                 safe_json_write(ERROR_METRICS_FILE, error_data)
             
+            # Сохраняем гистограммы времени выполнения
+            if self.timers:
+                self._save_timers()
+            
             logger.debug("Метрики сохранены")
             
         except Exception as e:
             logger.error(f"Ошибка при сохранении метрик: {e}")
     
+    def _save_timers(self):
+        """
+        Сохраняет снимок гистограмм этого процесса в общий файл
+        
+        Каждый процесс пишет свой раздел (по идентификатору процесса),
+        поэтому повторное сохранение не удваивает замеры, а сводка по всем
+        процессам получается сложением разделов (load_merged_timers).
+        """
+        now = datetime.now()
+        cutoff = (now - timedelta(days=TIMER_RETENTION_DAYS)).isoformat()
+        
+        with FileLock(TIMER_METRICS_FILE):
+            # Читаем без safe_json_read: блокировка файла уже захвачена
+            try:
+                with open(TIMER_METRICS_FILE, 'r', encoding='utf-8') as f:
+                    snapshots = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                snapshots = {}
+            
+            snapshots = {
+                process_id: snapshot for process_id, snapshot in snapshots.items()
+                if snapshot.get('saved_at', '') >= cutoff
+            }
+            snapshots[self.process_id] = {
+                'saved_at': now.isoformat(),
+                'timers': {operation: histogram.to_dict() for operation, histogram in list(self.timers.items())}
+            }
+            
+            with atomic_write(TIMER_METRICS_FILE, 'w', 'utf-8') as f:
+                json.dump(snapshots, f, ensure_ascii=False)
+    
     def generate_daily_stats(self) -> DailyStats:
         """
         Генерирует ежедневную статистику
@@ -428,6 +818,27 @@ class MetricsCollector:
 metrics_collector = MetricsCollector()
 
 
+def load_merged_timers() -> Dict[str, LatencyHistogram]:
+    """
+    Сводит сохраненные гистограммы всех процессов
+    
+    Returns:
+        Dict: Операция -> гистограмма по всем процессам
+    """
+    merged: Dict[str, LatencyHistogram] = {}
+    snapshots = safe_json_read(TIMER_METRICS_FILE, default={}) or {}
+    
+    for snapshot in snapshots.values():
+        for operation, data in snapshot.get('timers', {}).items():
+            histogram = LatencyHistogram.from_dict(data)
+            if operation in merged:
+                merged[operation].merge(histogram)
+            else:
+                merged[operation] = histogram
+    
+    return merged
+
+
 # ========================================================================
 # ДЕКОРАТОРЫ ДЛЯ МОНИТОРИНГА
 # ========================================================================
@@ -436,32 +847,62 @@ def monitor_performance(operation_name: Optional[str] = None):
     """
     Декоратор для мониторинга производительности функции
     
+    Кроме метрики открывает span трассировки с тем же названием, поэтому
+    вложенные вызовы образуют дерево. Поддерживает и корутины.
+    
     Args:
         operation_name: Название операции (по умолчанию имя функции)
     """
     def decorator(func: Callable) -> Callable:
+        op_name = operation_name or func.__name__
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start_time = time.perf_counter()
+                error = None
+                success = False
+                
+                with tracer.span(op_name):
+                    try:
+                        result = await func(*args, **kwargs)
+                        success = True
+                        return result
+                    except Exception as e:
+                        error = str(e)
+                        raise
+                    finally:
+                        metrics_collector.record_performance(
+                            operation=op_name,
+                            duration_ms=(time.perf_counter() - start_time) * 1000,
+                            success=success,
+                            error=error
+                        )
+            
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            op_name = operation_name or func.__name__
             start_time = time.perf_counter()
             error = None
             result = None
             
-            try:
-                result = func(*args, **kwargs)
-                success = True
-            except Exception as e:
-                error = str(e)
-                success = False
-                raise
-            finally:
-                duration_ms = (time.perf_counter() - start_time) * 1000
-                metrics_collector.record_performance(
-                    operation=op_name,
-                    duration_ms=duration_ms,
-                    success=success,
-                    error=error
-                )
+            with tracer.span(op_name):
+                try:
+                    result = func(*args, **kwargs)
+                    success = True
+                except Exception as e:
+                    error = str(e)
+                    success = False
+                    raise
+                finally:
+                    duration_ms = (time.perf_counter() - start_time) * 1000
+                    metrics_collector.record_performance(
+                        operation=op_name,
+                        duration_ms=duration_ms,
+                        success=success,
+                        error=error
+                    )
             
             return result
         
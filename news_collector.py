@@ -12,25 +12,43 @@ import asyncio
 import requests  # Добавлен отсутствующий импорт
 import time  # Добавлен импорт time в начало
 from datetime import datetime, timedelta
+from difflib import SequenceMatcher
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Callable, Tuple
 from loguru import logger
 
 import config
-from perplexity_client import PerplexityClient
+from perplexity_client import PerplexityClient, iter_stream_content
 from openai_client import OpenAIClient
 from prompts import (
     get_perplexity_daily_collection_prompt,
+    get_perplexity_domain_collection_prompt,
     get_perplexity_system_prompt,
     parse_collected_news,
-    PromptConfig
+    IncrementalNewsParser,
+    PromptConfig,
+    COLLECTION_DOMAINS
 )
 from retry_handler import retry_with_exponential_backoff, PerplexityRetryHandler
-from cache_manager import cache_news_data, cache_api_response, cache_manager
-from async_handler import batch_generate_images, run_async
+from cache_manager import (
+    cache_news_data, cache_api_response, cache_manager, image_cache, CacheKeySpec
+)
+from async_handler import (
+    batch_generate_images, run_async, AsyncAPIOperations, IMAGE_SIZE, IMAGE_QUALITY
+)
 from monitoring import monitor_performance, metrics_collector
 from file_utils import safe_json_write, safe_json_read, create_backup, FileLock
 from timezone_utils import now_msk, yesterday_msk, format_date_russian
+from validation import validate_news_item_full
+from image_processing import ImageTranscoder, detect_image_extension
+from news_store import create_news_store, BACKEND_JSON
+from publication_journal import cleanup_old_journals
+from telegram_outbox import cleanup_old_outbox, get_outbox_path
+from tracing import tracer, current_span, set_attribute, configure_tracing, cleanup_old_traces
+from collection_checkpoint import (
+    CollectionCheckpoint, cleanup_old_checkpoints,
+    STAGE_PARSED, STAGE_IMAGE_SAVED, STAGE_VALIDATED
+)
 
 
 class NewsCollector:
@@ -48,6 +66,7 @@ class NewsCollector:
             web_config = self._load_web_config()
         
         self.web_config = web_config
+        configure_tracing(web_config)
         self.perplexity_client = PerplexityClient(web_config)
         self.openai_client = OpenAIClient(web_config)
         self.data_dir = Path(config.DATA_DIR)
@@ -56,6 +75,25 @@ class NewsCollector:
         # Проверяем настройку генерации изображений
         self.generate_images = web_config.get('content', {}).get('generate_images', True) if web_config else True
         self.publish_without_images = web_config.get('content', {}).get('publish_without_images', False) if web_config else False
+        self.use_image_cache = web_config.get('content', {}).get('image_cache', True) if web_config else True
+        
+        # Перекодирование изображений перед сохранением (content.image_transcode, по умолчанию выключено)
+        self.image_transcoder = ImageTranscoder.from_config(
+            web_config.get('content', {}).get('image_transcode') if web_config else None
+        )
+        
+        # Потоковый режим сбора (SSE): новости разбираются по мере генерации ответа
+        perplexity_config = web_config.get('api_models', {}).get('perplexity', {}) if web_config else {}
+        self.stream_collection = perplexity_config.get('stream', False)
+        
+        # Параллельный сбор узкими запросами по правовым областям (fan-out)
+        self.fan_out_collection = perplexity_config.get('fan_out', False)
+        self.fan_out_concurrency = perplexity_config.get('fan_out_concurrency', 3)
+        domain_keys = perplexity_config.get('fan_out_domains')
+        self.collection_domains = [
+            domain for domain in COLLECTION_DOMAINS
+            if not domain_keys or domain['key'] in domain_keys
+        ]
         
         # Создаем папку для изображений
         self.images_dir = self.data_dir / "images"
@@ -67,6 +105,14 @@ class NewsCollector:
         # Настройки для сбора
         self.max_retries = 3
         self.retry_delay = 60  # 1 минута между попытками
+        
+        # Настройки конвейера сбора
+        self.image_workers = 3  # Одновременные генерации изображений
+        self.pipeline_queue_size = config.MAX_NEWS_PER_DAY
+        self._checkpoint_files = set()
+        
+        # Хранилище новостей для публикатора (JSON файл дня остаётся форматом обмена)
+        self.news_store = create_news_store(web_config)
     
     def _load_web_config(self) -> Optional[Dict]:
         """Загружает конфигурацию из веб-интерфейса"""
@@ -89,13 +135,14 @@ class NewsCollector:
         filename = config.NEWS_FILE_PATTERN.format(date=date_str)
         return self.data_dir / filename
     
-    def _get_image_file_path(self, date: datetime, news_id: str) -> Path:
+    def _get_image_file_path(self, date: datetime, news_id: str, extension: str = '.png') -> Path:
         """
         Получает путь к файлу изображения для новости
         
         Args:
             date: Дата новости
             news_id: ID новости
+            extension: Расширение файла (зависит от формата изображения)
             
         Returns:
             Path: Путь к файлу изображения
@@ -103,7 +150,7 @@ class NewsCollector:
         date_str = date.strftime('%Y-%m-%d')
         date_images_dir = self.images_dir / date_str
         date_images_dir.mkdir(exist_ok=True)
-        return date_images_dir / f"{news_id}.png"
+        return date_images_dir / f"{news_id}{extension}"
     
     @monitor_performance("image_generation_batch")
     async def _generate_images_async(self, news_list: List[Dict], target_date: datetime) -> List[Dict]:
@@ -132,69 +179,193 @@ class NewsCollector:
         
         logger.info("🎨 Начинаем параллельную генерацию изображений...")
         
-        # Подготавливаем промпты для всех новостей
-        prompts = []
+        # Новости, для которых изображение уже есть в кеше, не генерируем
+        successful_images = 0
+        pending = []
         for news_item in news_list:
-            content = news_item.get('content', '')
-            prompts.append(content)
+            if self._restore_cached_image(news_item, target_date):
+                successful_images += 1
+            else:
+                pending.append(news_item)
+        
+        # Подготавливаем промпты для оставшихся новостей
+        prompts = [news_item.get('content', '') for news_item in pending]
         
         # Генерируем изображения параллельно (максимум 3 одновременно)
-        images = await batch_generate_images(prompts, max_concurrent=3)
+        images = await batch_generate_images(prompts, max_concurrent=3) if prompts else []
         
         # Обновляем новости с изображениями
-        updated_news_list = []
-        successful_images = 0
+        try:
+            # Перекодируем все изображения сразу, чтобы пул процессов работал параллельно
+            transcoded = await asyncio.gather(*(self._transcode_image(image_bytes) for image_bytes in images))
+            for i, (news_item, (image_bytes, original_size, cacheable)) in enumerate(zip(pending, transcoded), 1):
+                if self._apply_image_result(news_item, image_bytes, target_date, i, len(pending), original_size):
+                    if cacheable:
+                        self._store_cached_image(news_item, image_bytes, original_size)
+                    successful_images += 1
+        finally:
+            if self.image_transcoder:
+                await asyncio.to_thread(self.image_transcoder.shutdown)
         
-        for i, (news_item, image_bytes) in enumerate(zip(news_list, images), 1):
-            news_id = news_item.get('id', f'news_{i}')
-            title = news_item.get('title', 'Без названия')
+        logger.info(f"🎉 Генерация завершена: {successful_images}/{len(news_list)} изображений успешно")
+        
+        return news_list
+    
+    async def _transcode_image(self, image_bytes: Optional[bytes]) -> Tuple[Optional[bytes], Optional[int], bool]:
+        """
+        Перекодирует сгенерированное изображение, если стадия включена
+        
+        Args:
+            image_bytes: Данные изображения от API (None или исключение при ошибке)
             
-            if image_bytes:
-                try:
-                    # Сохраняем изображение
-                    image_path = self._get_image_file_path(target_date, news_id)
-                    
-                    with FileLock(image_path):
-                        with open(image_path, 'wb') as f:
-                            f.write(image_bytes)
-                    
-                    # Относительный путь для JSON
-                    relative_image_path = str(image_path.relative_to(Path.cwd()))
-                    
-                    logger.info(f"✅ Изображение {i}/{len(news_list)} сохранено: {image_path.name}")
-                    
-                    news_item.update({
-                        'image_path': relative_image_path,
-                        'image_generated': True,
-                        'image_size': len(image_bytes)
-                    })
-                    successful_images += 1
-                    
-                    # Записываем метрику
-                    metrics_collector.counters['image_generation_success'] += 1
-                    
-                except Exception as e:
-                    logger.error(f"💥 Ошибка сохранения изображения {i}: {e}")
-                    news_item.update({
-                        'image_path': None,
-                        'image_generated': False,
-                        'image_error': str(e)
-                    })
-                    metrics_collector.counters['image_generation_failed'] += 1
-            else:
-                logger.warning(f"⚠️ Не удалось сгенерировать изображение {i}")
-                news_item.update({
-                    'image_path': None,
-                    'image_generated': False,
-                    'image_error': 'Генерация не удалась'
-                })
-                metrics_collector.counters['image_generation_failed'] += 1
+        Returns:
+            Tuple: (итоговые данные изображения, исходный размер в байтах,
+                    можно ли кешировать результат под ключом текущих настроек)
+        """
+        if not image_bytes or isinstance(image_bytes, Exception):
+            return image_bytes, None, False
+        
+        original_size = len(image_bytes)
+        if not self.image_transcoder:
+            return image_bytes, original_size, True
+        
+        started = time.perf_counter()
+        with tracer.span('image_transcode', {'image.format': self.image_transcoder.image_format,
+                                             'image.original_bytes': original_size}) as span:
+            image_bytes, transcoded = await self.image_transcoder.transcode_async(image_bytes)
+            span.set_attribute('image.bytes', len(image_bytes))
+            span.set_attribute('image.transcoded', transcoded)
+        metrics_collector.record_performance(
+            'image_transcode', (time.perf_counter() - started) * 1000, transcoded,
+            None if transcoded else 'transcode_failed'
+        )
+        if not transcoded:
+            # Исходный PNG под ключом варианта кеша восстанавливался бы с чужим расширением
+            logger.warning("⚠️ Изображение сохранено без перекодирования и не попадёт в кеш")
+            return image_bytes, original_size, False
+        
+        metrics_collector.counters['image_transcode_saved_bytes'] += max(original_size - len(image_bytes), 0)
+        logger.debug(
+            f"🗜️ Изображение перекодировано в {self.image_transcoder.image_format}: "
+            f"{original_size // 1024} КБ -> {len(image_bytes) // 1024} КБ"
+        )
+        return image_bytes, original_size, True
+    
+    def _apply_image_result(self, news_item: Dict, image_bytes: Optional[bytes],
+                            target_date: datetime, index: int, total: int,
+                            original_size: Optional[int] = None) -> bool:
+        """
+        Сохраняет сгенерированное изображение и обновляет поля новости
+        
+        Args:
+            news_item: Новость для обновления
+            image_bytes: Данные изображения (None если генерация не удалась)
+            target_date: Дата для названия папки изображений
+            index: Порядковый номер новости (для логов)
+            total: Общее количество новостей (для логов)
+            original_size: Размер изображения до перекодирования
             
-            updated_news_list.append(news_item)
+        Returns:
+            bool: True если изображение сохранено
+        """
+        news_id = news_item.get('id', f'news_{index}')
         
-        logger.info(f"🎉 Генерация завершена: {successful_images}/{len(news_list)} изображений успешно")
+        if not image_bytes or isinstance(image_bytes, Exception):
+            logger.warning(f"⚠️ Не удалось сгенерировать изображение {index}")
+            news_item.update({
+                'image_path': None,
+                'image_generated': False,
+                'image_error': 'Генерация не удалась'
+            })
+            metrics_collector.counters['image_generation_failed'] += 1
+            return False
+        
+        try:
+            # Сохраняем изображение (расширение по фактическому формату данных)
+            extension = detect_image_extension(image_bytes)
+            image_path = self._get_image_file_path(target_date, news_id, extension)
+            
+            with FileLock(image_path):
+                # Файл может быть жёсткой ссылкой из кеша изображений - не пишем поверх
+                if image_path.exists():
+                    image_path.unlink()
+                with open(image_path, 'wb') as f:
+                    f.write(image_bytes)
+            
+            # Относительный путь для JSON
+            relative_image_path = str(image_path.relative_to(Path.cwd()))
+            
+            logger.info(f"✅ Изображение {index}/{total} сохранено: {image_path.name}")
+            
+            news_item.update({
+                'image_path': relative_image_path,
+                'image_generated': True,
+                'image_size': len(image_bytes),
+                'image_original_size': original_size or len(image_bytes),
+                'image_format': extension.lstrip('.')
+            })
+            
+            # Записываем метрику
+            metrics_collector.counters['image_generation_success'] += 1
+            return True
+            
+        except Exception as e:
+            logger.error(f"💥 Ошибка сохранения изображения {index}: {e}")
+            news_item.update({
+                'image_path': None,
+                'image_generated': False,
+                'image_error': str(e)
+            })
+            metrics_collector.counters['image_generation_failed'] += 1
+            return False
+    
+    def _image_cache_key(self, news_item: Dict) -> str:
+        """Ключ кеша изображений для новости (текст + параметры генерации и перекодирования)"""
+        return image_cache.make_key(
+            news_item.get('content', ''), config.OPENAI_IMAGE_MODEL, IMAGE_SIZE, IMAGE_QUALITY,
+            self.image_transcoder.variant if self.image_transcoder else ''
+        )
+    
+    def _restore_cached_image(self, news_item: Dict, target_date: datetime) -> bool:
+        """
+        Размещает изображение из кеша вместо генерации через API
+        
+        Args:
+            news_item: Новость для обновления
+            target_date: Дата для названия папки изображений
+            
+        Returns:
+            bool: True если изображение найдено в кеше и размещено
+        """
+        if not self.use_image_cache:
+            return False
         
-        return updated_news_list
+        cache_key = self._image_cache_key(news_item)
+        extension = self.image_transcoder.extension if self.image_transcoder else '.png'
+        image_path = self._get_image_file_path(target_date, news_item['id'], extension)
+        if not image_cache.link_into(cache_key, image_path):
+            metrics_collector.counters['image_cache_miss'] += 1
+            return False
+        
+        image_size = image_path.stat().st_size
+        entry = image_cache.get_entry(cache_key) or {}
+        news_item.update({
+            'image_path': str(image_path.relative_to(Path.cwd())),
+            'image_generated': True,
+            'image_size': image_size,
+            'image_original_size': entry.get('original_size', image_size),
+            'image_format': extension.lstrip('.')
+        })
+        news_item.pop('image_error', None)
+        
+        metrics_collector.counters['image_cache_hit'] += 1
+        logger.info(f"♻️ Изображение для {news_item['id']} взято из кеша: {image_path.name}")
+        return True
+    
+    def _store_cached_image(self, news_item: Dict, image_bytes: bytes, original_size: Optional[int] = None):
+        """Сохраняет итоговое изображение в кеш изображений"""
+        if self.use_image_cache:
+            image_cache.put(self._image_cache_key(news_item), image_bytes, original_size)
     
     def _generate_images_for_news(self, news_list: List[Dict], target_date: datetime) -> List[Dict]:
         """
@@ -220,15 +391,58 @@ class NewsCollector:
                 except (ValueError, OSError) as e:
                     logger.warning(f"Ошибка при обработке файла {file_path}: {e}")
             
+            cleanup_old_checkpoints(self.data_dir, cutoff_date)
+            cleanup_old_journals(self.data_dir, cutoff_date)
+            cleanup_old_outbox(get_outbox_path(self.web_config), cutoff_date)
+            cleanup_old_traces(cutoff_date)
+            
             # Очищаем старый кеш
             cache_manager.cleanup(max_age_days=7)
                     
         except Exception as e:
             logger.error(f"Ошибка при очистке старых файлов: {e}")
     
+    def _build_collection_payload(self, stream: bool = False, user_prompt: Optional[str] = None,
+                                  max_tokens: Optional[int] = None) -> Dict:
+        """
+        Формирует тело запроса к Deep Research для ежедневного сбора
+        
+        Args:
+            stream: Запросить потоковый (SSE) ответ
+            user_prompt: Промпт пользователя (по умолчанию общий промпт сбора)
+            max_tokens: Лимит токенов ответа (по умолчанию лимит сбора)
+            
+        Returns:
+            Dict: Payload для Perplexity API
+        """
+        payload = {
+            "model": "sonar-deep-research",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": get_perplexity_system_prompt()
+                },
+                {
+                    "role": "user", 
+                    "content": user_prompt or get_perplexity_daily_collection_prompt()
+                }
+            ],
+            "max_tokens": max_tokens or PromptConfig.PERPLEXITY_COLLECTION_MAX_TOKENS,
+            "temperature": PromptConfig.PERPLEXITY_TEMPERATURE,
+            "top_p": PromptConfig.PERPLEXITY_TOP_P
+        }
+        
+        if stream:
+            payload["stream"] = True
+        
+        return payload
+    
     @monitor_performance("news_collection")
     @retry_with_exponential_backoff(max_attempts=3)
-    @cache_api_response(ttl=300)  # Кешируем на 5 минут
+    @cache_api_response(
+        ttl=300,  # Кешируем на 5 минут
+        key_spec=CacheKeySpec(fingerprint=lambda self: self._build_collection_payload())
+    )
     def _collect_raw_news(self) -> Optional[str]:
         """
         Собирает сырые новости через Perplexity Deep Research
@@ -237,27 +451,10 @@ class NewsCollector:
             str: Сырой контент от API или None при ошибке
         """
         try:
-            prompt = get_perplexity_daily_collection_prompt()
-            
             logger.info("🔍 Запускаю глубокий анализ законодательных изменений...")
             logger.info("📊 Максимальный размер ответа: 8192 токена")
             
-            payload = {
-                "model": "sonar-deep-research",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": get_perplexity_system_prompt()
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": PromptConfig.PERPLEXITY_COLLECTION_MAX_TOKENS,
-                "temperature": PromptConfig.PERPLEXITY_TEMPERATURE,
-                "top_p": PromptConfig.PERPLEXITY_TOP_P
-            }
+            payload = self._build_collection_payload()
             
             # Используем retry handler для надежности
             response = self.perplexity_retry.make_request(
@@ -292,7 +489,546 @@ class NewsCollector:
             metrics_collector.record_error('news_collection', str(e))
             return None
     
-    @cache_news_data(ttl=86400)  # Кешируем на 24 часа
+    @monitor_performance("news_collection_stream")
+    def _stream_raw_news(self, on_news_item: Callable[[Dict], None]) -> Optional[str]:
+        """
+        Собирает новости через Deep Research в потоковом режиме (SSE)
+        
+        Каждая секция ПРИОРИТЕТ передаётся в on_news_item сразу после того,
+        как закрылся её блок ИСТОЧНИКИ:, не дожидаясь конца ответа.
+        
+        Args:
+            on_news_item: Колбэк, вызываемый для каждой готовой новости
+            
+        Returns:
+            str: Полный сырой контент или None при ошибке
+        """
+        try:
+            logger.info("🔍 Запускаю потоковый глубокий анализ законодательных изменений...")
+            
+            payload = self._build_collection_payload(stream=True)
+            set_attribute('model', payload['model'])
+            
+            response = self.perplexity_retry.make_request(
+                url=config.PERPLEXITY_API_URL,
+                headers={
+                    "Authorization": f"Bearer {config.PERPLEXITY_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                json_data=payload,
+                timeout=config.REQUEST_TIMEOUT,
+                stream=True
+            )
+            
+            parser = IncrementalNewsParser()
+            chunks = []
+            
+            with response:
+                for chunk in iter_stream_content(response):
+                    chunks.append(chunk)
+                    for news_item in parser.feed(chunk):
+                        logger.info(f"📨 Получена новость приоритет {news_item['priority']}: {news_item['title'][:50]}...")
+                        on_news_item(news_item)
+            
+            for news_item in parser.finish():
+                on_news_item(news_item)
+            
+            raw_content = ''.join(chunks)
+            set_attribute('response.chars', len(raw_content))
+            set_attribute('news.count', len(parser.news))
+            
+            logger.info("✅ Потоковый ответ от Perplexity Deep Research получен полностью")
+            logger.info(f"📏 Размер ответа: {len(raw_content)} символов, новостей: {len(parser.news)}")
+            
+            metrics_collector.counters['news_collection_success'] += 1
+            
+            return raw_content
+            
+        except requests.exceptions.Timeout:
+            logger.error("⏰ Превышен таймаут потокового запроса к Perplexity API")
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"🌐 Ошибка при потоковом запросе к Perplexity API: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"💥 Неожиданная ошибка при потоковом сборе новостей: {e}")
+            metrics_collector.record_error('news_collection', str(e))
+            return None
+    
+    async def _fetch_domain_news_async(self, domain: Dict,
+                                       semaphore: asyncio.Semaphore) -> Optional[str]:
+        """
+        Выполняет узкий запрос Deep Research по одной правовой области
+        
+        Args:
+            domain: Элемент COLLECTION_DOMAINS
+            semaphore: Ограничение одновременных запросов
+            
+        Returns:
+            str: Сырой контент или None при ошибке
+        """
+        payload = self._build_collection_payload(
+            user_prompt=get_perplexity_domain_collection_prompt(
+                domain, PromptConfig.PERPLEXITY_DOMAIN_NEWS_COUNT
+            ),
+            max_tokens=PromptConfig.PERPLEXITY_DOMAIN_MAX_TOKENS
+        )
+        
+        async with semaphore:
+            logger.info(f"🔍 Запрос по области «{domain['name']}»...")
+            started = time.perf_counter()
+            
+            # Сам HTTP вызов учитывается транспортом (http_instrumentation),
+            # временные ошибки повторяются как и в запросе одним промптом
+            try:
+                response = await PerplexityRetryHandler.post_async(payload, config.REQUEST_TIMEOUT)
+                raw_content = response.json()['choices'][0]['message']['content']
+            except Exception as e:
+                raw_content = None
+                logger.error(f"🌐 Ошибка запроса по области «{domain['name']}»: {e}")
+            
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            metrics_collector.record_performance(
+                f"fan_out_{domain['key']}", elapsed_ms, raw_content is not None
+            )
+            
+            if raw_content:
+                logger.info(f"✅ Область «{domain['name']}»: {len(raw_content)} символов за {elapsed_ms / 1000:.1f} сек")
+            return raw_content
+    
+    async def _fetch_all_domains_async(self) -> List[Tuple[Dict, Optional[str]]]:
+        """
+        Параллельно опрашивает все правовые области с ограничением конкурентности
+        
+        Returns:
+            List[Tuple[Dict, Optional[str]]]: Пары (область, сырой контент)
+        """
+        semaphore = asyncio.Semaphore(self.fan_out_concurrency)
+        results = await asyncio.gather(*[
+            self._fetch_domain_news_async(domain, semaphore)
+            for domain in self.collection_domains
+        ])
+        return list(zip(self.collection_domains, results))
+    
+    @staticmethod
+    def _is_same_news(first: Dict, second: Dict) -> bool:
+        """
+        Проверяет, описывают ли две новости одно и то же изменение
+        
+        Args:
+            first: Первая новость
+            second: Вторая новость
+            
+        Returns:
+            bool: True если заголовки или начала текстов достаточно похожи
+        """
+        threshold = PromptConfig.SIMILARITY_THRESHOLD
+        
+        first_title = first.get('title', '').lower().strip()
+        second_title = second.get('title', '').lower().strip()
+        if first_title and SequenceMatcher(None, first_title, second_title).ratio() >= threshold:
+            return True
+        
+        def body(news_item: Dict) -> str:
+            # Сравниваем сам текст: заголовок и шапка комментария одинаковы у всех новостей
+            content = news_item.get('content', '')
+            content = content.split('КОММЕНТАРИЙ КАРМАННОГО КОНСУЛЬТАНТА:', 1)[-1]
+            return content.strip()[:300].lower()
+        
+        return SequenceMatcher(None, body(first), body(second)).ratio() >= threshold
+    
+    def _merge_domain_news(self, domain_results: List[Tuple[Dict, Optional[str]]]) -> List[Dict]:
+        """
+        Объединяет ответы по областям в один список без дубликатов
+        
+        Дубликаты (одна новость найдена в нескольких областях) схлопываются
+        в новость с более высоким приоритетом, источники объединяются.
+        Итог ранжируется по приоритету, при равенстве - по порядку областей.
+        
+        Args:
+            domain_results: Пары (область, сырой контент)
+            
+        Returns:
+            List[Dict]: Не более MAX_NEWS_PER_DAY новостей
+        """
+        merged = []
+        duplicates = 0
+        
+        for domain_index, (domain, raw_content) in enumerate(domain_results):
+            if not raw_content:
+                continue
+            
+            cleaned_content = self.perplexity_client._clean_deep_research_content(raw_content)
+            for position, news_item in enumerate(parse_collected_news(cleaned_content)):
+                news_item['domain'] = domain['key']
+                rank = (news_item['priority'], domain_index, position)
+                
+                duplicate = next((item for item in merged if self._is_same_news(item[1], news_item)), None)
+                if duplicate is None:
+                    merged.append((rank, news_item))
+                    continue
+                
+                duplicates += 1
+                kept_rank, kept_item = duplicate
+                if rank < kept_rank:
+                    merged.remove(duplicate)
+                    merged.append((rank, news_item))
+                    kept_item, news_item = news_item, kept_item
+                kept_item['sources'] = list(dict.fromkeys(kept_item['sources'] + news_item['sources']))
+        
+        merged.sort(key=lambda item: item[0])
+        news_list = [news_item for _, news_item in merged][:config.MAX_NEWS_PER_DAY]
+        
+        logger.info(
+            f"🧩 Объединено {len(merged)} новостей из {len(domain_results)} областей "
+            f"(дубликатов: {duplicates}), отобрано {len(news_list)}"
+        )
+        return news_list
+    
+    @monitor_performance("news_collection_fan_out")
+    def _collect_fan_out_news(self, checkpoint: CollectionCheckpoint) -> List[Dict]:
+        """
+        Собирает новости параллельными запросами по правовым областям
+        
+        Длительность сбора ограничена самым медленным подзапросом, а не
+        одним большим проходом Deep Research.
+        
+        Args:
+            checkpoint: Манифест стадий сбора
+            
+        Returns:
+            List[Dict]: Отранжированные новости с метаданными (пустой при ошибке)
+        """
+        logger.info(
+            f"🔀 Fan-out сбор: {len(self.collection_domains)} областей, "
+            f"не более {self.fan_out_concurrency} запросов одновременно"
+        )
+        
+        domain_results = run_async(self._fetch_all_domains_async())
+        answered = [(domain, raw) for domain, raw in domain_results if raw]
+        if not answered:
+            logger.error("❌ Ни одна область не вернула ответ")
+            return []
+        
+        news_list = self._merge_domain_news(answered)
+        if not news_list:
+            return []
+        
+        metrics_collector.counters['news_collection_success'] += 1
+        
+        current_time = now_msk()
+        for i, news_item in enumerate(news_list):
+            self._assign_news_metadata(news_item, i, current_time)
+        
+        raw_content = '\n\n'.join(
+            f"=== {domain['name']} ===\n{raw}" for domain, raw in answered
+        )
+        checkpoint.mark_raw_fetched(raw_content)
+        checkpoint.mark_parsed(news_list)
+        
+        return news_list
+    
+    async def _collect_pipeline_async(self, target_date: datetime,
+                                      news_list: Optional[List[Dict]] = None,
+                                      checkpoint: Optional[CollectionCheckpoint] = None,
+                                      collected_at: Optional[datetime] = None) -> List[Dict]:
+        """
+        Конвейер сбора: разбор → генерация изображений → сохранение
+        
+        Разобранные новости попадают в ограниченную очередь, которую разбирают
+        воркеры генерации изображений. Каждая готовая новость сразу
+        сохраняется в дневной файл (checkpoint), поэтому частично собранный
+        день пригоден для публикации даже если следующая стадия упала.
+        Глубина очередей и задержки стадий пишутся в metrics_collector.
+        Выполненные стадии отмечаются в checkpoint, а изображения, уже
+        сохранённые прошлой попыткой, повторно не генерируются.
+        
+        Args:
+            target_date: Дата сбора (для файла новостей и папки изображений)
+            news_list: Уже разобранные новости; None - потоковый сбор из Perplexity
+            checkpoint: Манифест стадий сбора за дату
+            collected_at: Время сбора, общее для всех сохранений дня
+                          (события журнала публикаций привязаны к нему)
+            
+        Returns:
+            List[Dict]: Готовые новости, отсортированные по приоритету (пустой при ошибке)
+        """
+        loop = asyncio.get_running_loop()
+        current_time = collected_at or now_msk()
+        image_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        save_queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        collected = []
+        completed = []
+        
+        # Span каждой новости живёт от разбора до сохранения; его контекст
+        # сохраняется в новости, и публикация продолжает тот же trace
+        pipeline_span = current_span()
+        item_spans = {}
+        
+        def start_item_span(news_item: Dict):
+            item_span = tracer.start_span(
+                'news_item',
+                {'news.id': news_item.get('id'), 'news.priority': news_item.get('priority')},
+                parent=pipeline_span,
+                context=news_item.get('trace_context')
+            )
+            item_span.add_event('parsed', title_chars=len(news_item.get('title', '')))
+            news_item['trace_context'] = item_span.context
+            item_spans[id(news_item)] = item_span
+        
+        async def enqueue(queue: asyncio.Queue, queue_name: str, news_item: Optional[Dict]):
+            await queue.put((news_item, time.perf_counter()))
+            metrics_collector.record_queue_depth(queue_name, queue.qsize())
+        
+        async def dequeue(queue: asyncio.Queue, queue_name: str) -> Optional[Dict]:
+            news_item, enqueued_at = await queue.get()
+            metrics_collector.record_queue_depth(queue_name, queue.qsize())
+            if news_item is not None:
+                wait_ms = (time.perf_counter() - enqueued_at) * 1000
+                metrics_collector.record_performance(f"pipeline_{queue_name}_wait", wait_ms, True)
+            return news_item
+        
+        async def image_worker(api: AsyncAPIOperations):
+            while True:
+                news_item = await dequeue(image_queue, 'image')
+                if news_item is None:
+                    break
+                
+                with tracer.activate(item_spans[id(news_item)]):
+                    await generate_image(api, news_item)
+                
+                await enqueue(save_queue, 'save', news_item)
+        
+        async def generate_image(api: AsyncAPIOperations, news_item: Dict):
+            if checkpoint and self.generate_images and checkpoint.restore_image(news_item):
+                logger.info(f"♻️ Изображение {news_item['id']} уже сохранено, пропускаем генерацию")
+            elif self.generate_images:
+                started = time.perf_counter()
+                with tracer.span('image_generation', {'model': config.OPENAI_IMAGE_MODEL}) as span:
+                    saved = await asyncio.to_thread(self._restore_cached_image, news_item, target_date)
+                    span.set_attribute('image.cache_hit', saved)
+                    if not saved:
+                        image_bytes = await api.generate_image_async(news_item.get('content', ''))
+                        image_bytes, original_size, cacheable = await self._transcode_image(image_bytes)
+                        saved = self._apply_image_result(
+                            news_item, image_bytes, target_date, len(completed) + 1, len(collected),
+                            original_size
+                        )
+                        if saved and cacheable:
+                            await asyncio.to_thread(
+                                self._store_cached_image, news_item, image_bytes, original_size
+                            )
+                    span.set_attribute('image.saved', saved)
+                    span.set_attribute('image.bytes', news_item.get('image_size', 0))
+                metrics_collector.record_performance(
+                    'pipeline_image', (time.perf_counter() - started) * 1000, saved
+                )
+                if saved and checkpoint:
+                    await asyncio.to_thread(checkpoint.mark_stage, news_item, STAGE_IMAGE_SAVED)
+            else:
+                self._mark_without_image(news_item)
+        
+        async def saver():
+            while True:
+                news_item = await dequeue(save_queue, 'save')
+                if news_item is None:
+                    break
+                
+                completed.append(news_item)
+                if checkpoint:
+                    await asyncio.to_thread(self._validate_news_item, news_item, checkpoint)
+                started = time.perf_counter()
+                saved = await asyncio.to_thread(
+                    self._save_news_to_file,
+                    sorted(completed, key=lambda x: x['priority']),
+                    target_date,
+                    True,
+                    current_time
+                )
+                metrics_collector.record_performance(
+                    'pipeline_save', (time.perf_counter() - started) * 1000, saved
+                )
+                
+                item_span = item_spans.pop(id(news_item), None)
+                if item_span:
+                    item_span.add_event('saved', file_saved=saved)
+                    item_span.set_attribute('news.image', bool(news_item.get('image_generated')))
+                    item_span.end()
+        
+        def on_news_item(news_item: Dict):
+            # Вызывается из потока чтения SSE: ждём места в очереди (backpressure)
+            collected.append(news_item)
+            index = len(collected) - 1
+            self._assign_news_metadata(news_item, index, current_time)
+            start_item_span(news_item)
+            if checkpoint:
+                checkpoint.mark_stage(news_item, STAGE_PARSED)
+            asyncio.run_coroutine_threadsafe(enqueue(image_queue, 'image', news_item), loop).result()
+        
+        async with AsyncAPIOperations() as api:
+            workers = [asyncio.create_task(image_worker(api)) for _ in range(self.image_workers)]
+            saver_task = asyncio.create_task(saver())
+            
+            try:
+                if news_list is None:
+                    parse_started = time.perf_counter()
+                    raw_content = await asyncio.to_thread(self._stream_raw_news, on_news_item)
+                    metrics_collector.record_performance(
+                        'pipeline_parse', (time.perf_counter() - parse_started) * 1000, bool(raw_content)
+                    )
+                    if raw_content and checkpoint:
+                        checkpoint.mark_raw_fetched(raw_content)
+                else:
+                    raw_content = True
+                    for news_item in news_list:
+                        collected.append(news_item)
+                        start_item_span(news_item)
+                        await enqueue(image_queue, 'image', news_item)
+            finally:
+                # Останавливаем стадии по цепочке, дожидаясь уже принятых новостей
+                for _ in workers:
+                    await enqueue(image_queue, 'image', None)
+                await asyncio.gather(*workers, return_exceptions=True)
+                await enqueue(save_queue, 'save', None)
+                await saver_task
+                if self.image_transcoder:
+                    await asyncio.to_thread(self.image_transcoder.shutdown)
+                # Новости, не дошедшие до сохранения
+                for item_span in item_spans.values():
+                    item_span.set_attribute('pipeline.incomplete', True)
+                    item_span.end()
+        
+        if not raw_content:
+            return []
+        
+        # Расписание назначаем после сортировки по приоритету, как в пакетном режиме
+        completed.sort(key=lambda x: x['priority'])
+        for i, news_item in enumerate(completed):
+            self._assign_news_metadata(news_item, i, current_time, keep_id=True)
+        
+        successful_images = sum(1 for news_item in completed if news_item.get('image_generated'))
+        logger.info(f"🎉 Конвейер завершён: {len(completed)} новостей, {successful_images} изображений")
+        
+        return completed
+    
+    @staticmethod
+    def _validate_news_item(news_item: Dict, checkpoint: CollectionCheckpoint):
+        """
+        Проверяет готовую новость и отмечает стадию валидации
+        
+        Args:
+            news_item: Новость для проверки
+            checkpoint: Манифест стадий сбора
+        """
+        if checkpoint.has_stage(news_item['id'], STAGE_VALIDATED):
+            return
+        
+        is_valid, errors = validate_news_item_full(news_item)
+        if is_valid:
+            checkpoint.mark_stage(news_item, STAGE_VALIDATED)
+        else:
+            logger.warning(f"⚠️ Новость {news_item['id']} не прошла проверку: {'; '.join(errors)}")
+    
+    def _load_news_from_checkpoint(self, checkpoint: CollectionCheckpoint) -> Optional[List[Dict]]:
+        """
+        Восстанавливает разобранные новости из checkpoint прошлой попытки
+        
+        Разобранным новостям доверяем только если ответ Deep Research был
+        получен полностью: оборванный поток мог отдать не все секции.
+        
+        Args:
+            checkpoint: Манифест стадий сбора
+            
+        Returns:
+            List[Dict]: Новости для конвейера или None если нужен новый запрос
+        """
+        if not checkpoint.has_raw():
+            if checkpoint.exists:
+                logger.info("🧹 Ответ Deep Research в checkpoint неполный, начинаем сбор заново")
+                checkpoint.reset()
+            return None
+        
+        news_list = checkpoint.get_parsed_news()
+        if news_list:
+            summary = checkpoint.summary()
+            logger.info(
+                f"♻️ Продолжаем сбор с checkpoint: {summary['news']} новостей, "
+                f"изображений {summary[STAGE_IMAGE_SAVED]}, проверено {summary[STAGE_VALIDATED]}"
+            )
+        else:
+            logger.info("♻️ Используем сохранённый ответ Deep Research из checkpoint")
+            news_list = self._process_raw_content(checkpoint.load_raw())
+            if news_list:
+                checkpoint.mark_parsed(news_list)
+            else:
+                checkpoint.reset()
+        
+        if news_list:
+            metrics_collector.counters['news_collection_resumed'] += 1
+        return news_list or None
+    
+    def _assign_news_metadata(self, news_item: Dict, index: int, current_time: datetime,
+                              keep_id: bool = False):
+        """
+        Назначает новости время публикации, ID и служебные поля
+        
+        Args:
+            news_item: Новость для обновления
+            index: Позиция новости в отсортированном списке
+            current_time: Время сбора
+            keep_id: Не перезаписывать уже назначенный ID
+        """
+        schedule = config.PUBLICATION_SCHEDULE
+        
+        # Назначаем время публикации
+        if index < len(schedule):
+            news_item['scheduled_time'] = schedule[index]
+        else:
+            # Если новостей больше чем времен в расписании
+            news_item['scheduled_time'] = schedule[-1]  # Последнее время
+        
+        if not (keep_id and news_item.get('id')):
+            news_item['id'] = f"news_{current_time.strftime('%Y%m%d')}_{index+1}"
+        
+        # Добавляем метаданные
+        news_item.update({
+            'collected_at': current_time.isoformat(),
+            'published': False,
+            'publication_attempts': 0
+        })
+    
+    @staticmethod
+    def _parse_collected_at(data: Dict) -> Optional[datetime]:
+        """
+        Время сбора из файла дня
+        
+        Args:
+            data: Данные файла новостей
+            
+        Returns:
+            datetime: Время сбора или None если поле отсутствует или повреждено
+        """
+        try:
+            return datetime.fromisoformat(data['collected_at'])
+        except (KeyError, TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def _mark_without_image(news_item: Dict):
+        """Помечает новость как публикуемую без изображения"""
+        news_item.update({
+            'image_path': None,
+            'image_generated': False,
+            'image_size': 0,
+            'skip_image': True
+        })
+    
+    @cache_news_data(
+        ttl=86400,  # Кешируем на 24 часа
+        key_spec=CacheKeySpec(fingerprint=lambda self, raw_content: (
+            config.MAX_NEWS_PER_DAY, PromptConfig.SIMILARITY_THRESHOLD
+        ))
+    )
     def _process_raw_content(self, raw_content: str) -> List[Dict]:
         """
         Обрабатывает сырой контент и извлекает структурированные новости
@@ -321,23 +1057,9 @@ class NewsCollector:
             
             # Добавляем метаданные к каждой новости
             current_time = now_msk()
-            schedule = config.PUBLICATION_SCHEDULE
             
             for i, news_item in enumerate(news_list):
-                # Назначаем время публикации
-                if i < len(schedule):
-                    news_item['scheduled_time'] = schedule[i]
-                else:
-                    # Если новостей больше чем времен в расписании
-                    news_item['scheduled_time'] = schedule[-1]  # Последнее время
-                
-                # Добавляем метаданные
-                news_item.update({
-                    'id': f"news_{current_time.strftime('%Y%m%d')}_{i+1}",
-                    'collected_at': current_time.isoformat(),
-                    'published': False,
-                    'publication_attempts': 0
-                })
+                self._assign_news_metadata(news_item, i, current_time)
             
             return news_list
             
@@ -347,13 +1069,17 @@ class NewsCollector:
             return []
     
     @monitor_performance("save_news_file")
-    def _save_news_to_file(self, news_list: List[Dict], date: datetime) -> bool:
+    def _save_news_to_file(self, news_list: List[Dict], date: datetime, partial: bool = False,
+                           collected_at: Optional[datetime] = None) -> bool:
         """
         Сохраняет новости в JSON файл
         
         Args:
             news_list: Список новостей для сохранения
             date: Дата для которой сохраняются новости
+            partial: Промежуточное сохранение конвейера (день ещё собирается)
+            collected_at: Время сбора; checkpoint и итоговое сохранение передают
+                          одно и то же, иначе журнал публикаций потеряет события
             
         Returns:
             bool: True если сохранение прошло успешно
@@ -361,21 +1087,29 @@ class NewsCollector:
         try:
             file_path = self._get_news_file_path(date)
             
-            # Создаем резервную копию если файл существует
-            if file_path.exists():
+            # Создаем резервную копию если файл существует и это не наш же checkpoint
+            if file_path.exists() and file_path not in self._checkpoint_files:
                 create_backup(file_path)
             
             news_data = {
                 'date': date.strftime('%Y-%m-%d'),
-                'collected_at': now_msk().isoformat(),
+                'collected_at': (collected_at or now_msk()).isoformat(),
                 'total_news': len(news_list),
                 'news': news_list
             }
+            if partial:
+                news_data['partial'] = True
             
             # Сохраняем с блокировкой
             success = safe_json_write(file_path, news_data)
             
-            if success:
+            if success and partial:
+                self._checkpoint_files.add(file_path)
+                logger.info(f"💾 Checkpoint: {len(news_list)} новостей сохранено в {file_path.name}")
+            elif success:
+                self._checkpoint_files.discard(file_path)
+                if self.news_store.backend != BACKEND_JSON:
+                    success = self.news_store.save_day(date, news_data)
                 logger.info(f"💾 Новости сохранены в файл: {file_path.name}")
                 logger.info(f"📊 Статистика: {len(news_list)} новостей")
                 
@@ -414,79 +1148,126 @@ class NewsCollector:
         
         # Проверяем, не собирали ли уже новости за эту дату
         file_path = self._get_news_file_path(target_date)
+        collected_at = None
         if file_path.exists():
             logger.warning(f"⚠️ Файл новостей уже существует: {file_path.name}")
             
             # Проверяем кеш
             cached_data = safe_json_read(file_path)
-            if cached_data and cached_data.get('total_news', 0) > 0:
+            if cached_data and cached_data.get('partial'):
+                logger.warning("🧩 Файл содержит незавершённый сбор, продолжаем с checkpoint")
+                collected_at = self._parse_collected_at(cached_data)
+            elif cached_data and cached_data.get('total_news', 0) > 0:
                 logger.info("📦 Используем существующие новости из файла")
+                if self.news_store.backend != BACKEND_JSON and self.news_store.load_day(target_date) is None:
+                    self.news_store.save_day(target_date, cached_data)
                 return True
         
         # Очищаем старые файлы
         self._cleanup_old_files()
         
+        checkpoint = CollectionCheckpoint(self.data_dir, target_date)
+        # Одно время сбора на весь запуск: публикатор может выпустить новость
+        # из незавершённого дня, и его событие в журнале должно пережить
+        # следующие checkpoint и итоговое сохранение
+        collected_at = collected_at or now_msk()
+        
         # Пытаемся собрать новости с повторными попытками
         for attempt in range(1, self.max_retries + 1):
             logger.info(f"🎯 Попытка сбора #{attempt}/{self.max_retries}")
             
-            # Собираем сырые данные
-            raw_content = self._collect_raw_news()
-            if not raw_content:
-                if attempt < self.max_retries:
-                    logger.info(f"⏱️ Ожидание {self.retry_delay} секунд перед следующей попыткой...")
-                    time.sleep(self.retry_delay)
-                continue
+            # Продолжаем с места остановки, если прошлая попытка успела получить ответ.
+            # В потоковом режиме news_list остаётся None: новости идут в конвейер
+            # по мере генерации ответа
+            news_list = self._load_news_from_checkpoint(checkpoint)
             
-            # Обрабатываем данные
-            news_list = self._process_raw_content(raw_content)
-            if not news_list:
-                logger.warning("📰 Не удалось извлечь новости из ответа")
-                if attempt < self.max_retries:
-                    logger.info(f"⏱️ Ожидание {self.retry_delay} секунд перед следующей попыткой...")
-                    time.sleep(self.retry_delay)
-                continue
+            if news_list is None and self.fan_out_collection:
+                # Параллельные запросы по правовым областям
+                news_list = self._collect_fan_out_news(checkpoint)
+                if not news_list:
+                    if attempt < self.max_retries:
+                        logger.info(f"⏱️ Ожидание {self.retry_delay} секунд перед следующей попыткой...")
+                        time.sleep(self.retry_delay)
+                    continue
+            elif news_list is None and not self.stream_collection:
+                # Собираем сырые данные
+                raw_content = self._collect_raw_news()
+                if not raw_content:
+                    if attempt < self.max_retries:
+                        logger.info(f"⏱️ Ожидание {self.retry_delay} секунд перед следующей попыткой...")
+                        time.sleep(self.retry_delay)
+                    continue
+                checkpoint.mark_raw_fetched(raw_content)
+                
+                # Обрабатываем данные
+                news_list = self._process_raw_content(raw_content)
+                if not news_list:
+                    logger.warning("📰 Не удалось извлечь новости из ответа")
+                    # Ответ без новостей не сохраняем: следующая попытка запросит новый
+                    checkpoint.reset()
+                    if attempt < self.max_retries:
+                        logger.info(f"⏱️ Ожидание {self.retry_delay} секунд перед следующей попыткой...")
+                        time.sleep(self.retry_delay)
+                    continue
+                checkpoint.mark_parsed(news_list)
             
-            # Генерируем изображения если включено
             if self.generate_images:
-                logger.info("🎨 Переходим к параллельной генерации изображений...")
-                news_list_with_images = self._generate_images_for_news(news_list, target_date)
+                logger.info("🎨 Запускаем конвейер: изображения генерируются и сохраняются по мере готовности...")
             else:
                 logger.info("✏️ Пропускаем генерацию изображений (отключено в настройках)")
-                news_list_with_images = news_list
-                # Помечаем все новости как без изображений
-                for news_item in news_list_with_images:
-                    news_item.update({
-                        'image_path': None,
-                        'image_generated': False,
-                        'image_size': 0,
-                        'skip_image': True
-                    })
             
-            # Сохраняем в файл
-            if self._save_news_to_file(news_list_with_images, target_date):
-                logger.info("🎉 Сбор новостей завершен успешно!")
-                
-                # Сохраняем метрики
-                metrics_collector.save_metrics()
-                
-                # Генерируем статистику
-                stats = metrics_collector.generate_daily_stats()
-                logger.info(f"📊 Статистика дня: {stats.news_collected} новостей собрано")
-                
-                logger.info("=" * 60)
-                return True
-            else:
-                logger.error("💾 Ошибка при сохранении файла")
+            news_list_with_images = run_async(
+                self._collect_pipeline_async(target_date, news_list, checkpoint, collected_at)
+            )
+            if not news_list_with_images:
+                logger.warning("📰 Конвейер сбора не вернул ни одной новости")
                 if attempt < self.max_retries:
+                    logger.info(f"⏱️ Ожидание {self.retry_delay} секунд перед следующей попыткой...")
                     time.sleep(self.retry_delay)
                 continue
+            
+            # Сохраняем в файл
+            if self._finalize_collection(news_list_with_images, target_date, collected_at):
+                checkpoint.mark_completed(news_list_with_images)
+                return True
+            if attempt < self.max_retries:
+                time.sleep(self.retry_delay)
+            continue
         
         logger.error("❌ Все попытки сбора исчерпаны")
         metrics_collector.counters['news_collection_failed'] += 1
         logger.info("=" * 60)
         return False
     
+    def _finalize_collection(self, news_list: List[Dict], target_date: datetime,
+                             collected_at: Optional[datetime] = None) -> bool:
+        """
+        Сохраняет собранные новости и фиксирует статистику
+        
+        Args:
+            news_list: Готовые новости
+            target_date: Дата сбора
+            collected_at: Время сбора, с которым сохранялись checkpoint
+            
+        Returns:
+            bool: True если файл сохранён
+        """
+        if not self._save_news_to_file(news_list, target_date, collected_at=collected_at):
+            logger.error("💾 Ошибка при сохранении файла")
+            return False
+        
+        logger.info("🎉 Сбор новостей завершен успешно!")
+        
+        # Сохраняем метрики
+        metrics_collector.save_metrics()
+        
+        # Генерируем статистику
+        stats = metrics_collector.generate_daily_stats()
+        logger.info(f"📊 Статистика дня: {stats.news_collected} новостей собрано")
+        
+        logger.info("=" * 60)
+        return True
+    
     def get_news_file_status(self, date: Optional[datetime] = None) -> Dict:
         """
         Получает статус файла новостей за указанную дату
@@ -512,6 +1293,10 @@ class NewsCollector:
         try:
             data = safe_json_read(file_path)
             
+            # Статусы публикации обновляются в хранилище, файл дня - экспорт на момент сбора
+            if data and self.news_store.backend != BACKEND_JSON:
+                data = self.news_store.load_day(date) or data
+            
             if data:
                 return {
                     'exists': True,
@@ -520,7 +1305,8 @@ class NewsCollector:
                     'collected_at': data.get('collected_at'),
                     'total_news': data.get('total_news', 0),
                     'news_count': len(data.get('news', [])),
-                    'published_count': sum(1 for news in data.get('news', []) if news.get('published', False))
+                    'published_count': sum(1 for news in data.get('news', []) if news.get('published', False)),
+                    'partial': data.get('partial', False)
                 }
             else:
                 return {
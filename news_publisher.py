@@ -6,15 +6,21 @@ News Publisher для NEWSMAKER
 Читает структурированные данные и публикует их в Telegram в нужное время.
 """
 
-import json
+import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Dict, List
 from loguru import logger
 
 import config
+from async_runtime import runtime
 from telegram_client import TelegramClient
+from telegram_outbox import (
+    TelegramOutbox, get_outbox_path, STATUS_SENT, OUTBOX_MAX_ATTEMPTS, OUTBOX_WAIT_TIMEOUT
+)
 from openai_client import OpenAIClient
+from news_store import create_news_store
+from tracing import tracer, configure_tracing
 
 
 class NewsPublisher:
@@ -36,12 +42,31 @@ class NewsPublisher:
             web_config = self._load_web_config()
         
         self.web_config = web_config
+        configure_tracing(web_config)
         
         # Проверяем настройки публикации
         self.publish_without_images = web_config.get('content', {}).get('publish_without_images', False) if web_config else False
         
         # Настройки публикации
         self.max_publication_attempts = 3
+        
+        # Хранилище новостей (JSON файлы или SQLite, storage.news_backend)
+        self.news_store = create_news_store(web_config)
+        
+        # Очередь отправки в Telegram (telegram.outbox_enabled, по умолчанию включена)
+        telegram_config = web_config.get('telegram', {}) if web_config else {}
+        self.outbox_wait_timeout = telegram_config.get('outbox_wait_timeout', OUTBOX_WAIT_TIMEOUT)
+        self.outbox = None
+        if telegram_config.get('outbox_enabled', True):
+            try:
+                self.outbox = TelegramOutbox(
+                    self.telegram_client,
+                    get_outbox_path(web_config),
+                    max_attempts=telegram_config.get('outbox_max_attempts', OUTBOX_MAX_ATTEMPTS),
+                    on_finished=self._record_outbox_result
+                )
+            except sqlite3.Error as e:
+                logger.error(f"📮 Не удалось открыть очередь отправки: {e}, публикуем напрямую")
     
     def _load_web_config(self) -> Optional[Dict]:
         """Загружает конфигурацию из веб-интерфейса"""
@@ -75,24 +100,12 @@ class NewsPublisher:
         Returns:
             Dict: Данные новостей или None при ошибке
         """
-        file_path = self._get_news_file_path(date)
+        data = self.news_store.load_day(date)
         
-        if not file_path.exists():
-            logger.error(f"📂 Файл новостей не найден: {file_path.name}")
-            return None
+        if data is None:
+            logger.error(f"📂 Новости за {date.strftime('%Y-%m-%d')} не найдены ({self.news_store.backend})")
         
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            logger.debug(f"📰 Загружен файл: {file_path.name}")
-            logger.debug(f"📊 Новостей в файле: {len(data.get('news', []))}")
-            
-            return data
-            
-        except Exception as e:
-            logger.error(f"💥 Ошибка при загрузке файла {file_path}: {e}")
-            return None
+        return data
     
     def _save_news_file(self, data: Dict, date: datetime) -> bool:
         """
@@ -105,18 +118,7 @@ class NewsPublisher:
         Returns:
             bool: True если сохранение успешно
         """
-        file_path = self._get_news_file_path(date)
-        
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            logger.debug(f"💾 Файл обновлен: {file_path.name}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"💾 Ошибка при сохранении файла: {e}")
-            return False
+        return self.news_store.save_day(date, data)
     
     def _format_news_for_telegram(self, news_item: Dict) -> Dict:
         """
@@ -207,8 +209,10 @@ class NewsPublisher:
             return None
         
         try:
-            with open(image_path, 'rb') as f:
-                image_bytes = f.read()
+            with tracer.span('image_load', {'image.path': image_path.name}) as span:
+                with open(image_path, 'rb') as f:
+                    image_bytes = f.read()
+                span.set_attribute('image.bytes', len(image_bytes))
             
             logger.info(f"📷 Изображение загружено: {image_path.name} ({len(image_bytes)} байт)")
             return image_bytes
@@ -217,32 +221,91 @@ class NewsPublisher:
             logger.error(f"📷 Ошибка при загрузке изображения {image_path}: {e}")
             return None
     
-    def _update_news_status(self, data: Dict, news_id: str, published: bool, 
-                           attempt_count: Optional[int] = None) -> Dict:
+    def _update_news_status(self, date: datetime, news_id: str, published: bool, 
+                           attempt_count: Optional[int] = None, error: Optional[str] = None) -> bool:
         """
-        Обновляет статус публикации новости
+        Обновляет статус публикации новости в хранилище
         
         Args:
-            data: Данные файла новостей
+            date: Дата подборки новостей
             news_id: ID новости для обновления
             published: Статус публикации
             attempt_count: Количество попыток (опционально)
+            error: Причина неудачной попытки (опционально)
             
         Returns:
-            Dict: Обновленные данные
+            bool: True если статус сохранён
         """
-        for news_item in data.get('news', []):
-            if news_item.get('id') == news_id:
-                news_item['published'] = published
-                if published:
-                    news_item['published_at'] = datetime.now().isoformat()
-                
-                if attempt_count is not None:
-                    news_item['publication_attempts'] = attempt_count
-                    
-                break
+        if not self.news_store.update_news_status(date, news_id, published, attempt_count, error):
+            logger.error(f"💾 Не удалось обновить статус новости {news_id}")
+            return False
+        return True
+    
+    def _record_outbox_result(self, item: Dict) -> bool:
+        """
+        Записывает итог публикации из очереди отправки в хранилище
         
-        return data
+        Args:
+            item: Строка публикации очереди (date, news_id, status, attempt, last_error)
+            
+        Returns:
+            bool: True если статус сохранён
+        """
+        date = datetime.strptime(item['date'], '%Y-%m-%d')
+        if item['status'] == STATUS_SENT:
+            return self._update_news_status(date, item['news_id'], True, item['attempt'])
+        return self._update_news_status(date, item['news_id'], False, item['attempt'],
+                                        item.get('last_error') or 'publication_failed')
+    
+    def _resume_outbox(self):
+        """Подбирает публикации, оставшиеся в очереди после предыдущего запуска"""
+        if self.outbox is not None:
+            pending = self.outbox.resume()
+            if pending:
+                logger.info(f"📮 В очереди отправки публикаций: {pending}")
+    
+    def _publish_via_outbox(self, file_date: datetime, news_id: str, telegram_data: Dict,
+                            comic_image: Optional[bytes], attempt: int) -> bool:
+        """
+        Публикует новость через очередь отправки
+        
+        Полученный итог сразу записывается в хранилище, как и при прямой
+        отправке; очередь повторяет запись из своего обработчика (запись
+        идемпотентна) и сама фиксирует итог публикаций, досланных в фоне,
+        если он не получен за outbox_wait_timeout.
+        
+        Args:
+            file_date: Дата подборки
+            news_id: ID новости
+            telegram_data: Данные для telegram_client
+            comic_image: Изображение или None
+            attempt: Номер попытки публикации
+            
+        Returns:
+            bool: True если новость опубликована
+        """
+        prepared = runtime.run(
+            self.telegram_client.prepare_parts(telegram_data, with_image=comic_image is not None)
+        )
+        if prepared is None:
+            # Дубликат недавнего сообщения - как и при прямой отправке, считаем опубликованной
+            self._update_news_status(file_date, news_id, True, attempt)
+            return True
+        
+        formatted_text, parts = prepared
+        item_key = self.outbox.enqueue(file_date, news_id, formatted_text, parts, comic_image, attempt)
+        status = self.outbox.wait(item_key, self.outbox_wait_timeout)
+        
+        if status == STATUS_SENT:
+            logger.info("✅ Новость успешно опубликована!")
+            self._update_news_status(file_date, news_id, True, attempt)
+            return True
+        if status is None:
+            logger.warning(f"⏳ Публикация {news_id} не завершена за {self.outbox_wait_timeout} сек, "
+                           f"досылается в фоне")
+        else:
+            logger.error("❌ Ошибка при публикации")
+        return False
     
     def get_next_unpublished_news(self, date: Optional[datetime] = None) -> Optional[Dict]:
         """
@@ -257,46 +320,48 @@ class NewsPublisher:
         if date is None:
             date = datetime.now() - timedelta(days=1)
         
-        data = self._load_news_file(date)
-        if not data:
-            return None
-        
-        current_time = datetime.now()
-        current_time_str = current_time.strftime('%H:%M')
-        
-        # Ищем новости, которые пора публиковать
-        unpublished_news = []
-        for news_item in data.get('news', []):
-            if not news_item.get('published', False):
-                scheduled_time = news_item.get('scheduled_time')
-                if scheduled_time and scheduled_time <= current_time_str:
-                    unpublished_news.append(news_item)
+        current_time_str = datetime.now().strftime('%H:%M')
         
-        if not unpublished_news:
+        # Ищем новость, которую пора публиковать (приоритет, затем время)
+        found = self.news_store.get_next_unpublished(date, current_time_str)
+        if not found:
             return None
         
-        # Сортируем по приоритету и времени
-        unpublished_news.sort(key=lambda x: (
-            x.get('priority', 999),
-            x.get('scheduled_time', '99:99')
-        ))
-        
+        news_item, total_unpublished = found
         return {
             'file_date': date,
-            'news_item': unpublished_news[0],
-            'total_unpublished': len(unpublished_news)
+            'news_item': news_item,
+            'total_unpublished': total_unpublished
         }
     
     def publish_news_item(self, news_data: Dict) -> bool:
         """
         Публикует одну новость в Telegram
         
+        Публикация продолжает trace сбора этой новости (trace_context).
+        
         Args:
             news_data: Данные новости с метаинформацией
             
         Returns:
             bool: True если публикация успешна
         """
+        news_item = news_data['news_item']
+        attributes = {
+            'news.id': news_item.get('id', 'unknown'),
+            'news.priority': news_item.get('priority'),
+            'publication.attempt': news_item.get('publication_attempts', 0) + 1
+        }
+        
+        self._resume_outbox()
+        
+        with tracer.span('news_publication', attributes, context=news_item.get('trace_context')) as span:
+            success = self._publish_news_item(news_data)
+            span.set_attribute('publication.success', success)
+            return success
+    
+    def _publish_news_item(self, news_data: Dict) -> bool:
+        """Публикация новости (см. publish_news_item)"""
         file_date = news_data['file_date']
         news_item = news_data['news_item']
         news_id = news_item.get('id', 'unknown')
@@ -307,12 +372,6 @@ class NewsPublisher:
         logger.info(f"⏰ Время: {news_item.get('scheduled_time', 'не указано')}")
         logger.info("=" * 50)
         
-        # Загружаем актуальные данные файла
-        data = self._load_news_file(file_date)
-        if not data:
-            logger.error("📂 Не удалось загрузить файл новостей")
-            return False
-        
         # Увеличиваем счетчик попыток
         current_attempts = news_item.get('publication_attempts', 0) + 1
         
@@ -338,32 +397,35 @@ class NewsPublisher:
             
             # Публикуем
             logger.info("📱 Отправка в Telegram...")
+            if not comic_image:
+                if skip_image:
+                    logger.info("📨 Отправляю только текст (изображения отключены)")
+                else:
+                    logger.warning("📷 Изображение недоступно, отправляю только текст")
+            
+            if self.outbox is not None:
+                return self._publish_via_outbox(file_date, news_id, telegram_data, comic_image, current_attempts)
+            
             if comic_image:
                 success = self.telegram_client.send_legal_update_with_comic(
                     telegram_data, comic_image
                 )
             else:
                 # Отправляем только текст
-                if skip_image:
-                    logger.info("📨 Отправляю только текст (изображения отключены)")
-                else:
-                    logger.warning("📷 Изображение недоступно, отправляю только текст")
                 success = self.telegram_client.send_legal_update(telegram_data)
             
             if success:
                 logger.info("✅ Новость успешно опубликована!")
                 
-                # Обновляем статус в файле
-                data = self._update_news_status(data, news_id, True, current_attempts)
-                self._save_news_file(data, file_date)
+                # Обновляем статус в хранилище
+                self._update_news_status(file_date, news_id, True, current_attempts)
                 
                 return True
             else:
                 logger.error("❌ Ошибка при публикации")
                 
                 # Обновляем счетчик попыток
-                data = self._update_news_status(data, news_id, False, current_attempts)
-                self._save_news_file(data, file_date)
+                self._update_news_status(file_date, news_id, False, current_attempts, 'publication_failed')
                 
                 return False
                 
@@ -371,8 +433,7 @@ class NewsPublisher:
             logger.error(f"💥 Неожиданная ошибка при публикации: {e}")
             
             # Обновляем счетчик попыток
-            data = self._update_news_status(data, news_id, False, current_attempts)
-            self._save_news_file(data, file_date)
+            self._update_news_status(file_date, news_id, False, current_attempts, str(e))
             
             return False
         
@@ -388,6 +449,9 @@ class NewsPublisher:
         """
         logger.info("🔍 Поиск следующей новости для публикации...")
         
+        # Сначала дописываем итоги отправок, прерванных прошлым запуском
+        self._resume_outbox()
+        
         # Ищем новость для публикации
         news_data = self.get_next_unpublished_news()
         
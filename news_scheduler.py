@@ -7,8 +7,7 @@ News Scheduler для NEWSMAKER
 - 5 раз в день - публикация отдельных новостей по приоритету
 """
 
-import schedule
-import time
+import importlib
 from datetime import datetime
 from typing import Optional
 from loguru import logger
@@ -16,6 +15,8 @@ from loguru import logger
 import config
 from news_collector import NewsCollector
 from news_publisher import NewsPublisher
+from scheduler_engine import EventScheduler
+from async_runtime import runtime
 
 
 class NewsmakerScheduler:
@@ -28,6 +29,7 @@ class NewsmakerScheduler:
         
         # Настройки планировщика
         self.timezone = "Europe/Moscow"  # МСК
+        self.engine = EventScheduler(self.timezone)
         
     def _log_job_start(self, job_type: str):
         """Логирует начало выполнения задачи"""
@@ -151,28 +153,35 @@ class NewsmakerScheduler:
     def setup_schedule(self):
         """Настраивает расписание выполнения задач"""
         # Очищаем существующие задачи
-        schedule.clear()
+        self.engine.clear()
         
         logger.info("📅 Настройка расписания задач (МСК):")
         logger.info(f"  📰 Количество публикаций в день: {config.PUBLICATIONS_PER_DAY}")
         
         # Ежедневный сбор новостей в 08:30
-        schedule.every().day.at(config.COLLECTION_TIME).do(self.collect_daily_news_job)
+        self.engine.add_daily_job("Сбор новостей", config.COLLECTION_TIME, self.collect_daily_news_job)
         logger.info(f"  🔍 Сбор новостей: {config.COLLECTION_TIME}")
         
         # Публикации по расписанию (только до PUBLICATIONS_PER_DAY)
         actual_schedule = config.PUBLICATION_SCHEDULE[:config.PUBLICATIONS_PER_DAY]
         for i, time_str in enumerate(actual_schedule, 1):
-            schedule.every().day.at(time_str).do(self.publish_news_job)
+            self.engine.add_daily_job(f"Публикация #{i}", time_str, self.publish_news_job)
             logger.info(f"  📱 Публикация #{i}: {time_str}")
         
         # Показываем следующие запуски
-        logger.info(f"⏰ Следующий запуск: {schedule.next_run()}")
+        next_job = self.engine.next_job()
+        if next_job:
+            logger.info(f"⏰ Следующий запуск: {next_job.next_run.strftime('%d.%m.%Y %H:%M МСК')} ({next_job.name})")
         
         # Показываем пользовательский часовой пояс если отличается от МСК
         if hasattr(config, 'USER_TIMEZONE') and config.USER_TIMEZONE != "Europe/Moscow":
             logger.info(f"🌍 Часовой пояс пользователя: {config.USER_TIMEZONE}")
     
+    def reload_schedule(self):
+        """Перечитывает config и пересоздает задачи (SIGHUP)"""
+        importlib.reload(config)
+        self.setup_schedule()
+    
     def run_manual_collection(self):
         """Ручной запуск сбора новостей"""
         logger.info("🛠️ Ручной запуск сбора новостей...")
@@ -229,13 +238,8 @@ class NewsmakerScheduler:
         # Тест Telegram API (через publisher)
         logger.info("📱 Тестирование Telegram API...")
         try:
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            telegram_ok = loop.run_until_complete(
-                self.publisher.telegram_client.test_connection()
-            )
-            loop.close()
+            # Проверка идет в общем runtime: там же потом работает бот
+            telegram_ok = runtime.run(self.publisher.telegram_client.test_connection())
             
             if telegram_ok:
                 logger.info("✅ Telegram API работает")
@@ -298,10 +302,13 @@ class NewsmakerScheduler:
         # Показываем текущий статус
         self.show_daily_status()
         
+        # SIGTERM - остановка, SIGHUP - перечитать расписание
+        self.engine.install_signal_handlers()
+        
         try:
-            while self.is_running:
-                schedule.run_pending()
-                time.sleep(60)  # Проверяем каждую минуту
+            # Спит до ближайшей задачи, а не проверяет расписание каждую минуту
+            self.engine.run_forever(on_reload=self.reload_schedule)
+            self.stop_scheduler()
                 
         except KeyboardInterrupt:
             logger.info("⏹️ Получен сигнал остановки")
@@ -313,7 +320,8 @@ class NewsmakerScheduler:
     def stop_scheduler(self):
         """Останавливает планировщик"""
         self.is_running = False
-        schedule.clear()
+        self.engine.stop()
+        self.engine.clear()
         logger.info("⏹️ Планировщик остановлен")
 
 
@@ -0,0 +1,619 @@
+"""
+Хранилище новостей для NEWSMAKER
+
+Единый интерфейс над ежедневными подборками новостей. Два бэкенда:
+
+- JsonNewsStore - файлы daily_news_YYYY-MM-DD.json; статусы публикации
+  дописываются в журнал publications_YYYY-MM-DD.jsonl (publication_journal);
+- SQLiteNewsStore - база SQLite в режиме WAL с таблицами новостей,
+  попыток публикации и изображений. Изменение статуса одной новости
+  обновляет одну строку вместо перезаписи всего файла, а поиск следующей
+  новости к публикации выполняется индексированным запросом.
+
+JSON остаётся форматом обмена: коллектор по-прежнему пишет файл дня,
+а SQLite-бэкенд умеет импортировать существующие файлы и экспортировать
+день обратно в JSON.
+"""
+
+import copy
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+import config
+from file_utils import safe_json_read, safe_json_write
+from monitoring import metrics_collector
+from publication_journal import (
+    PublicationJournal, make_attempt_event, apply_events, COMPACT_EVERY_EVENTS
+)
+
+
+BACKEND_JSON = 'json'
+BACKEND_SQLITE = 'sqlite'
+
+DEFAULT_SQLITE_FILE = 'news.db'
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS news_days (
+    date TEXT PRIMARY KEY,
+    collected_at TEXT,
+    total_news INTEGER NOT NULL DEFAULT 0,
+    partial INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS news_items (
+    date TEXT NOT NULL REFERENCES news_days(date) ON DELETE CASCADE,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    priority INTEGER,
+    scheduled_time TEXT,
+    published INTEGER NOT NULL DEFAULT 0,
+    published_at TEXT,
+    publication_attempts INTEGER NOT NULL DEFAULT 0,
+    title TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (date, id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_news_items_unpublished
+    ON news_items (date, published, scheduled_time, priority);
+
+CREATE TABLE IF NOT EXISTS publication_attempts (
+    attempt_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    news_id TEXT NOT NULL,
+    attempted_at TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_publication_attempts_news
+    ON publication_attempts (date, news_id);
+
+CREATE TABLE IF NOT EXISTS images (
+    date TEXT NOT NULL,
+    news_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    original_size INTEGER,
+    format TEXT,
+    PRIMARY KEY (date, news_id),
+    FOREIGN KEY (date, news_id) REFERENCES news_items(date, id) ON DELETE CASCADE
+);
+"""
+
+
+class NewsStore(ABC):
+    """Базовый интерфейс хранилища новостей"""
+
+    backend = ''
+
+    @abstractmethod
+    def load_day(self, date: datetime) -> Optional[Dict]:
+        """
+        Загружает подборку новостей за дату
+
+        Args:
+            date: Дата подборки
+
+        Returns:
+            Dict: Данные в формате файла daily_news (date, collected_at, total_news, news)
+                  или None если подборки нет
+        """
+
+    @abstractmethod
+    def save_day(self, date: datetime, data: Dict) -> bool:
+        """
+        Сохраняет подборку новостей за дату целиком
+
+        Args:
+            date: Дата подборки
+            data: Данные в формате файла daily_news
+
+        Returns:
+            bool: True если сохранение успешно
+        """
+
+    @abstractmethod
+    def update_news_status(self, date: datetime, news_id: str, published: bool,
+                           attempt_count: Optional[int] = None, error: Optional[str] = None) -> bool:
+        """
+        Обновляет статус публикации одной новости и фиксирует попытку
+
+        Args:
+            date: Дата подборки
+            news_id: ID новости
+            published: Статус публикации
+            attempt_count: Количество попыток (опционально)
+            error: Причина неудачи (для журнала попыток)
+
+        Returns:
+            bool: True если новость найдена и обновлена
+        """
+
+    @abstractmethod
+    def get_next_unpublished(self, date: datetime, current_time: str) -> Optional[Tuple[Dict, int]]:
+        """
+        Находит следующую неопубликованную новость, время которой наступило
+
+        Args:
+            date: Дата подборки
+            current_time: Текущее время в формате HH:MM
+
+        Returns:
+            Tuple: (новость, количество готовых к публикации) или None
+        """
+
+    def close(self):
+        """Освобождает ресурсы хранилища"""
+
+
+class JsonNewsStore(NewsStore):
+    """Хранилище на файлах daily_news_YYYY-MM-DD.json"""
+
+    backend = BACKEND_JSON
+
+    def __init__(self, data_dir: Path, compact_every: int = COMPACT_EVERY_EVENTS):
+        """
+        Инициализация
+
+        Args:
+            data_dir: Папка с файлами новостей
+            compact_every: Через сколько событий журнал переносится в файл дня
+        """
+        self.data_dir = Path(data_dir)
+        self.compact_every = compact_every
+        self._journals: Dict[str, PublicationJournal] = {}
+        # Разобранные файлы дня: дата -> (mtime_ns, данные)
+        self._base_cache: Dict[str, Tuple[int, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def get_file_path(self, date: datetime) -> Path:
+        """Путь к файлу новостей за дату"""
+        filename = config.NEWS_FILE_PATTERN.format(date=date.strftime('%Y-%m-%d'))
+        return self.data_dir / filename
+
+    def _journal(self, date: datetime) -> PublicationJournal:
+        """Журнал публикаций за дату"""
+        date_str = date.strftime('%Y-%m-%d')
+        with self._lock:
+            if date_str not in self._journals:
+                self._journals[date_str] = PublicationJournal(self.data_dir, date)
+            return self._journals[date_str]
+
+    def _load_base(self, date: datetime) -> Optional[Dict]:
+        """
+        Загружает файл сбора (без журнала), повторно разбирая его только после изменения
+
+        Returns:
+            Dict: Копия данных файла или None
+        """
+        file_path = self.get_file_path(date)
+        date_str = date.strftime('%Y-%m-%d')
+
+        try:
+            mtime_ns = file_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._base_cache.pop(date_str, None)
+            return None
+
+        cached = self._base_cache.get(date_str)
+        if cached and cached[0] == mtime_ns:
+            return copy.deepcopy(cached[1])
+
+        data = safe_json_read(file_path)
+        if not isinstance(data, dict):
+            logger.error(f"💥 Ошибка при загрузке файла {file_path}")
+            return None
+
+        logger.debug(f"📰 Загружен файл: {file_path.name}")
+        logger.debug(f"📊 Новостей в файле: {len(data.get('news', []))}")
+
+        self._base_cache[date_str] = (mtime_ns, data)
+        return copy.deepcopy(data)
+
+    def load_day(self, date: datetime) -> Optional[Dict]:
+        data = self._load_base(date)
+        if data is None:
+            return None
+
+        apply_events(data, self._journal(date).read())
+        return data
+
+    def save_day(self, date: datetime, data: Dict) -> bool:
+        file_path = self.get_file_path(date)
+
+        # Атомарная запись: сбой посреди записи не повреждает файл дня
+        if not safe_json_write(file_path, data):
+            logger.error(f"💾 Ошибка при сохранении файла: {file_path.name}")
+            return False
+
+        # Данные записаны целиком - события журнала уже учтены в них
+        self._journal(date).clear()
+        logger.debug(f"💾 Файл обновлен: {file_path.name}")
+        return True
+
+    def update_news_status(self, date: datetime, news_id: str, published: bool,
+                           attempt_count: Optional[int] = None, error: Optional[str] = None) -> bool:
+        data = self._load_base(date)
+        if not data or not any(news_item.get('id') == news_id for news_item in data.get('news', [])):
+            return False
+
+        # Одна строка в журнале вместо перезаписи файла дня
+        journal = self._journal(date)
+        event = make_attempt_event(data.get('collected_at'), news_id, published, attempt_count, error)
+        if not journal.append(event):
+            return False
+
+        if journal.pending_events >= self.compact_every:
+            self.compact(date)
+        return True
+
+    def compact(self, date: datetime) -> bool:
+        """
+        Переносит события журнала в файл дня и очищает журнал
+
+        Args:
+            date: Дата подборки
+
+        Returns:
+            bool: True если компактизация выполнена
+        """
+        journal = self._journal(date)
+        if not journal.start_compaction():
+            return False
+
+        data = self.load_day(date)
+        if data is None or not safe_json_write(self.get_file_path(date), data):
+            # События остаются в журнале и будут учтены при следующем чтении
+            return False
+
+        journal.finish_compaction()
+        logger.debug(f"🗜️ Журнал публикаций за {date.strftime('%Y-%m-%d')} перенесён в файл дня")
+        return True
+
+    def get_next_unpublished(self, date: datetime, current_time: str) -> Optional[Tuple[Dict, int]]:
+        data = self.load_day(date)
+        if not data:
+            return None
+
+        # Ищем новости, которые пора публиковать
+        unpublished_news = []
+        for news_item in data.get('news', []):
+            if not news_item.get('published', False):
+                scheduled_time = news_item.get('scheduled_time')
+                if scheduled_time and scheduled_time <= current_time:
+                    unpublished_news.append(news_item)
+
+        if not unpublished_news:
+            return None
+
+        # Сортируем по приоритету и времени
+        unpublished_news.sort(key=lambda x: (
+            x.get('priority', 999),
+            x.get('scheduled_time', '99:99')
+        ))
+
+        return unpublished_news[0], len(unpublished_news)
+
+
+class SQLiteNewsStore(NewsStore):
+    """Хранилище в SQLite (режим WAL)"""
+
+    backend = BACKEND_SQLITE
+
+    def __init__(self, db_path: Path):
+        """
+        Инициализация и создание схемы
+
+        Args:
+            db_path: Путь к файлу базы данных
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        logger.debug(f"🗄️ Хранилище новостей SQLite: {self.db_path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Соединение текущего потока (создаётся при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _image_row(date_str: str, news_item: Dict) -> Optional[Tuple]:
+        """Строка таблицы images для новости (None если изображения нет)"""
+        if not news_item.get('image_generated') or not news_item.get('image_path'):
+            return None
+        return (
+            date_str, news_item['id'], news_item['image_path'],
+            news_item.get('image_size'), news_item.get('image_original_size'),
+            news_item.get('image_format')
+        )
+
+    @staticmethod
+    def _row_to_news(row: sqlite3.Row) -> Dict:
+        """Восстанавливает новость из строки news_items"""
+        news_item = json.loads(row['data'])
+        news_item['published'] = bool(row['published'])
+        if row['published_at']:
+            news_item['published_at'] = row['published_at']
+        if row['publication_attempts']:
+            news_item['publication_attempts'] = row['publication_attempts']
+        return news_item
+
+    def save_day(self, date: datetime, data: Dict) -> bool:
+        date_str = date.strftime('%Y-%m-%d')
+        news_list = data.get('news', [])
+        day_extra = {k: v for k, v in data.items()
+                     if k not in ('date', 'collected_at', 'total_news', 'partial', 'news')}
+
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM images WHERE date = ?", (date_str,))
+                conn.execute(
+                    "DELETE FROM news_items WHERE date = ? AND id NOT IN (SELECT value FROM json_each(?))",
+                    (date_str, json.dumps([news_item['id'] for news_item in news_list]))
+                )
+                conn.execute(
+                    "INSERT INTO news_days (date, collected_at, total_news, partial, data) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (date) DO UPDATE SET collected_at = excluded.collected_at, "
+                    "total_news = excluded.total_news, partial = excluded.partial, data = excluded.data",
+                    (date_str, data.get('collected_at'), data.get('total_news', len(news_list)),
+                     int(bool(data.get('partial'))), json.dumps(day_extra, ensure_ascii=False))
+                )
+                # Повторное сохранение дня (повтор или продолжение сбора, ручной --collect)
+                # не сбрасывает статус уже опубликованных новостей
+                conn.executemany(
+                    "INSERT INTO news_items (date, id, position, priority, scheduled_time, published, "
+                    "published_at, publication_attempts, title, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (date, id) DO UPDATE SET position = excluded.position, "
+                    "priority = excluded.priority, scheduled_time = excluded.scheduled_time, "
+                    "title = excluded.title, data = excluded.data, "
+                    "published = MAX(published, excluded.published), "
+                    "published_at = COALESCE(published_at, excluded.published_at), "
+                    "publication_attempts = MAX(publication_attempts, excluded.publication_attempts)",
+                    [
+                        (date_str, news_item['id'], position, news_item.get('priority'),
+                         news_item.get('scheduled_time'), int(bool(news_item.get('published'))),
+                         news_item.get('published_at'), news_item.get('publication_attempts', 0),
+                         news_item.get('title'), json.dumps(news_item, ensure_ascii=False))
+                        for position, news_item in enumerate(news_list)
+                    ]
+                )
+                image_rows = [row for row in (self._image_row(date_str, item) for item in news_list) if row]
+                conn.executemany(
+                    "INSERT INTO images (date, news_id, path, size, original_size, format) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    image_rows
+                )
+
+            logger.debug(f"🗄️ Подборка {date_str} сохранена в SQLite: {len(news_list)} новостей")
+            return True
+
+        except (sqlite3.Error, KeyError) as e:
+            logger.error(f"🗄️ Ошибка сохранения подборки {date_str} в SQLite: {e}")
+            metrics_collector.record_error('news_store', str(e))
+            return False
+
+    def load_day(self, date: datetime) -> Optional[Dict]:
+        date_str = date.strftime('%Y-%m-%d')
+
+        try:
+            conn = self._connect()
+            day = conn.execute("SELECT * FROM news_days WHERE date = ?", (date_str,)).fetchone()
+            if day is None:
+                return None
+
+            rows = conn.execute(
+                "SELECT * FROM news_items WHERE date = ? ORDER BY position", (date_str,)
+            ).fetchall()
+
+        except sqlite3.Error as e:
+            logger.error(f"🗄️ Ошибка чтения подборки {date_str} из SQLite: {e}")
+            return None
+
+        data = json.loads(day['data'])
+        data.update({
+            'date': date_str,
+            'collected_at': day['collected_at'],
+            'total_news': day['total_news'],
+            'news': [self._row_to_news(row) for row in rows]
+        })
+        if day['partial']:
+            data['partial'] = True
+        return data
+
+    def update_news_status(self, date: datetime, news_id: str, published: bool,
+                           attempt_count: Optional[int] = None, error: Optional[str] = None) -> bool:
+        date_str = date.strftime('%Y-%m-%d')
+        now = datetime.now().isoformat()
+
+        try:
+            with self._connect() as conn:
+                updated = conn.execute(
+                    "UPDATE news_items SET published = ?, "
+                    "published_at = CASE WHEN ? THEN ? ELSE published_at END, "
+                    "publication_attempts = COALESCE(?, publication_attempts) "
+                    "WHERE date = ? AND id = ?",
+                    (int(published), int(published), now, attempt_count, date_str, news_id)
+                ).rowcount
+                if updated:
+                    conn.execute(
+                        "INSERT INTO publication_attempts (date, news_id, attempted_at, success, error) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (date_str, news_id, now, int(published), error)
+                    )
+            return bool(updated)
+
+        except sqlite3.Error as e:
+            logger.error(f"🗄️ Ошибка обновления статуса {news_id} в SQLite: {e}")
+            metrics_collector.record_error('news_store', str(e))
+            return False
+
+    def get_next_unpublished(self, date: datetime, current_time: str) -> Optional[Tuple[Dict, int]]:
+        date_str = date.strftime('%Y-%m-%d')
+
+        try:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT *, COUNT(*) OVER () AS ready_count FROM news_items "
+                "WHERE date = ? AND published = 0 AND scheduled_time IS NOT NULL AND scheduled_time <= ? "
+                "ORDER BY COALESCE(priority, 999), scheduled_time LIMIT 1",
+                (date_str, current_time)
+            ).fetchall()
+
+        except sqlite3.Error as e:
+            logger.error(f"🗄️ Ошибка поиска новости к публикации в SQLite: {e}")
+            return None
+
+        if not rows:
+            return None
+        return self._row_to_news(rows[0]), rows[0]['ready_count']
+
+    def get_publication_attempts(self, date: datetime, news_id: str) -> List[Dict]:
+        """
+        Журнал попыток публикации новости
+
+        Args:
+            date: Дата подборки
+            news_id: ID новости
+
+        Returns:
+            List[Dict]: Попытки в порядке выполнения
+        """
+        rows = self._connect().execute(
+            "SELECT attempted_at, success, error FROM publication_attempts "
+            "WHERE date = ? AND news_id = ? ORDER BY attempt_id",
+            (date.strftime('%Y-%m-%d'), news_id)
+        ).fetchall()
+        return [dict(row, success=bool(row['success'])) for row in rows]
+
+    def has_day(self, date: datetime) -> bool:
+        """Есть ли подборка за дату в базе"""
+        row = self._connect().execute(
+            "SELECT 1 FROM news_days WHERE date = ?", (date.strftime('%Y-%m-%d'),)
+        ).fetchone()
+        return row is not None
+
+    def is_empty(self) -> bool:
+        """Нет ли в базе ни одной подборки"""
+        return self._connect().execute("SELECT 1 FROM news_days LIMIT 1").fetchone() is None
+
+    def import_json_files(self, data_dir: Path, overwrite: bool = False) -> int:
+        """
+        Однократный импорт существующих файлов daily_news_*.json
+
+        Args:
+            data_dir: Папка с файлами новостей
+            overwrite: Перезаписывать дни, которые уже есть в базе
+
+        Returns:
+            int: Количество импортированных дней
+        """
+        json_store = JsonNewsStore(data_dir)
+        pattern = config.NEWS_FILE_PATTERN.format(date='*')
+        imported = 0
+
+        for file_path in sorted(Path(data_dir).glob(pattern)):
+            date_part = file_path.stem[len(pattern.split('*')[0]):]
+            try:
+                date = datetime.strptime(date_part, '%Y-%m-%d')
+            except ValueError:
+                # Резервные копии и посторонние файлы пропускаем
+                continue
+
+            if not overwrite and self.has_day(date):
+                continue
+
+            data = json_store.load_day(date)
+            if data and self.save_day(date, data):
+                imported += 1
+                logger.info(f"📥 Импортирован {file_path.name}: {len(data.get('news', []))} новостей")
+
+        return imported
+
+    def export_json(self, date: datetime, file_path: Path) -> bool:
+        """
+        Экспортирует подборку за дату в JSON файл формата daily_news
+
+        Args:
+            date: Дата подборки
+            file_path: Куда сохранить
+
+        Returns:
+            bool: True если экспорт выполнен
+        """
+        data = self.load_day(date)
+        if data is None:
+            return False
+        return safe_json_write(file_path, data)
+
+    def close(self):
+        """Закрывает соединения всех потоков"""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def create_news_store(web_config: Optional[Dict] = None) -> NewsStore:
+    """
+    Создает хранилище новостей по настройкам storage веб-конфига
+
+    Настройки: storage.news_backend ('json' по умолчанию или 'sqlite'),
+    storage.sqlite_path (по умолчанию DATA_DIR/news.db).
+
+    Args:
+        web_config: Конфигурация из веб-интерфейса
+
+    Returns:
+        NewsStore: Выбранный бэкенд
+    """
+    storage_config = web_config.get('storage', {}) if web_config else {}
+    backend = storage_config.get('news_backend', BACKEND_JSON)
+    data_dir = Path(config.DATA_DIR)
+
+    if backend == BACKEND_SQLITE:
+        db_path = Path(storage_config.get('sqlite_path') or data_dir / DEFAULT_SQLITE_FILE)
+        try:
+            store = SQLiteNewsStore(db_path)
+            # Первый запуск с пустой базой: переносим накопленные JSON файлы
+            if store.is_empty():
+                imported = store.import_json_files(data_dir)
+                if imported:
+                    logger.info(f"📥 В SQLite перенесено {imported} подборок из JSON файлов")
+            return store
+        except sqlite3.Error as e:
+            logger.error(f"🗄️ Не удалось открыть SQLite {db_path}: {e}, используем JSON файлы")
+    elif backend != BACKEND_JSON:
+        logger.warning(f"⚠️ Неизвестное хранилище новостей '{backend}', используем JSON файлы")
+
+    return JsonNewsStore(data_dir)
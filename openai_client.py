@@ -9,8 +9,11 @@ import random
 from typing import Optional
 from loguru import logger
 from openai import OpenAI
+import httpx
 
 import config
+from cache_manager import image_cache
+from http_instrumentation import InstrumentedTransport, instrumented_session
 from prompts import (
     get_openai_comic_styles,
     get_openai_comic_prompt,
@@ -20,6 +23,10 @@ from prompts import (
 )
 
 
+# Лимиты пула соединений (как у клиента OpenAI SDK по умолчанию)
+OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+
 class OpenAIClient:
     """Клиент для работы с OpenAI API для генерации изображений"""
     
@@ -32,6 +39,8 @@ class OpenAIClient:
         """
         self.api_key = config.OPENAI_API_KEY
         self.client = None
+        # Загрузка готовых изображений по URL из ответа API
+        self.download_session = instrumented_session('openai_images')
         
         # Используем настройки из веб-конфига если они переданы
         if web_config and 'api_models' in web_config:
@@ -79,7 +88,14 @@ class OpenAIClient:
         if not self.api_key:
             logger.warning("OPENAI_API_KEY не установлен")
         else:
-            self.client = OpenAI(api_key=self.api_key)
+            # Транспорт с учетом запросов в metrics_collector
+            self.client = OpenAI(
+                api_key=self.api_key,
+                http_client=httpx.Client(
+                    transport=InstrumentedTransport(api_name='openai', limits=OPENAI_HTTP_LIMITS),
+                    follow_redirects=True
+                )
+            )
     
     def _create_comic_prompt(self, news_content: str) -> str:
         """
@@ -115,6 +131,12 @@ class OpenAIClient:
             logger.error("OpenAI клиент не инициализирован")
             return None
         
+        cache_key = image_cache.make_key(news_content, self.model, self.image_size, self.image_quality)
+        cached_image = image_cache.get(cache_key)
+        if cached_image:
+            logger.info(f"♻️ Комикс для этой новости уже генерировался, берём из кеша ({len(cached_image)} байт)")
+            return cached_image
+        
         try:
             prompt = self._create_comic_prompt(news_content)
             logger.info("Генерирую комикс с помощью OpenAI Image Generation...")
@@ -169,8 +191,7 @@ class OpenAIClient:
             elif hasattr(response.data[0], 'url') and response.data[0].url:
                 # Если есть URL, загружаем изображение
                 image_url = response.data[0].url
-                import requests
-                image_response = requests.get(image_url, timeout=30)
+                image_response = self.download_session.get(image_url, timeout=30)
                 image_response.raise_for_status()
                 image_bytes = image_response.content
                 logger.debug(f"Загружено изображение с URL: {image_url[:50]}...")
@@ -178,6 +199,7 @@ class OpenAIClient:
                 raise ValueError("Ответ не содержит ни URL, ни base64 данных")
             
             logger.info(f"Комикс сгенерирован успешно, размер: {len(image_bytes)} байт")
+            image_cache.put(cache_key, image_bytes)
             return image_bytes
             
         except Exception as e:
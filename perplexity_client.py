@@ -2,7 +2,7 @@ import requests  # Добавлен отсутствующий импорт
 import json
 import re
 from datetime import datetime, timedelta
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Iterator
 from loguru import logger
 
 import config
@@ -12,6 +12,46 @@ from prompts import (
     PromptConfig
 )
 from validation import is_content_fresh, get_date_feedback_for_next_prompt
+from async_perplexity_client import perplexity_transport, TransportResponse
+
+
+def iter_stream_content(response: TransportResponse) -> Iterator[str]:
+    """
+    Читает SSE поток Perplexity API (stream: true) и отдаёт фрагменты текста
+    
+    Args:
+        response: Ответ, полученный с stream=True
+        
+    Yields:
+        str: Очередной фрагмент контента из choices[0].delta.content
+    """
+    # Строки приходят байтами: декодируем UTF-8 сами, не полагаясь на charset ответа
+    for raw_line in response.iter_lines():
+        line = raw_line.decode('utf-8', errors='replace') if raw_line else ''
+        if not line.startswith('data:'):
+            continue
+        
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            break
+        
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            logger.debug(f"Пропущен некорректный SSE фрагмент: {data[:100]}")
+            continue
+        
+        choices = event.get('choices') or []
+        if not choices:
+            continue
+        
+        delta = choices[0].get('delta') or {}
+        content = delta.get('content')
+        if content:
+            yield content
+        
+        if choices[0].get('finish_reason'):
+            break
 
 
 class PerplexityClient:
@@ -270,11 +310,11 @@ class PerplexityClient:
                     payload["enable_deep_search"] = self.web_search_options['enable_deep_search']
                 logger.info(f"Deep Research режим с контекстом: {self.web_search_options.get('search_context_size', 'default')}")
             
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=self.timeout
+            response = perplexity_transport.post_sync(
+                payload,
+                timeout=self.timeout,
+                url=self.api_url,
+                headers=self.headers
             )
             
             response.raise_for_status()
@@ -341,11 +381,11 @@ class PerplexityClient:
                 "return_citations": False  # Отключаем для теста
             }
             
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=test_payload,
-                timeout=10
+            response = perplexity_transport.post_sync(
+                test_payload,
+                timeout=10,
+                url=self.api_url,
+                headers=self.headers
             )
             
             response.raise_for_status()
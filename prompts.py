@@ -7,7 +7,9 @@
 - OpenAI GPT-Image-1 (генерация комиксов)
 """
 
+import re
 from datetime import datetime, timedelta
+from typing import Optional
 from loguru import logger
 
 # Пытаемся загрузить кастомные промпты из веб-интерфейса
@@ -129,6 +131,106 @@ def get_perplexity_daily_collection_prompt() -> str:
 - Фокус на практические последствия для людей"""
 
 
+# Правовые области для параллельного сбора (fan-out): ключ, название, на что смотреть
+COLLECTION_DOMAINS = [
+    {
+        'key': 'tax',
+        'name': 'Налоги и сборы',
+        'focus': 'НК РФ, ставки и вычеты, НДФЛ, НДС, имущественные налоги, самозанятые, разъяснения ФНС'
+    },
+    {
+        'key': 'labour',
+        'name': 'Трудовое право',
+        'focus': 'ТК РФ, МРОТ, отпуска и больничные, увольнения, удалённая работа, трудовые споры'
+    },
+    {
+        'key': 'traffic',
+        'name': 'Транспорт и КоАП',
+        'focus': 'ПДД, штрафы КоАП РФ, водительские права, ОСАГО, камеры и парковки'
+    },
+    {
+        'key': 'digital',
+        'name': 'Цифровая сфера',
+        'focus': 'персональные данные, Госуслуги, маркетплейсы, связь, IT-регулирование, цифровой рубль'
+    },
+    {
+        'key': 'social',
+        'name': 'Социальные выплаты',
+        'focus': 'пенсии, пособия, материнский капитал, СФР, льготы и компенсации'
+    },
+    {
+        'key': 'housing',
+        'name': 'Жильё и ЖКХ',
+        'focus': 'тарифы ЖКХ, ипотека, долевое строительство, управляющие компании, аренда'
+    },
+    {
+        'key': 'business',
+        'name': 'Бизнес и финансы',
+        'focus': 'ИП и малый бизнес, банки и вклады, проверки, лицензии, маркировка товаров'
+    }
+]
+
+
+def get_perplexity_domain_collection_prompt(domain: dict, news_count: int = 3) -> str:
+    """
+    Промпт для сбора новостей одной правовой области (режим fan-out)
+    
+    Args:
+        domain: Элемент COLLECTION_DOMAINS
+        news_count: Сколько новостей искать в области
+        
+    Returns:
+        str: Промпт для Perplexity
+    """
+    return f"""Проведи глубокий анализ изменений в российском законодательстве за ВЧЕРА в области: {domain['name'].upper()}.
+
+🎯 ЗАДАЧА: Найди до {news_count} самых важных новостей ТОЛЬКО по этой области ({domain['focus']}).
+Если значимых изменений нет - верни меньше новостей, не добавляй новости из других областей.
+
+ПРИОРИТЕТ каждой новости ставь по общей шкале (её сравнят с новостями других областей):
+1. КРИТИЧЕСКИ ВАЖНО - затрагивает миллионы граждан (налоги, пособия, штрафы)
+2. ОЧЕНЬ ВАЖНО - значительные изменения в популярных сферах
+3. ВАЖНО - изменения в специализированных областях
+4. СРЕДНЯЯ - технические изменения, уточнения процедур
+5. УМЕРЕННАЯ - отраслевые изменения, региональные вопросы
+6. ДОПОЛНИТЕЛЬНАЯ - профессиональные изменения, узкие области
+7. НИЗКАЯ - вспомогательные изменения, процедурные вопросы
+
+ТРЕБОВАНИЯ К КАЖДОЙ НОВОСТИ:
+- Конкретные цифры: суммы, проценты, сроки, даты
+- Кого именно затрагивает изменение и практический эффект
+- Точная дата вступления в силу или принятия
+- Минимум 2 надежных источника
+
+ФОРМАТ ОТВЕТА (строго соблюдай структуру, новости разделяй строкой ---):
+
+ПРИОРИТЕТ [номер] - [КРИТИЧЕСКИ ВАЖНО/ОЧЕНЬ ВАЖНО/ВАЖНО/СРЕДНЯЯ/УМЕРЕННАЯ/ДОПОЛНИТЕЛЬНАЯ/НИЗКАЯ]:
+📜 [Название закона/изменения]
+
+💬 КОММЕНТАРИЙ КАРМАННОГО КОНСУЛЬТАНТА:
+
+[Первый абзац - суть изменения с конкретными цифрами]
+
+[Второй абзац - кого затронет и практические последствия]
+
+[Третий абзац - ироничное наблюдение или совет]
+
+ИСТОЧНИКИ:
+🔗 Источник 1: [ссылка]
+🔗 Источник 2: [ссылка]
+
+---
+
+ЕСЛИ НЕТ СВЕЖИХ НОВОСТЕЙ ЗА ВЧЕРА:
+Найди важные изменения этой области, которые ВСТУПАЮТ В СИЛУ в ближайшие 2-4 недели.
+Обязательно укажи: "Вступает в силу [конкретная дата]"
+
+СТИЛЬ:
+- Юридический с легкой иронией, живой язык опытного практика
+- 1-2 эмодзи на новость (умеренно!)
+- Каждая новость 100-150 слов"""
+
+
 def get_perplexity_news_prompt() -> str:
     """Основной промпт для поиска одной законодательной новости (legacy)"""
     
@@ -298,6 +400,77 @@ def get_comic_context_from_news(news_content: str) -> str:
     return ' '.join(key_points)
 
 
+def parse_news_section(section: str, index: int) -> Optional[dict]:
+    """
+    Парсит одну секцию ответа Deep Research (текст после "ПРИОРИТЕТ ")
+    
+    Args:
+        section: Текст секции без префикса "ПРИОРИТЕТ "
+        index: Порядковый номер секции (используется как fallback приоритета)
+        
+    Returns:
+        dict: Новость или None если в секции нет заголовка или контента
+    """
+    # Извлекаем приоритет из заголовка секции
+    priority_line = section.split('\n')[0]
+    if 'КРИТИЧЕСКИ ВАЖНО' in priority_line:
+        priority = 1
+    elif 'ОЧЕНЬ ВАЖНО' in priority_line:
+        priority = 2
+    elif 'ВАЖНО' in priority_line and 'ОЧЕНЬ' not in priority_line:
+        priority = 3
+    elif 'СРЕДНЯЯ' in priority_line:
+        priority = 4
+    elif 'УМЕРЕННАЯ' in priority_line:
+        priority = 5
+    elif 'ДОПОЛНИТЕЛЬНАЯ' in priority_line:
+        priority = 6
+    elif 'НИЗКАЯ' in priority_line:
+        priority = 7
+    else:
+        priority = index  # fallback по порядку
+    
+    # Разделяем контент и источники
+    if 'ИСТОЧНИКИ:' in section:
+        content_part, sources_part = section.split('ИСТОЧНИКИ:', 1)
+    else:
+        content_part = section
+        sources_part = ""
+    
+    # Извлекаем заголовок (строка с 📜)
+    title = ""
+    content_lines = content_part.split('\n')
+    for line in content_lines:
+        if '📜' in line:
+            title = line.replace('📜', '').strip()
+            break
+    
+    # Извлекаем основной контент (все кроме заголовка приоритета)
+    content = '\n'.join(content_lines[1:]).strip()
+    
+    # Извлекаем источники
+    sources = []
+    if sources_part:
+        for line in sources_part.split('\n'):
+            if '🔗' in line and 'http' in line:
+                # Ищем URL в строке
+                url_match = re.search(r'https?://[^\s\)]+', line)
+                if url_match:
+                    # Убираем лишние символы в конце URL
+                    clean_url = url_match.group().rstrip('.,;:)')
+                    sources.append(clean_url)
+    
+    if not (title and content):  # Добавляем только если есть заголовок и контент
+        return None
+    
+    return {
+        'priority': priority,
+        'title': title,
+        'content': content,
+        'sources': sources
+    }
+
+
 def parse_collected_news(raw_content: str) -> list:
     """
     Парсит собранные новости из ответа Deep Research
@@ -315,63 +488,8 @@ def parse_collected_news(raw_content: str) -> list:
     
     for i, section in enumerate(sections[1:], 1):  # Пропускаем первую пустую секцию
         try:
-            # Извлекаем приоритет из заголовка секции
-            priority_line = section.split('\n')[0]
-            if 'КРИТИЧЕСКИ ВАЖНО' in priority_line:
-                priority = 1
-            elif 'ОЧЕНЬ ВАЖНО' in priority_line:
-                priority = 2
-            elif 'ВАЖНО' in priority_line and 'ОЧЕНЬ' not in priority_line:
-                priority = 3
-            elif 'СРЕДНЯЯ' in priority_line:
-                priority = 4
-            elif 'УМЕРЕННАЯ' in priority_line:
-                priority = 5
-            elif 'ДОПОЛНИТЕЛЬНАЯ' in priority_line:
-                priority = 6
-            elif 'НИЗКАЯ' in priority_line:
-                priority = 7
-            else:
-                priority = i  # fallback по порядку
-            
-            # Разделяем контент и источники
-            if 'ИСТОЧНИКИ:' in section:
-                content_part, sources_part = section.split('ИСТОЧНИКИ:', 1)
-            else:
-                content_part = section
-                sources_part = ""
-            
-            # Извлекаем заголовок (строка с 📜)
-            title = ""
-            content_lines = content_part.split('\n')
-            for line in content_lines:
-                if '📜' in line:
-                    title = line.replace('📜', '').strip()
-                    break
-            
-            # Извлекаем основной контент (все кроме заголовка приоритета)
-            content = '\n'.join(content_lines[1:]).strip()
-            
-            # Извлекаем источники
-            sources = []
-            if sources_part:
-                for line in sources_part.split('\n'):
-                    if '🔗' in line and 'http' in line:
-                        # Ищем URL в строке
-                        import re
-                        url_match = re.search(r'https?://[^\s\)]+', line)
-                        if url_match:
-                            # Убираем лишние символы в конце URL
-                            clean_url = url_match.group().rstrip('.,;:)')
-                            sources.append(clean_url)
-            
-            if title and content:  # Добавляем только если есть заголовок и контент
-                news_item = {
-                    'priority': priority,
-                    'title': title,
-                    'content': content,
-                    'sources': sources
-                }
+            news_item = parse_news_section(section, i)
+            if news_item:
                 news_list.append(news_item)
                 
         except Exception as e:
@@ -385,6 +503,148 @@ def parse_collected_news(raw_content: str) -> list:
     return news_list
 
 
+class IncrementalNewsParser:
+    """
+    Инкрементальный парсер потокового ответа Deep Research
+    
+    Принимает текст кусками (SSE чанки) и отдаёт каждую секцию ПРИОРИТЕТ
+    как только закрылся её блок ИСТОЧНИКИ:, не дожидаясь конца ответа.
+    В буфере хранится только текущая незавершённая секция.
+    """
+    
+    SECTION_MARKER = 'ПРИОРИТЕТ '
+    
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._tag_tail = ""
+        self._section_index = 0
+        self.news = []
+    
+    def feed(self, chunk: str) -> list:
+        """
+        Добавляет очередной кусок ответа
+        
+        Args:
+            chunk: Новый фрагмент текста
+            
+        Returns:
+            list: Новости, секции которых завершились в этом фрагменте
+        """
+        self._buffer += self._strip_think(chunk)
+        return self._drain(final=False)
+    
+    def finish(self) -> list:
+        """
+        Завершает разбор и отдаёт последнюю секцию
+        
+        Returns:
+            list: Оставшиеся новости
+        """
+        return self._drain(final=True)
+    
+    def _strip_think(self, chunk: str) -> str:
+        """Вырезает блоки рассуждений <think>...</think> на лету"""
+        # Хвост вида "<thi" держим до следующего чанка
+        chunk = self._tag_tail + chunk
+        self._tag_tail = ''
+        result = []
+        
+        while chunk:
+            tag = '</think>' if self._in_think else '<think>'
+            pos = chunk.find(tag)
+            if pos == -1:
+                # Тег может быть разрезан между чанками
+                keep = 0
+                for size in range(len(tag) - 1, 0, -1):
+                    if chunk.endswith(tag[:size]):
+                        keep = size
+                        break
+                if not self._in_think:
+                    result.append(chunk[:len(chunk) - keep])
+                self._tag_tail = chunk[len(chunk) - keep:] if keep else ''
+                break
+            if not self._in_think:
+                result.append(chunk[:pos])
+            self._in_think = not self._in_think
+            chunk = chunk[pos + len(tag):]
+        
+        return ''.join(result)
+    
+    @staticmethod
+    def _sources_closed(section: str) -> Optional[int]:
+        """
+        Проверяет, закрыт ли блок ИСТОЧНИКИ: в секции
+        
+        Блок считается закрытым, когда после него появилась полная непустая
+        строка без ссылки (обычно разделитель "---").
+        
+        Returns:
+            int: Позиция конца секции или None если блок ещё пишется
+        """
+        sources_pos = section.find('ИСТОЧНИКИ:')
+        if sources_pos == -1:
+            return None
+        
+        line_start = section.find('\n', sources_pos)
+        while line_start != -1:
+            line_end = section.find('\n', line_start + 1)
+            if line_end == -1:
+                return None  # Строка ещё не дописана
+            line = section[line_start + 1:line_end].strip()
+            if line and '🔗' not in line and 'http' not in line:
+                return line_start + 1
+            line_start = line_end
+        
+        return None
+    
+    def _emit(self, section: str) -> Optional[dict]:
+        """Парсит завершённую секцию"""
+        self._section_index += 1
+        try:
+            news_item = parse_news_section(section, self._section_index)
+        except Exception as e:
+            logger.warning(f"Ошибка парсинга секции {self._section_index}: {e}")
+            return None
+        if news_item:
+            self.news.append(news_item)
+        return news_item
+    
+    def _drain(self, final: bool) -> list:
+        """Выделяет из буфера все завершённые секции"""
+        ready = []
+        marker = self.SECTION_MARKER
+        
+        while True:
+            start = self._buffer.find(marker)
+            if start == -1:
+                # Преамбула до первой секции не нужна, но хвост может быть началом маркера
+                self._buffer = self._buffer[-len(marker):] if not final else ""
+                break
+            
+            body_start = start + len(marker)
+            next_start = self._buffer.find(marker, body_start)
+            
+            if next_start != -1:
+                section = self._buffer[body_start:next_start]
+                self._buffer = self._buffer[next_start:]
+            else:
+                section_text = self._buffer[body_start:]
+                section_end = len(section_text) if final else self._sources_closed(section_text)
+                if section_end is None:
+                    # Секция ещё пишется - ждём следующих чанков
+                    self._buffer = self._buffer[start:]
+                    break
+                section = section_text[:section_end]
+                self._buffer = section_text[section_end:]
+            
+            news_item = self._emit(section)
+            if news_item:
+                ready.append(news_item)
+        
+        return ready
+
+
 # =============================================================================
 # КОНФИГУРАЦИЯ ПРОМПТОВ
 # =============================================================================
@@ -395,6 +655,8 @@ class PromptConfig:
     # Perplexity настройки
     PERPLEXITY_MAX_TOKENS = 900  # Для одиночных новостей
     PERPLEXITY_COLLECTION_MAX_TOKENS = 8192  # Максимум для Deep Research при сборе
+    PERPLEXITY_DOMAIN_MAX_TOKENS = 4096  # Для одной области в режиме fan-out
+    PERPLEXITY_DOMAIN_NEWS_COUNT = 3  # Новостей на область в режиме fan-out
     PERPLEXITY_TEMPERATURE = 0.2
     PERPLEXITY_TOP_P = 0.9
     
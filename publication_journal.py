@@ -0,0 +1,244 @@
+"""
+Журнал публикаций для NEWSMAKER
+
+Append-only JSONL рядом с файлом новостей дня: каждая попытка публикации
+добавляет одну строку (с fsync), а сам daily_news_YYYY-MM-DD.json после
+сбора не переписывается. Актуальные статусы получаются наложением журнала
+на файл сбора. Периодическая компактизация переносит накопленные события
+в файл дня (атомарно) и очищает журнал.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from loguru import logger
+
+
+JOURNAL_PREFIX = 'publications_'
+
+# После скольких событий журнал переносится в файл дня
+COMPACT_EVERY_EVENTS = 50
+
+EVENT_ATTEMPT = 'attempt'
+
+
+class PublicationJournal:
+    """Журнал событий публикации за один день"""
+
+    def __init__(self, data_dir: Path, date: datetime):
+        """
+        Инициализация
+
+        Args:
+            data_dir: Папка с файлами новостей
+            date: Дата подборки новостей
+        """
+        self.path = Path(data_dir) / f"{JOURNAL_PREFIX}{date.strftime('%Y-%m-%d')}.jsonl"
+        # Журнал, который переносится в файл дня (новые события в это время идут в self.path)
+        self.compacting_path = self.path.with_suffix('.compacting')
+        self._lock = threading.Lock()
+        self._pending_events: Optional[int] = None
+
+    @property
+    def pending_events(self) -> int:
+        """Количество событий, ещё не перенесённых в файл дня"""
+        if self._pending_events is None:
+            self._pending_events = len(self.read())
+        return self._pending_events
+
+    def append(self, event: Dict) -> bool:
+        """
+        Добавляет событие в журнал (одна строка, fsync)
+
+        Args:
+            event: Событие публикации
+
+        Returns:
+            bool: True если событие записано на диск
+        """
+        line = (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8')
+
+        with self._lock:
+            try:
+                # O_APPEND: строка целиком дописывается в конец даже при нескольких процессах.
+                # O_BINARY (только Windows): без него '\n' записывается как '\r\n'
+                flags = os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+                fd = os.open(self.path, flags, 0o644)
+                try:
+                    # После сбоя последняя строка может быть оборвана - начинаем с новой
+                    # (os.pread есть только в Unix)
+                    size = os.fstat(fd).st_size
+                    if size:
+                        os.lseek(fd, size - 1, os.SEEK_SET)
+                        if os.read(fd, 1) != b'\n':
+                            line = b'\n' + line
+                    os.write(fd, line)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                if self._pending_events is not None:
+                    self._pending_events += 1
+                return True
+
+            except OSError as e:
+                logger.error(f"💾 Ошибка записи в журнал {self.path.name}: {e}")
+                return False
+
+    def read(self) -> List[Dict]:
+        """
+        Читает события журнала
+
+        Оборванная последняя строка (сбой во время записи) пропускается.
+        Незавершённая компактизация читается первой: повторное применение
+        событий к файлу дня ничего не меняет.
+
+        Returns:
+            List[Dict]: События в порядке записи
+        """
+        events = []
+        for path in (self.compacting_path, self.path):
+            if path.exists():
+                events.extend(self._read_file(path))
+        return events
+
+    @staticmethod
+    def _read_file(path: Path) -> List[Dict]:
+        """Читает события из одного файла журнала"""
+        events = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning(f"⚠️ Пропущена повреждённая строка {line_number} журнала {path.name}")
+
+        except OSError as e:
+            logger.error(f"💥 Ошибка чтения журнала {path.name}: {e}")
+
+        return events
+
+    def start_compaction(self) -> bool:
+        """
+        Откладывает текущие события для переноса в файл дня
+
+        Returns:
+            bool: True если есть что переносить
+        """
+        with self._lock:
+            try:
+                if self.path.exists() and not self.compacting_path.exists():
+                    self.path.rename(self.compacting_path)
+                return self.compacting_path.exists()
+            except OSError as e:
+                logger.error(f"Ошибка компактизации журнала {self.path.name}: {e}")
+                return False
+
+    def finish_compaction(self):
+        """Удаляет перенесённые в файл дня события"""
+        with self._lock:
+            try:
+                if self.compacting_path.exists():
+                    self.compacting_path.unlink()
+            except OSError as e:
+                logger.error(f"Ошибка компактизации журнала {self.path.name}: {e}")
+            self._pending_events = None
+
+    def clear(self):
+        """Очищает журнал полностью (файл дня перезаписан целиком)"""
+        with self._lock:
+            for path in (self.compacting_path, self.path):
+                try:
+                    if path.exists():
+                        path.unlink()
+                except OSError as e:
+                    logger.error(f"Ошибка очистки журнала {path.name}: {e}")
+            self._pending_events = 0
+
+
+def make_attempt_event(base_id: str, news_id: str, published: bool,
+                       attempt_count=None, error=None) -> Dict:
+    """
+    Создает событие попытки публикации
+
+    Args:
+        base_id: Идентификатор файла сбора (collected_at), к которому относится событие
+        news_id: ID новости
+        published: Успешна ли публикация
+        attempt_count: Количество попыток после этой
+        error: Причина неудачи
+
+    Returns:
+        Dict: Событие для журнала
+    """
+    event = {
+        'ts': datetime.now().isoformat(),
+        'event': EVENT_ATTEMPT,
+        'base': base_id,
+        'news_id': news_id,
+        'published': published
+    }
+    if attempt_count is not None:
+        event['attempts'] = attempt_count
+    if error:
+        event['error'] = error
+    return event
+
+
+def apply_events(data: Dict, events: List[Dict]) -> int:
+    """
+    Накладывает события журнала на данные файла дня (на месте)
+
+    События другого сбора (файл дня был пересобран) не применяются.
+
+    Args:
+        data: Данные файла новостей
+        events: События журнала
+
+    Returns:
+        int: Количество применённых событий
+    """
+    news_by_id = {news_item.get('id'): news_item for news_item in data.get('news', [])}
+    base_id = data.get('collected_at')
+    applied = 0
+
+    for event in events:
+        news_item = news_by_id.get(event.get('news_id'))
+        if event.get('event') != EVENT_ATTEMPT or news_item is None or event.get('base') != base_id:
+            continue
+
+        news_item['published'] = event['published']
+        if event['published']:
+            news_item['published_at'] = event['ts']
+        if 'attempts' in event:
+            news_item['publication_attempts'] = event['attempts']
+        applied += 1
+
+    return applied
+
+
+def cleanup_old_journals(data_dir: Path, cutoff_date: datetime):
+    """
+    Удаляет журналы публикаций старше указанной даты
+
+    Args:
+        data_dir: Папка с файлами новостей
+        cutoff_date: Граничная дата
+    """
+    for file_path in Path(data_dir).glob(f"{JOURNAL_PREFIX}*"):
+        try:
+            date_part = file_path.name[len(JOURNAL_PREFIX):][:10]
+            file_date = datetime.strptime(date_part, '%Y-%m-%d').date()
+
+            if file_date < cutoff_date.date():
+                file_path.unlink()
+                logger.info(f"Удален старый журнал публикаций: {file_path.name}")
+
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ошибка при обработке файла {file_path}: {e}")
@@ -6,6 +6,7 @@
 
 import time
 import random
+import asyncio
 from typing import TypeVar, Callable, Optional, Any, Dict
 from functools import wraps
 from loguru import logger
@@ -20,6 +21,9 @@ from tenacity import (
 import requests
 from openai import RateLimitError, APIError, Timeout
 
+from async_perplexity_client import perplexity_transport, TransportResponse
+from tracing import add_event, set_attribute
+
 # Типы для типизации
 T = TypeVar('T')
 
@@ -53,6 +57,7 @@ def retry_with_exponential_backoff(
                 try:
                     attempt += 1
                     logger.debug(f"Попытка {attempt}/{max_attempts} для {func.__name__}")
+                    set_attribute('retry.attempts', attempt)
                     return func(*args, **kwargs)
                     
                 except (requests.exceptions.Timeout, 
@@ -75,6 +80,8 @@ def retry_with_exponential_backoff(
                         f"Ошибка {type(e).__name__} в {func.__name__}, "
                         f"повтор через {wait_time:.1f} сек..."
                     )
+                    add_event('retry', attempt=attempt, wait_s=round(wait_time, 2),
+                              error=type(e).__name__, function=func.__name__)
                     time.sleep(wait_time)
                     
                 except Exception as e:
@@ -101,15 +108,34 @@ def retry_api_call(
         max_attempts: Максимум попыток
         wait_multiplier: Множитель для задержки
     """
+    log_before_sleep = before_sleep_log(logger, "WARNING")
+    
+    def before_sleep(retry_state):
+        log_before_sleep(retry_state)
+        _trace_retry(retry_state)
+    
     return retry(
         stop=stop_after_attempt(max_attempts),
         wait=wait_exponential(multiplier=wait_multiplier, min=1, max=30),
         retry=retry_if_exception_type(exceptions),
-        before_sleep=before_sleep_log(logger, "WARNING"),
+        before_sleep=before_sleep,
         after=after_log(logger, "INFO")
     )
 
 
+def _trace_retry(retry_state):
+    """Отмечает повтор tenacity в текущем span трассировки"""
+    exception = retry_state.outcome.exception() if retry_state.outcome else None
+    set_attribute('retry.attempts', retry_state.attempt_number + 1)
+    add_event(
+        'retry',
+        attempt=retry_state.attempt_number,
+        wait_s=round(retry_state.next_action.sleep, 2) if retry_state.next_action else None,
+        error=type(exception).__name__ if exception else None,
+        function=getattr(retry_state.fn, '__name__', None)
+    )
+
+
 # ========================================================================
 # ОБРАБОТЧИКИ RATE LIMITING
 # ========================================================================
@@ -159,20 +185,26 @@ class PerplexityRetryHandler:
     
     @staticmethod
     @retry_api_call(max_attempts=3, wait_multiplier=2)
-    def make_request(url: str, headers: Dict, json_data: Dict, timeout: int) -> requests.Response:
+    def make_request(url: str, headers: Dict, json_data: Dict, timeout: int,
+                     stream: bool = False) -> TransportResponse:
         """
         Выполняет запрос к Perplexity API с обработкой ошибок
         
+        Запрос идёт через общий пул соединений perplexity_transport.
+        
         Args:
             url: URL API endpoint
             headers: Заголовки запроса
             json_data: Тело запроса
             timeout: Таймаут запроса
+            stream: Не читать тело сразу (для SSE ответов)
             
         Returns:
             Response объект
         """
-        response = requests.post(url, headers=headers, json=json_data, timeout=timeout)
+        response = perplexity_transport.post_sync(
+            json_data, timeout=timeout, url=url, headers=headers, stream=stream
+        )
         
         # Проверяем rate limiting
         if response.status_code == 429:
@@ -183,6 +215,34 @@ class PerplexityRetryHandler:
         
         response.raise_for_status()
         return response
+    
+    @staticmethod
+    @retry_api_call(max_attempts=3, wait_multiplier=2)
+    async def post_async(json_data: Dict, timeout: int) -> TransportResponse:
+        """
+        Асинхронный запрос к Perplexity API с той же политикой повторов
+        
+        Для параллельных запросов из event loop (сбор по правовым областям):
+        паузы между попытками не блокируют остальные запросы.
+        
+        Args:
+            json_data: Тело запроса
+            timeout: Таймаут запроса
+            
+        Returns:
+            Response объект
+        """
+        response = await perplexity_transport.post(json_data, timeout=timeout)
+        
+        # Проверяем rate limiting
+        if response.status_code == 429:
+            retry_after = int(response.headers.get('Retry-After', 60))
+            logger.warning(f"Rate limit достигнут, ожидание {retry_after} сек")
+            await asyncio.sleep(retry_after)
+            raise requests.exceptions.RequestException("Rate limit exceeded")
+        
+        response.raise_for_status()
+        return response
 
 
 class OpenAIRetryHandler:
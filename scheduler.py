@@ -8,6 +8,7 @@ from perplexity_client import PerplexityClient
 from telegram_client import TelegramClient
 from openai_client import OpenAIClient
 from news_scheduler import NewsmakerScheduler as NewNewsmakerScheduler
+from async_runtime import runtime
 import config
 
 
@@ -199,11 +200,7 @@ class LegacyNewsmakerScheduler:
         # Тест Telegram API (асинхронный)
         logger.info("Тестирование Telegram API...")
         try:
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            telegram_ok = loop.run_until_complete(self.telegram_client.test_connection())
-            loop.close()
+            telegram_ok = runtime.run(self.telegram_client.test_connection())
             
             if telegram_ok:
                 logger.info("✅ Telegram API работает")
@@ -0,0 +1,202 @@
+"""
+Планировщик задач по событиям для NEWSMAKER
+
+Вместо опроса schedule.run_pending() раз в минуту вычисляет время
+ближайшей задачи по расписанию (в часовом поясе расписания, через
+timezone_utils) и спит ровно до него. Сон прерывается сразу при остановке
+(SIGTERM, stop()) и при запросе перечитать расписание (SIGHUP,
+request_reload()).
+"""
+
+import signal
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional
+from loguru import logger
+
+from monitoring import metrics_collector
+from timezone_utils import get_timezone, parse_time_string
+
+
+# Сон не дольше 15 минут: сверка с часами, если системное время перевели
+MAX_SLEEP_SECONDS = 900.0
+
+
+def next_daily_run(time_str: str, after: datetime, tz_name: str = "Europe/Moscow") -> datetime:
+    """
+    Ближайшее наступление ежедневного времени после указанного момента
+
+    Args:
+        time_str: Время в формате "HH:MM"
+        after: Момент отсчета (с часовым поясом)
+        tz_name: Часовой пояс расписания
+
+    Returns:
+        datetime: Время запуска в часовом поясе расписания
+    """
+    candidate = parse_time_string(time_str, after, tz_name)
+    if candidate <= after:
+        candidate = parse_time_string(time_str, after + timedelta(days=1), tz_name)
+    return candidate
+
+
+@dataclass
+class ScheduledJob:
+    """Ежедневная задача планировщика"""
+    name: str
+    at: str  # "HH:MM" в часовом поясе расписания
+    func: Callable[[], Any]
+    tz_name: str = "Europe/Moscow"
+    next_run: Optional[datetime] = None
+
+    def schedule_next(self, after: datetime):
+        self.next_run = next_daily_run(self.at, after, self.tz_name)
+
+
+class EventScheduler:
+    """Планировщик, который спит до ближайшей задачи"""
+
+    def __init__(self, tz_name: str = "Europe/Moscow"):
+        """
+        Args:
+            tz_name: Часовой пояс, в котором заданы времена задач
+        """
+        self.tz_name = tz_name
+        self.jobs: List[ScheduledJob] = []
+        self._wakeup = threading.Event()
+        self._stop_requested = False
+        self._reload_requested = False
+
+    def now(self) -> datetime:
+        return datetime.now(get_timezone(self.tz_name))
+
+    # ------------------------------------------------------------------
+    # Задачи
+    # ------------------------------------------------------------------
+
+    def add_daily_job(self, name: str, at: str, func: Callable[[], Any]) -> ScheduledJob:
+        """
+        Добавляет ежедневную задачу
+
+        Args:
+            name: Название для логов
+            at: Время запуска "HH:MM"
+            func: Функция без аргументов
+
+        Returns:
+            ScheduledJob
+        """
+        job = ScheduledJob(name, at, func, self.tz_name)
+        job.schedule_next(self.now())
+        self.jobs.append(job)
+        # Цикл мог уснуть до более поздней задачи
+        self._wakeup.set()
+        return job
+
+    def clear(self):
+        """Удаляет все задачи"""
+        self.jobs = []
+        self._wakeup.set()
+
+    def next_job(self) -> Optional[ScheduledJob]:
+        """Задача с ближайшим временем запуска"""
+        return min(self.jobs, key=lambda job: job.next_run, default=None)
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> Optional[float]:
+        """Секунд до ближайшей задачи (None, если задач нет)"""
+        job = self.next_job()
+        if job is None:
+            return None
+        return max(0.0, (job.next_run - (now or self.now())).total_seconds())
+
+    def run_pending(self, now: Optional[datetime] = None) -> int:
+        """
+        Выполняет задачи, время которых наступило
+
+        Пропущенный запуск (например, пока шла долгая задача) выполняется
+        один раз с опозданием, как в schedule.
+
+        Returns:
+            int: Число выполненных задач
+        """
+        now = now or self.now()
+        due = sorted((job for job in self.jobs if job.next_run <= now), key=lambda job: job.next_run)
+
+        for job in due:
+            if self._stop_requested:
+                break
+
+            lag_ms = (self.now() - job.next_run).total_seconds() * 1000
+            metrics_collector.gauges['scheduler_lag_ms'] = round(lag_ms, 3)
+            logger.debug(f"⏰ Задача «{job.name}» ({job.at}) запущена с задержкой {lag_ms:.1f} мс")
+
+            try:
+                job.func()
+            except Exception as e:
+                logger.error(f"💥 Ошибка задачи «{job.name}»: {e}")
+            finally:
+                job.schedule_next(self.now())
+
+        return len(due)
+
+    # ------------------------------------------------------------------
+    # Цикл и сигналы
+    # ------------------------------------------------------------------
+
+    def stop(self):
+        """Останавливает цикл (можно вызывать из другого потока и обработчика сигнала)"""
+        self._stop_requested = True
+        self._wakeup.set()
+
+    def request_reload(self):
+        """Просит цикл перечитать расписание при ближайшем пробуждении"""
+        self._reload_requested = True
+        self._wakeup.set()
+
+    def install_signal_handlers(self) -> bool:
+        """
+        SIGTERM останавливает цикл, SIGHUP перечитывает расписание
+
+        Ctrl+C (SIGINT) по-прежнему прерывает цикл через KeyboardInterrupt.
+
+        Returns:
+            bool: False, если вызвано не из главного потока
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return False
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+        return True
+
+    def run_forever(self, on_reload: Optional[Callable[[], None]] = None):
+        """
+        Выполняет задачи по расписанию до вызова stop()
+
+        Args:
+            on_reload: Пересоздает задачи по запросу перечитать расписание
+        """
+        self._stop_requested = False
+        logger.debug("🎯 Цикл планировщика запущен")
+
+        while not self._stop_requested:
+            if self._reload_requested:
+                self._reload_requested = False
+                if on_reload is not None:
+                    logger.info("🔄 Перечитываю расписание...")
+                    try:
+                        on_reload()
+                    except Exception as e:
+                        logger.error(f"❌ Не удалось перечитать расписание: {e}")
+
+            self.run_pending()
+
+            delay = self.seconds_until_next()
+            timeout = MAX_SLEEP_SECONDS if delay is None else min(delay, MAX_SLEEP_SECONDS)
+            if timeout > 0:
+                self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+        logger.debug("⏹️ Цикл планировщика остановлен")
@@ -4,19 +4,144 @@ import re
 import random
 import json
 import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from pathlib import Path
 from loguru import logger
+import httpx
 import telegram
 from telegram import Bot
-from telegram.error import TelegramError
+from telegram.error import TelegramError, BadRequest
 from telegram.request import HTTPXRequest
-from difflib import SequenceMatcher
 
 import config
 from file_utils import safe_json_read, safe_json_write  # Используем безопасные операции с файлами
 from types_models import TelegramMessage, MessageHistoryItem  # Используем типизацию
+from monitoring import metrics_collector
+from image_processing import detect_image_extension
+from tracing import tracer, set_attribute
+from async_runtime import runtime
+from http_instrumentation import InstrumentedAsyncTransport
+from dedup_index import DedupIndex
+from prompts import PromptConfig
+
+
+# Пул соединений с Bot API (один на процесс, см. get_shared_bot)
+TELEGRAM_POOL_SIZE = 4
+TELEGRAM_KEEPALIVE_EXPIRY = 60.0  # Секунд держать простаивающее соединение открытым
+# Минимальный интервал между сообщениями в один чат (лимит Telegram - около 1 в секунду)
+TELEGRAM_CHAT_SEND_INTERVAL = 1.0
+
+# Виды частей публикации (prepare_parts)
+PART_PHOTO = 'photo'
+PART_TEXT = 'text'
+
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest, записывающий каждый запрос к Bot API в metrics_collector"""
+
+    def __init__(self, *args, keepalive_expiry: Optional[float] = None, **kwargs):
+        # _build_client вызывается уже из HTTPXRequest.__init__
+        self.keepalive_expiry = keepalive_expiry
+        super().__init__(*args, **kwargs)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        # С явным transport httpx не применяет limits клиента - передаем их транспорту.
+        # Запросы через прокси идут мимо этого транспорта и не учитываются.
+        client_kwargs = dict(self._client_kwargs)
+        limits = client_kwargs.get('limits', httpx.Limits())
+        if self.keepalive_expiry is not None:
+            limits = httpx.Limits(
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+            client_kwargs['limits'] = limits
+        transport = client_kwargs.get('transport') or httpx.AsyncHTTPTransport(
+            limits=limits,
+            http1=client_kwargs.get('http1', True),
+            http2=client_kwargs.get('http2', False)
+        )
+        client_kwargs['transport'] = InstrumentedAsyncTransport(transport, api_name='telegram')
+        return httpx.AsyncClient(**client_kwargs)
+
+
+def build_bot(token: str, pool_size: int = TELEGRAM_POOL_SIZE,
+              keepalive_expiry: float = TELEGRAM_KEEPALIVE_EXPIRY) -> Bot:
+    """
+    Создает Bot с пулом соединений и таймаутами NEWSMAKER
+
+    Args:
+        token: Токен бота
+        pool_size: Размер пула соединений
+        keepalive_expiry: Сколько секунд держать простаивающее соединение
+
+    Returns:
+        Bot (еще не инициализированный)
+    """
+    request = InstrumentedHTTPXRequest(
+        connection_pool_size=pool_size,
+        read_timeout=60,
+        write_timeout=60,
+        connect_timeout=30,
+        pool_timeout=30,
+        keepalive_expiry=keepalive_expiry
+    )
+    return Bot(token=token, request=request)
+
+
+# Боты общего runtime по токену: все TelegramClient процесса делят один пул
+_shared_bots: Dict[str, Bot] = {}
+# Время следующей разрешенной отправки по чатам (time.monotonic)
+_next_chat_send: Dict[str, float] = {}
+
+
+async def get_shared_bot(token: str, pool_size: int = TELEGRAM_POOL_SIZE,
+                         keepalive_expiry: float = TELEGRAM_KEEPALIVE_EXPIRY) -> Bot:
+    """
+    Инициализированный Bot процесса (только из loop общего runtime)
+
+    Создается при первом обращении и закрывается при остановке runtime.
+    Параметры пула берутся у первого обратившегося клиента.
+
+    Args:
+        token: Токен бота
+        pool_size: Размер пула соединений
+        keepalive_expiry: Сколько секунд держать простаивающее соединение
+
+    Returns:
+        Bot
+    """
+    bot = _shared_bots.get(token)
+    if bot is None:
+        bot = build_bot(token, pool_size, keepalive_expiry)
+        _shared_bots[token] = bot
+
+        async def shutdown_bot():
+            if _shared_bots.get(token) is bot:
+                del _shared_bots[token]
+            await bot.shutdown()
+            logger.debug("🔌 Пул соединений Telegram закрыт")
+
+        runtime.on_shutdown(shutdown_bot)
+        logger.debug(f"🔌 Открыт пул соединений Telegram ({pool_size} соединений)")
+
+    # Первый вызов проверяет токен (getMe) и заодно прогревает соединение
+    await bot.initialize()
+    return bot
+
+
+def defer_chat(chat_id, seconds: float):
+    """
+    Откладывает следующую отправку в чат (например, по RetryAfter от Telegram)
+    
+    Args:
+        chat_id: ID чата
+        seconds: Через сколько секунд можно отправлять
+    """
+    chat = str(chat_id)
+    _next_chat_send[chat] = max(_next_chat_send.get(chat, 0.0), time.monotonic() + seconds)
 
 
 class TelegramClient:
@@ -40,10 +165,16 @@ class TelegramClient:
             self.max_message_length = telegram_config.get('max_message_length', config.TELEGRAM_MAX_MESSAGE_LENGTH)
             self.max_caption_length = telegram_config.get('max_caption_length', config.TELEGRAM_MAX_CAPTION_LENGTH)
             self.parse_mode = telegram_config.get('parse_mode', 'HTML')
+            self.pool_size = telegram_config.get('connection_pool_size', TELEGRAM_POOL_SIZE)
+            self.keepalive_expiry = telegram_config.get('keepalive_expiry', TELEGRAM_KEEPALIVE_EXPIRY)
+            self.send_interval = telegram_config.get('send_interval', TELEGRAM_CHAT_SEND_INTERVAL)
         else:
             self.max_message_length = config.TELEGRAM_MAX_MESSAGE_LENGTH
             self.max_caption_length = config.TELEGRAM_MAX_CAPTION_LENGTH
             self.parse_mode = 'HTML'
+            self.pool_size = TELEGRAM_POOL_SIZE
+            self.keepalive_expiry = TELEGRAM_KEEPALIVE_EXPIRY
+            self.send_interval = TELEGRAM_CHAT_SEND_INTERVAL
         
         # Файл для хранения истории сообщений
         self.history_file = Path("logs/message_history.json")
@@ -53,9 +184,20 @@ class TelegramClient:
             storage_config = web_config['storage']
             self.max_history_items = storage_config.get('max_history_items', 15)
             self.max_history_days = storage_config.get('max_history_days', 7)
+            self.dedup_history_days = storage_config.get('dedup_history_days', 30)
         else:
             self.max_history_items = 15  # Храним последние 15 сообщений
             self.max_history_days = 7  # Удаляем сообщения старше 7 дней
+            self.dedup_history_days = 30  # Сигнатуры для поиска дубликатов храним дольше
+        
+        # MinHash-сигнатуры опубликованных сообщений (см. dedup_index)
+        self.dedup_index_file = Path("logs/dedup_index.json")
+        self._dedup_index: Optional[DedupIndex] = None
+        self._dedup_index_mtime: Optional[float] = None
+        
+        # Соответствие SHA-256 изображения -> file_id уже загруженного в Telegram фото
+        self.file_id_cache_file = Path("logs/telegram_file_ids.json")
+        self.max_file_id_items = 500
         
         # Создаем папку logs если её нет
         self.history_file.parent.mkdir(exist_ok=True)
@@ -65,18 +207,124 @@ class TelegramClient:
         if not self.channel_id:
             logger.warning("TELEGRAM_CHANNEL_ID не установлен в переменных окружения")
     
-    def _initialize_bot(self):
-        """Инициализирует бота если ещё не инициализирован"""
-        if self.bot is None:
-            # Настраиваем HTTP клиент с таймаутами
-            request = HTTPXRequest(
-                connection_pool_size=1,
-                read_timeout=60,
-                write_timeout=60,
-                connect_timeout=30,
-                pool_timeout=30
-            )
-            self.bot = Bot(token=self.bot_token, request=request)
+    async def _initialize_bot(self):
+        """Берет общего бота процесса (или создает своего вне общего runtime)"""
+        if runtime.in_runtime_thread():
+            self.bot = await get_shared_bot(self.bot_token, self.pool_size, self.keepalive_expiry)
+        elif self.bot is None:
+            # Отдельный event loop: пул общего бота привязан к loop runtime
+            self.bot = build_bot(self.bot_token, self.pool_size, self.keepalive_expiry)
+    
+    async def _pace_chat(self):
+        """
+        Выдерживает интервал между сообщениями в канал
+        
+        Интервал отсчитывается от начала предыдущей отправки, поэтому после
+        загрузки фото текст уходит сразу, без лишней паузы.
+        """
+        chat = str(self.channel_id)
+        now = time.monotonic()
+        send_at = max(now, _next_chat_send.get(chat, 0.0))
+        _next_chat_send[chat] = send_at + self.send_interval
+        if send_at > now:
+            await asyncio.sleep(send_at - now)
+    
+    def _bot_id(self) -> str:
+        """ID бота из токена (file_id действителен только для бота, загрузившего файл)"""
+        return (self.bot_token or '').split(':')[0]
+    
+    def _get_cached_file_id(self, image_hash: str) -> Optional[str]:
+        """
+        Ищет file_id ранее загруженного изображения
+        
+        Args:
+            image_hash: SHA-256 байтов изображения
+            
+        Returns:
+            str: file_id или None если изображение ещё не загружалось этим ботом
+        """
+        entry = safe_json_read(self.file_id_cache_file, default={}).get(image_hash)
+        if entry and entry.get('bot_id') == self._bot_id():
+            return entry.get('file_id')
+        return None
+    
+    def _update_file_id_cache(self, image_hash: str, file_id: Optional[str] = None,
+                              size: int = 0) -> None:
+        """
+        Запоминает file_id загруженного изображения или отмечает его использование
+        
+        Args:
+            image_hash: SHA-256 байтов изображения
+            file_id: Новый file_id (None - удалить запись, например если Telegram его отверг)
+            size: Размер изображения в байтах
+        """
+        cache = safe_json_read(self.file_id_cache_file, default={})
+        now = datetime.now().isoformat()
+        
+        if file_id is None:
+            cache.pop(image_hash, None)
+        elif cache.get(image_hash, {}).get('file_id') == file_id:
+            cache[image_hash]['last_used'] = now
+        else:
+            cache[image_hash] = {
+                'file_id': file_id,
+                'bot_id': self._bot_id(),
+                'size': size,
+                'uploaded_at': now,
+                'last_used': now
+            }
+        
+        # Ограничиваем размер: вытесняем давно не использованные записи
+        if len(cache) > self.max_file_id_items:
+            by_usage = sorted(cache.items(), key=lambda item: item[1].get('last_used', ''), reverse=True)
+            cache = dict(by_usage[:self.max_file_id_items])
+        
+        safe_json_write(self.file_id_cache_file, cache)
+    
+    async def _send_photo(self, image_bytes: bytes, caption: Optional[str] = None) -> telegram.Message:
+        """
+        Отправляет фото, переиспользуя file_id если изображение уже загружалось
+        
+        Args:
+            image_bytes: Данные изображения
+            caption: Подпись к фото (HTML)
+            
+        Returns:
+            telegram.Message: Отправленное сообщение
+        """
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        photo_kwargs = {'chat_id': self.channel_id}
+        if caption:
+            photo_kwargs.update(caption=caption, parse_mode='HTML')
+        
+        file_id = self._get_cached_file_id(image_hash)
+        if file_id:
+            try:
+                await self._pace_chat()
+                sent = await self.bot.send_photo(photo=file_id, **photo_kwargs)
+                self._update_file_id_cache(image_hash, file_id)
+                metrics_collector.counters['telegram_photo_reused'] += 1
+                set_attribute('telegram.file_id_reused', True)
+                logger.info("♻️ Изображение отправлено по file_id без повторной загрузки")
+                return sent
+            except BadRequest as e:
+                logger.warning(f"Telegram не принял сохранённый file_id ({e}), загружаю изображение заново")
+                self._update_file_id_cache(image_hash, None)
+        
+        # Создаем объект файла из байтов
+        image_file = io.BytesIO(image_bytes)
+        image_file.name = f"legal_comic{detect_image_extension(image_bytes)}"
+        
+        await self._pace_chat()
+        sent = await self.bot.send_photo(photo=image_file, **photo_kwargs)
+        metrics_collector.counters['telegram_photo_uploaded'] += 1
+        set_attribute('telegram.file_id_reused', False)
+        
+        if sent.photo:
+            # Самый крупный вариант фото - последний в списке
+            self._update_file_id_cache(image_hash, sent.photo[-1].file_id, len(image_bytes))
+        
+        return sent
     
     def _get_content_hash(self, content: str) -> str:
         """
@@ -131,6 +379,36 @@ class TelegramClient:
             logger.debug(f"Сообщение сохранено в историю. Всего записей: {len(history)}")
         else:
             logger.error("Не удалось сохранить сообщение в историю")
+        
+        # Добавляем сигнатуру полного текста в индекс дубликатов
+        cleaned = self._clean_content_for_comparison(content)
+        index = self._load_dedup_index(force=True)
+        index.add(cleaned, message_record['hash'], message_record['timestamp'])
+        cutoff = datetime.now() - timedelta(days=self.dedup_history_days)
+        if not safe_json_write(self.dedup_index_file, index.to_records(cutoff)):
+            logger.error("Не удалось сохранить индекс дубликатов")
+        self._dedup_index = None
+    
+    def _load_dedup_index(self, force: bool = False) -> DedupIndex:
+        """
+        Загружает индекс дубликатов (перечитывает файл, только если он изменился)
+        
+        Args:
+            force: Перечитать файл независимо от времени изменения
+            
+        Returns:
+            DedupIndex: Индекс с порогом PromptConfig.SIMILARITY_THRESHOLD
+        """
+        try:
+            mtime = self.dedup_index_file.stat().st_mtime
+        except OSError:
+            mtime = None
+        
+        if force or self._dedup_index is None or mtime != self._dedup_index_mtime:
+            records = safe_json_read(self.dedup_index_file, default=[])
+            self._dedup_index = DedupIndex.from_records(records, PromptConfig.SIMILARITY_THRESHOLD)
+            self._dedup_index_mtime = mtime
+        return self._dedup_index
     
     def _cleanup_history(self, history: List[Dict]) -> List[Dict]:
         """
@@ -167,13 +445,16 @@ class TelegramClient:
             logger.error(f"Ошибка при очистке истории: {e}")
             return history[:self.max_history_items]  # Fallback: просто ограничиваем количество
 
-    async def _check_for_duplicates(self, new_content: str, similarity_threshold: float = 0.7) -> bool:
+    async def _check_for_duplicates(self, new_content: str, similarity_threshold: Optional[float] = None) -> bool:
         """
         Проверяет историю сообщений на дублирование контента
         
+        Точное совпадение ищется по хешу, похожие сообщения - по LSH-индексу
+        MinHash-сигнатур полного текста за dedup_history_days дней.
+        
         Args:
             new_content: Новый контент для проверки
-            similarity_threshold: Порог схожести (0.7 = 70% схожести)
+            similarity_threshold: Порог схожести (по умолчанию PromptConfig.SIMILARITY_THRESHOLD)
             
         Returns:
             bool: True если найден дублированный контент
@@ -183,45 +464,34 @@ class TelegramClient:
             new_hash = self._get_content_hash(new_content)
             new_cleaned = self._clean_content_for_comparison(new_content)
             
-            # Загружаем историю сообщений
-            history = self._load_message_history()
-            
-            if not history:
-                logger.debug("История сообщений пуста - дубликатов нет")
-                return False
-            
-            logger.info(f"Проверяю на дубликаты среди {len(history)} сохраненных сообщений")
-            
-            # Проверяем точное совпадение по хешу
-            for record in history:
+            # Проверяем точное совпадение по хешу (история и индекс)
+            for record in self._load_message_history():
                 if record.get('hash') == new_hash:
                     logger.warning(f"Найден точный дубликат по хешу: {record.get('preview', '')[:50]}...")
                     return True
             
-            # Проверяем схожесть текста с помощью SequenceMatcher
-            for record in history:
-                try:
-                    # Восстанавливаем очищенный текст из preview (для совместимости)
-                    # В реальности лучше хранить полный очищенный текст отдельно
-                    old_preview = record.get('preview', '')
-                    
-                    # Если preview слишком короткий, пропускаем детальную проверку
-                    if len(old_preview) < 50 or len(new_cleaned) < 50:
-                        continue
-                    
-                    # Вычисляем схожесть
-                    similarity = SequenceMatcher(None, new_cleaned, old_preview).ratio()
-                    
-                    if similarity >= similarity_threshold:
-                        timestamp = record.get('timestamp', 'неизвестно')
-                        logger.warning(f"Найден похожий контент (схожесть: {similarity:.2%}, порог: {similarity_threshold:.2%})")
-                        logger.warning(f"Дата предыдущего сообщения: {timestamp}")
-                        logger.warning(f"Превью: {old_preview[:100]}...")
-                        return True
-                        
-                except Exception as e:
-                    logger.error(f"Ошибка при сравнении с записью в истории: {e}")
-                    continue
+            index = self._load_dedup_index()
+            if similarity_threshold is not None and similarity_threshold != index.similarity_threshold:
+                index = DedupIndex.from_records(index.records, similarity_threshold)
+            
+            exact = index.find_exact(new_hash)
+            if exact:
+                logger.warning(f"Найден точный дубликат по хешу: {exact.get('preview', '')[:50]}...")
+                return True
+            
+            if not index.records:
+                logger.debug("Индекс дубликатов пуст - дубликатов нет")
+                return False
+            
+            logger.info(f"Проверяю на дубликаты среди {len(index.records)} сохраненных сообщений")
+            
+            found = index.query(new_cleaned)
+            if found:
+                record, similarity = found
+                logger.warning(f"Найден похожий контент (схожесть: {similarity:.2%}, порог: {index.similarity_threshold:.2%})")
+                logger.warning(f"Дата предыдущего сообщения: {record.get('timestamp', 'неизвестно')}")
+                logger.warning(f"Превью: {record.get('preview', '')[:100]}...")
+                return True
             
             logger.info("Дубликатов не найдено")
             return False
@@ -416,6 +686,67 @@ class TelegramClient:
         
         return parts
     
+    async def prepare_parts(self, message: dict, with_image: bool = False) -> Optional[Tuple[str, List[Dict]]]:
+        """
+        Форматирует сообщение и раскладывает его на отправляемые части
+        
+        Args:
+            message: Словарь с данными для отправки
+            with_image: Будет ли к сообщению приложено изображение
+            
+        Returns:
+            Tuple: (отформатированный текст, части {'kind': 'photo'|'text', 'text': ...})
+                   или None если контент дублирует недавние сообщения
+        """
+        # Форматируем сообщение
+        formatted_message = self._format_legal_message(message)
+        
+        # Проверяем на дублирование
+        if await self._check_for_duplicates(formatted_message):
+            logger.warning("Контент дублируется с недавними сообщениями - пропускаю отправку")
+            return None
+        
+        if not with_image:
+            parts = []
+        elif len(formatted_message) <= 1000:
+            # Telegram лимит caption для фото: 1024 символа - изображение с подписью
+            return formatted_message, [{'kind': PART_PHOTO, 'text': formatted_message}]
+        else:
+            # Сначала изображение без подписи, затем полный текст отдельными сообщениями
+            parts = [{'kind': PART_PHOTO, 'text': None}]
+        
+        parts.extend({'kind': PART_TEXT, 'text': text} for text in self._split_long_message(formatted_message))
+        return formatted_message, parts
+    
+    async def send_part(self, part: Dict, image_bytes: Optional[bytes] = None) -> Optional[int]:
+        """
+        Отправляет одну часть сообщения в канал (с интервалом для канала)
+        
+        Args:
+            part: Часть из prepare_parts
+            image_bytes: Данные изображения для части с фото
+            
+        Returns:
+            int: message_id отправленного сообщения
+            
+        Raises:
+            TelegramError: Ошибка Bot API
+        """
+        await self._initialize_bot()
+        
+        if part['kind'] == PART_PHOTO:
+            sent = await self._send_photo(image_bytes, caption=part.get('text'))
+        else:
+            # Части идут по порядку по теплому соединению, с интервалом для канала
+            await self._pace_chat()
+            sent = await self.bot.send_message(
+                chat_id=self.channel_id,
+                text=part['text'],
+                parse_mode='HTML',
+                disable_web_page_preview=True
+            )
+        return getattr(sent, 'message_id', None)
+    
     async def send_message(self, message: dict) -> bool:
         """
         Отправляет сообщение в Telegram канал
@@ -427,22 +758,16 @@ class TelegramClient:
             bool: True если отправка прошла успешно
         """
         try:
-            self._initialize_bot()
+            await self._initialize_bot()
             
             if not self.bot_token or not self.channel_id:
                 logger.error("Не установлены токен бота или ID канала")
                 return False
             
-            # Форматируем сообщение
-            formatted_message = self._format_legal_message(message)
-            
-            # Проверяем на дублирование
-            if await self._check_for_duplicates(formatted_message):
-                logger.warning("Контент дублируется с недавними сообщениями - пропускаю отправку")
-                return True  # Возвращаем True, так как это не ошибка, а валидная причина пропуска
-            
-            # Разбиваем на части если нужно
-            message_parts = self._split_long_message(formatted_message)
+            prepared = await self.prepare_parts(message)
+            if prepared is None:
+                return True  # Дубликат - не ошибка, а валидная причина пропуска
+            formatted_message, message_parts = prepared
             
             logger.info(f"Отправляю сообщение в канал {self.channel_id}")
             logger.info(f"Сообщение разбито на {len(message_parts)} частей")
@@ -450,18 +775,8 @@ class TelegramClient:
             # Отправляем все части
             for i, part in enumerate(message_parts):
                 try:
-                    await self.bot.send_message(
-                        chat_id=self.channel_id,
-                        text=part,
-                        parse_mode='HTML',
-                        disable_web_page_preview=True
-                    )
-                    
+                    await self.send_part(part)
                     logger.info(f"Часть {i+1}/{len(message_parts)} отправлена успешно")
-                    
-                    # Небольшая пауза между частями
-                    if i < len(message_parts) - 1:
-                        await asyncio.sleep(1)
                         
                 except TelegramError as e:
                     logger.error(f"Ошибка при отправке части {i+1}: {e}")
@@ -486,7 +801,7 @@ class TelegramClient:
             bool: True если подключение работает
         """
         try:
-            self._initialize_bot()
+            await self._initialize_bot()
             
             if not self.bot_token:
                 logger.error("Токен бота не установлен")
@@ -514,59 +829,26 @@ class TelegramClient:
             bool: True если отправка прошла успешно
         """
         try:
-            self._initialize_bot()
+            await self._initialize_bot()
             
             if not self.bot_token or not self.channel_id:
                 logger.error("Не установлены токен бота или ID канала")
                 return False
             
-            # Форматируем сообщение
-            formatted_message = self._format_legal_message(message)
-            
-            # Проверяем на дублирование
-            if await self._check_for_duplicates(formatted_message):
-                logger.warning("Контент дублируется с недавними сообщениями - пропускаю отправку")
-                return True  # Возвращаем True, так как это не ошибка, а валидная причина пропуска
+            prepared = await self.prepare_parts(message, with_image=True)
+            if prepared is None:
+                return True  # Дубликат - не ошибка, а валидная причина пропуска
+            formatted_message, message_parts = prepared
             
             logger.info(f"Отправляю сообщение с комиксом в канал {self.channel_id}")
             
-            # Создаем объект файла из байтов
-            image_file = io.BytesIO(image_bytes)
-            image_file.name = "legal_comic.png"
-            
-            # Telegram лимит caption для фото: 1024 символа
-            if len(formatted_message) <= 1000:
-                # Отправляем изображение с подписью
-                await self.bot.send_photo(
-                    chat_id=self.channel_id,
-                    photo=image_file,
-                    caption=formatted_message,
-                    parse_mode='HTML'
-                )
+            for part in message_parts:
+                await self.send_part(part, image_bytes)
+            
+            if len(message_parts) == 1:
                 logger.info("Сообщение с комиксом отправлено одним сообщением")
             else:
-                # Сначала отправляем изображение без подписи
-                await self.bot.send_photo(
-                    chat_id=self.channel_id,
-                    photo=image_file
-                )
-                
-                # Затем отправляем полный текст отдельным сообщением
-                await asyncio.sleep(1)
-                message_parts = self._split_long_message(formatted_message)
-                
-                for i, part in enumerate(message_parts):
-                    await self.bot.send_message(
-                        chat_id=self.channel_id,
-                        text=part,
-                        parse_mode='HTML',
-                        disable_web_page_preview=True
-                    )
-                    
-                    if i < len(message_parts) - 1:
-                        await asyncio.sleep(1)
-                
-                logger.info(f"Сообщение с комиксом отправлено: фото + {len(message_parts)} текстовых частей")
+                logger.info(f"Сообщение с комиксом отправлено: фото + {len(message_parts) - 1} текстовых частей")
             
             logger.info("Сообщение с комиксом отправлено успешно")
             
@@ -592,7 +874,10 @@ class TelegramClient:
         Returns:
             bool: True если отправка прошла успешно
         """
-        return asyncio.run(self.send_message(content))
+        with tracer.span('telegram_send', {'telegram.with_image': False}) as span:
+            success = runtime.run(self.send_message(content))
+            span.set_attribute('telegram.success', success)
+            return success
     
     def send_legal_update_with_comic(self, content: TelegramMessage, image_bytes: bytes) -> bool:
         """
@@ -605,6 +890,9 @@ class TelegramClient:
         Returns:
             bool: True если отправка прошла успешно
         """
-        return asyncio.run(self.send_message_with_image(content, image_bytes))
+        with tracer.span('telegram_send', {'telegram.with_image': True, 'image.bytes': len(image_bytes)}) as span:
+            success = runtime.run(self.send_message_with_image(content, image_bytes))
+            span.set_attribute('telegram.success', success)
+            return success
 
  
\ No newline at end of file
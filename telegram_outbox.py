@@ -0,0 +1,538 @@
+"""
+Очередь отправки в Telegram (outbox) для NEWSMAKER
+
+Публикация новости сначала записывается в SQLite (режим WAL) как набор
+частей (фото, текст), а затем отправляется фоновым обработчиком в общем
+asyncio runtime. Ключи идемпотентности:
+
+- публикация - "дата:id новости" (повторная постановка в очередь не создает
+  новую отправку, а возвращает уже существующую);
+- часть - (публикация, номер части); отправленная часть отмечается сразу
+  после ответа Telegram и повторно не отправляется.
+
+Итог публикации (успех или окончательная ошибка) записывается в хранилище
+новостей обратным вызовом и отмечается флагом recorded. Если процесс упал
+между отправкой и записью статуса, запись повторяется при следующем
+resume(), без повторной отправки.
+
+Части одного чата отправляются строго по порядку постановки; временные
+ошибки повторяются с экспоненциальной задержкой, RetryAfter от Telegram
+сдвигает следующую отправку в чат. Между ответом Telegram и отметкой части
+процесс упасть все же может - тогда часть будет отправлена повторно
+(at-least-once на уровне одной части).
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+import config
+from async_runtime import runtime
+from monitoring import metrics_collector
+from retry_handler import calculate_backoff_time
+from telegram_client import TelegramClient, defer_chat, PART_PHOTO
+from tracing import tracer, current_span
+
+
+DEFAULT_OUTBOX_FILE = 'telegram_outbox.db'
+
+# Попыток отправки одной части до окончательной ошибки публикации
+OUTBOX_MAX_ATTEMPTS = 5
+# Задержка повтора: 2, 4, 8... секунд, но не больше минуты
+OUTBOX_RETRY_BASE_DELAY = 2.0
+OUTBOX_RETRY_MAX_DELAY = 60.0
+# Сколько публикатор ждет итога, прежде чем оставить досылку фоновому обработчику
+OUTBOX_WAIT_TIMEOUT = 60.0
+
+STATUS_PENDING = 'pending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox_items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_key TEXT NOT NULL UNIQUE,
+    chat_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    news_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempt INTEGER NOT NULL DEFAULT 1,
+    recorded INTEGER NOT NULL DEFAULT 0,
+    formatted_text TEXT,
+    image BLOB,
+    trace_context TEXT,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    finished_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_items_chat
+    ON outbox_items (chat_id, status, seq);
+
+CREATE TABLE IF NOT EXISTS outbox_parts (
+    item_key TEXT NOT NULL REFERENCES outbox_items(item_key) ON DELETE CASCADE,
+    part INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    text TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    message_id INTEGER,
+    sent_at TEXT,
+    last_error TEXT,
+    PRIMARY KEY (item_key, part)
+);
+"""
+
+
+def make_item_key(date: datetime, news_id: str) -> str:
+    """Ключ идемпотентности публикации новости"""
+    return f"{date.strftime('%Y-%m-%d')}:{news_id}"
+
+
+class TelegramOutbox:
+    """Очередь отправки публикаций в Telegram с фоновыми обработчиками по чатам"""
+
+    def __init__(self, client: TelegramClient, db_path: Path,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 on_finished: Optional[Callable[[Dict], bool]] = None):
+        """
+        Инициализация и создание схемы
+
+        Args:
+            client: Клиент Telegram, через который отправляются части
+            db_path: Путь к файлу базы очереди
+            max_attempts: Попыток отправки одной части
+            on_finished: Записывает итог публикации в хранилище новостей
+                         (получает строку outbox_items, возвращает True при успехе)
+        """
+        self.client = client
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.on_finished = on_finished
+
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._lock = threading.RLock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+        # Ожидающие итога публикации (item_key -> Future со статусом)
+        self._waiters: Dict[str, List[Future]] = {}
+        # Обработчики и их будильники - только в потоке runtime
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._shutdown_registered = False
+
+    # ------------------------------------------------------------------
+    # Постановка в очередь и ожидание
+    # ------------------------------------------------------------------
+
+    def enqueue(self, date: datetime, news_id: str, formatted_text: str, parts: List[Dict],
+                image_bytes: Optional[bytes] = None, attempt: int = 1) -> str:
+        """
+        Ставит публикацию в очередь (идемпотентно) и будит обработчик чата
+
+        Публикация с тем же ключом не создается заново: отправленная остается
+        отправленной, а окончательно не удавшаяся возвращается в очередь
+        с неотправленных частей.
+
+        Args:
+            date: Дата подборки новостей
+            news_id: ID новости
+            formatted_text: Отформатированный текст (для истории сообщений)
+            parts: Части из TelegramClient.prepare_parts
+            image_bytes: Изображение для части с фото
+            attempt: Номер попытки публикации новости
+
+        Returns:
+            str: Ключ публикации
+        """
+        item_key = make_item_key(date, news_id)
+        chat_id = str(self.client.channel_id)
+        span = current_span()
+        trace_context = json.dumps(span.context) if span else None
+
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox_items (item_key, chat_id, date, news_id, attempt, "
+                "formatted_text, image, trace_context, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (item_key, chat_id, date.strftime('%Y-%m-%d'), news_id, attempt, formatted_text,
+                 image_bytes, trace_context, datetime.now().isoformat())
+            ).rowcount
+
+            if inserted:
+                self._conn.executemany(
+                    "INSERT INTO outbox_parts (item_key, part, kind, text) VALUES (?, ?, ?, ?)",
+                    [(item_key, number, part['kind'], part.get('text')) for number, part in enumerate(parts)]
+                )
+                logger.info(f"📮 Публикация {item_key} поставлена в очередь: {len(parts)} частей")
+            elif self._conn.execute(
+                "UPDATE outbox_items SET status = ?, attempt = ?, recorded = 0, last_error = NULL, "
+                "finished_at = NULL WHERE item_key = ? AND status = ?",
+                (STATUS_PENDING, attempt, item_key, STATUS_FAILED)
+            ).rowcount:
+                self._conn.execute(
+                    "UPDATE outbox_parts SET attempts = 0, next_attempt_at = 0 "
+                    "WHERE item_key = ? AND sent_at IS NULL",
+                    (item_key,)
+                )
+                logger.info(f"📮 Публикация {item_key} снова в очереди (отправленные части не повторяются)")
+            else:
+                logger.info(f"📮 Публикация {item_key} уже есть в очереди")
+
+        metrics_collector.counters['telegram_outbox_enqueued'] += 1
+        self.wake(chat_id)
+        return item_key
+
+    def wait(self, item_key: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Ждет итога публикации (из синхронного кода)
+
+        Args:
+            item_key: Ключ публикации
+            timeout: Максимальное ожидание в секундах
+
+        Returns:
+            str: STATUS_SENT / STATUS_FAILED или None если публикация еще в очереди
+        """
+        future = Future()
+        with self._lock:
+            # Подписываемся до чтения статуса: итог не потеряется между ними
+            self._waiters.setdefault(item_key, []).append(future)
+            row = self._conn.execute(
+                "SELECT status FROM outbox_items WHERE item_key = ?", (item_key,)
+            ).fetchone()
+
+        if row is not None and row['status'] != STATUS_PENDING:
+            status = row['status']
+        else:
+            try:
+                status = future.result(timeout)
+            except FutureTimeoutError:
+                # До Python 3.11 это не встроенный TimeoutError
+                status = None
+
+        with self._lock:
+            waiters = self._waiters.get(item_key, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(item_key, None)
+        return status
+
+    def resume(self) -> int:
+        """
+        Дописывает незаписанные итоги и запускает обработчики для ожидающих частей
+
+        Вызывается перед публикацией: подбирает работу, оставшуюся после
+        предыдущего запуска процесса.
+
+        Returns:
+            int: Количество публикаций в очереди
+        """
+        self._finish_completed()
+
+        with self._lock:
+            unrecorded = self._conn.execute(
+                "SELECT * FROM outbox_items WHERE status != ? AND recorded = 0", (STATUS_PENDING,)
+            ).fetchall()
+            pending = self._conn.execute(
+                "SELECT chat_id, COUNT(*) AS items FROM outbox_items WHERE status = ? GROUP BY chat_id",
+                (STATUS_PENDING,)
+            ).fetchall()
+
+        for item in unrecorded:
+            logger.info(f"📮 Записываю итог публикации {item['item_key']} из предыдущего запуска")
+            self._record(dict(item))
+
+        for row in pending:
+            self.wake(row['chat_id'])
+
+        total = sum(row['items'] for row in pending)
+        metrics_collector.gauges['telegram_outbox_pending'] = total
+        return total
+
+    # ------------------------------------------------------------------
+    # Фоновые обработчики (поток runtime)
+    # ------------------------------------------------------------------
+
+    def wake(self, chat_id: str):
+        """Будит (или запускает) обработчик чата; можно вызывать из любого потока"""
+        loop = runtime.start()
+        if runtime.in_runtime_thread():
+            self._ensure_worker(chat_id)
+        else:
+            loop.call_soon_threadsafe(self._ensure_worker, chat_id)
+
+    def _ensure_worker(self, chat_id: str):
+        """Запускает обработчик чата, если он не работает"""
+        if not self._shutdown_registered:
+            runtime.on_shutdown(self._stop_workers)
+            self._shutdown_registered = True
+
+        wakeup = self._wakeups.setdefault(chat_id, asyncio.Event())
+        wakeup.set()
+        task = self._workers.get(chat_id)
+        if task is None or task.done():
+            self._workers[chat_id] = asyncio.get_running_loop().create_task(self._drain(chat_id))
+
+    async def _stop_workers(self):
+        """Останавливает обработчики (неотправленное остается в базе)"""
+        tasks = [task for task in self._workers.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers.clear()
+        self._wakeups.clear()
+
+    async def _drain(self, chat_id: str):
+        """Отправляет части чата по порядку, пока очередь не опустеет"""
+        wakeup = self._wakeups[chat_id]
+        logger.debug(f"📮 Обработчик очереди Telegram для {chat_id} запущен")
+
+        while True:
+            # Сбрасываем будильник до чтения: новая постановка после чтения разбудит снова
+            wakeup.clear()
+            head = await asyncio.to_thread(self._next_part, chat_id)
+
+            if head is None:
+                # Публикация, у которой отправлены все части, но нет итога
+                if await asyncio.to_thread(self._finish_completed) or wakeup.is_set():
+                    continue
+                logger.debug(f"📮 Очередь Telegram для {chat_id} пуста")
+                return
+
+            delay = head['next_attempt_at'] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._send_head(head)
+
+    def _next_part(self, chat_id: str) -> Optional[Dict]:
+        """Первая неотправленная часть самой ранней публикации чата"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT p.*, i.seq, i.chat_id, i.trace_context, "
+                "(SELECT COUNT(*) FROM outbox_parts WHERE item_key = p.item_key) AS parts_total "
+                "FROM outbox_items i JOIN outbox_parts p ON p.item_key = i.item_key "
+                "WHERE i.chat_id = ? AND i.status = ? AND p.sent_at IS NULL "
+                "ORDER BY i.seq, p.part LIMIT 1",
+                (chat_id, STATUS_PENDING)
+            ).fetchone()
+            if row is None:
+                return None
+            head = dict(row)
+            if head['kind'] == PART_PHOTO:
+                head['image'] = self._conn.execute(
+                    "SELECT image FROM outbox_items WHERE item_key = ?", (head['item_key'],)
+                ).fetchone()['image']
+            return head
+
+    async def _send_head(self, head: Dict):
+        """Отправляет часть и отмечает результат в базе"""
+        item_key, number = head['item_key'], head['part']
+        attributes = {
+            'outbox.item': item_key,
+            'outbox.part': number,
+            'outbox.attempt': head['attempts'] + 1,
+            'telegram.part_kind': head['kind']
+        }
+        trace_context = json.loads(head['trace_context']) if head['trace_context'] else None
+
+        with tracer.span('telegram_outbox_send', attributes, context=trace_context) as span:
+            try:
+                message_id = await self.client.send_part(head, head.get('image'))
+
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                # Лимит чата: ждем сколько просит Telegram, попытка не засчитывается
+                defer_chat(head['chat_id'], retry_after)
+                logger.warning(f"⏳ Telegram просит подождать {retry_after} сек перед {item_key}#{number}")
+                metrics_collector.counters['telegram_outbox_rate_limited'] += 1
+                await asyncio.to_thread(self._reschedule, item_key, number, head['attempts'], retry_after, str(e))
+                span.set_attribute('outbox.result', 'rate_limited')
+                return
+
+            except (BadRequest, Forbidden) as e:
+                # Повтор не поможет: сообщение или права бота некорректны
+                logger.error(f"❌ Telegram отклонил {item_key}#{number}: {e}")
+                await asyncio.to_thread(self._finish_item, item_key, STATUS_FAILED, str(e))
+                span.set_attribute('outbox.result', 'rejected')
+                return
+
+            except Exception as e:
+                # Сетевые ошибки, таймауты, 5xx - повторяем с задержкой
+                attempts = head['attempts'] + 1
+                if attempts >= self.max_attempts:
+                    logger.error(f"❌ {item_key}#{number}: исчерпаны попытки ({attempts}): {e}")
+                    await asyncio.to_thread(self._finish_item, item_key, STATUS_FAILED, str(e))
+                    span.set_attribute('outbox.result', 'failed')
+                    return
+
+                delay = calculate_backoff_time(attempts, OUTBOX_RETRY_BASE_DELAY, OUTBOX_RETRY_MAX_DELAY)
+                logger.warning(f"🔄 {item_key}#{number}: ошибка отправки ({e}), повтор через {delay:.1f} сек")
+                metrics_collector.counters['telegram_outbox_retries'] += 1
+                await asyncio.to_thread(self._reschedule, item_key, number, attempts, delay, str(e))
+                span.set_attribute('outbox.result', 'retry')
+                return
+
+            span.set_attribute('outbox.result', 'sent')
+
+        last_part = number == head['parts_total'] - 1
+        await asyncio.to_thread(self._mark_sent, item_key, number, message_id, last_part)
+        logger.info(f"📨 {item_key}: часть {number + 1}/{head['parts_total']} отправлена")
+
+    # ------------------------------------------------------------------
+    # Учет в базе
+    # ------------------------------------------------------------------
+
+    def _reschedule(self, item_key: str, number: int, attempts: int, delay: float, error: str):
+        """Откладывает повтор части"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox_parts SET attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE item_key = ? AND part = ?",
+                (attempts, time.time() + delay, error, item_key, number)
+            )
+
+    def _mark_sent(self, item_key: str, number: int, message_id: Optional[int], last_part: bool):
+        """Отмечает часть отправленной (и публикацию - если часть последняя)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox_parts SET sent_at = ?, message_id = ?, last_error = NULL "
+                "WHERE item_key = ? AND part = ?",
+                (datetime.now().isoformat(), message_id, item_key, number)
+            )
+            # В той же транзакции: последняя часть не может остаться без итога публикации
+            item = self._set_item_status(item_key, STATUS_SENT) if last_part else None
+        metrics_collector.counters['telegram_outbox_parts_sent'] += 1
+
+        if item is not None:
+            self._on_item_finished(item)
+
+    def _set_item_status(self, item_key: str, status: str, error: Optional[str] = None) -> Dict:
+        """Меняет статус публикации в текущей транзакции и возвращает ее строку"""
+        # Изображение отправленной публикации больше не нужно
+        self._conn.execute(
+            "UPDATE outbox_items SET status = ?, last_error = ?, finished_at = ?, "
+            "image = CASE WHEN ? THEN NULL ELSE image END WHERE item_key = ?",
+            (status, error, datetime.now().isoformat(), int(status == STATUS_SENT), item_key)
+        )
+        return dict(self._conn.execute(
+            "SELECT * FROM outbox_items WHERE item_key = ?", (item_key,)
+        ).fetchone())
+
+    def _finish_item(self, item_key: str, status: str, error: Optional[str] = None):
+        """Фиксирует итог публикации, записывает его в хранилище и будит ожидающих"""
+        with self._lock, self._conn:
+            item = self._set_item_status(item_key, status, error)
+        self._on_item_finished(item)
+
+    def _finish_completed(self) -> int:
+        """
+        Завершает публикации, все части которых уже отправлены
+
+        Такие остаются после сбоя в старых версиях между отметкой последней
+        части и статусом публикации - иначе их никто не завершит.
+
+        Returns:
+            int: Количество завершенных публикаций
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_key FROM outbox_items i WHERE status = ? AND NOT EXISTS "
+                "(SELECT 1 FROM outbox_parts p WHERE p.item_key = i.item_key AND p.sent_at IS NULL)",
+                (STATUS_PENDING,)
+            ).fetchall()
+
+        for row in rows:
+            logger.info(f"📮 Все части {row['item_key']} уже отправлены - завершаю публикацию")
+            self._finish_item(row['item_key'], STATUS_SENT)
+        return len(rows)
+
+    def _on_item_finished(self, item: Dict):
+        """Записывает итог в хранилище и будит ожидающих"""
+        item_key, status = item['item_key'], item['status']
+        metrics_collector.counters[f'telegram_outbox_{status}'] += 1
+        self._record(item)
+
+        with self._lock:
+            waiters = self._waiters.pop(item_key, [])
+        for future in waiters:
+            if not future.done():
+                future.set_result(status)
+
+    def _record(self, item: Dict):
+        """Записывает итог публикации в историю сообщений и хранилище новостей"""
+        if item['status'] == STATUS_SENT and item.get('formatted_text'):
+            self.client._save_message_to_history(item['formatted_text'])
+
+        try:
+            recorded = self.on_finished(item) if self.on_finished else True
+        except Exception as e:
+            logger.error(f"💾 Ошибка записи итога публикации {item['item_key']}: {e}")
+            recorded = False
+
+        if recorded:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE outbox_items SET recorded = 1 WHERE item_key = ?", (item['item_key'],)
+                )
+
+    def close(self):
+        """Закрывает соединение с базой"""
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+
+def get_outbox_path(web_config: Optional[Dict] = None) -> Path:
+    """Путь к базе очереди (telegram.outbox_path или DATA_DIR/telegram_outbox.db)"""
+    telegram_config = web_config.get('telegram', {}) if web_config else {}
+    return Path(telegram_config.get('outbox_path') or Path(config.DATA_DIR) / DEFAULT_OUTBOX_FILE)
+
+
+def cleanup_old_outbox(db_path: Path, cutoff_date: datetime):
+    """
+    Удаляет из очереди отправки завершенные публикации старых подборок
+
+    Args:
+        db_path: Путь к базе очереди
+        cutoff_date: Граничная дата
+    """
+    db_path = Path(db_path)
+    if not db_path.exists():
+        return
+
+    try:
+        with sqlite3.connect(db_path, timeout=30) as conn:
+            conn.execute("PRAGMA foreign_keys = ON")
+            deleted = conn.execute(
+                "DELETE FROM outbox_items WHERE date < ? AND status != ? AND recorded = 1",
+                (cutoff_date.strftime('%Y-%m-%d'), STATUS_PENDING)
+            ).rowcount
+        conn.close()
+        if deleted:
+            logger.info(f"Удалено из очереди Telegram старых публикаций: {deleted}")
+    except sqlite3.Error as e:
+        logger.warning(f"Ошибка очистки очереди Telegram: {e}")
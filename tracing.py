@@ -0,0 +1,355 @@
+"""
+Трассировка конвейера NEWSMAKER
+
+Легковесные вложенные span'ы с trace id: запрос к Perplexity → разбор →
+генерация изображения → сохранение → отправка в Telegram. Текущий span
+хранится в contextvars, поэтому вложенность сохраняется в корутинах и в
+asyncio.to_thread. Контекст новости (trace_context) сохраняется в файле
+дня, и публикация, которая идет позже и в другом процессе, продолжает
+тот же trace.
+
+Завершенные span'ы пишутся в metrics/traces_YYYY-MM-DD.jsonl и, если
+задан tracing.otlp_endpoint, пакетами отправляются в локальный
+коллектор в формате OTLP/HTTP JSON.
+"""
+
+import json
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from loguru import logger
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+from file_utils import ensure_directory
+
+
+TRACES_DIR = Path("metrics")
+TRACE_FILE_PREFIX = "traces_"
+SERVICE_NAME = "newsmaker"
+
+# Отправка в OTLP коллектор
+OTLP_BATCH_SIZE = 100
+OTLP_FLUSH_INTERVAL = 5.0  # Секунд между отправками
+OTLP_QUEUE_SIZE = 10000  # При переполнении span'ы для коллектора отбрасываются
+OTLP_TIMEOUT = 5.0
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+
+class Span:
+    """Отрезок работы внутри trace"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'events', 'status', '_tracer')
+
+    def __init__(self, tracer: 'Tracer', name: str, trace_id: str,
+                 parent_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_OK
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        self.events.append({'name': name, 'time_ns': time.time_ns(), 'attributes': attributes})
+
+    def set_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.attributes['error.type'] = type(error).__name__
+        self.attributes['error.message'] = str(error)[:500]
+
+    def end(self):
+        """Завершает span и передает его на экспорт (повторный вызов ничего не делает)"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self._tracer._export(self)
+
+    @property
+    def context(self) -> Dict[str, str]:
+        """Контекст для продолжения trace в другом месте (сохраняется в новости)"""
+        return {'trace_id': self.trace_id, 'span_id': self.span_id}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': datetime.fromtimestamp(self.start_ns / 1e9).isoformat(),
+            'duration_ms': round(((self.end_ns or time.time_ns()) - self.start_ns) / 1e6, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+            'events': [
+                {
+                    'name': event['name'],
+                    'offset_ms': round((event['time_ns'] - self.start_ns) / 1e6, 3),
+                    'attributes': event['attributes']
+                }
+                for event in self.events
+            ]
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('newsmaker_current_span', default=None)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def span_to_otlp(span: Span) -> Dict[str, Any]:
+    """
+    Представление span в формате OTLP JSON
+
+    Args:
+        span: Завершенный span
+
+    Returns:
+        Dict: Элемент scopeSpans[].spans[]
+    """
+    otlp_span = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': 1,  # SPAN_KIND_INTERNAL
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.end_ns or time.time_ns()),
+        'attributes': _otlp_attributes(span.attributes),
+        'events': [
+            {
+                'timeUnixNano': str(event['time_ns']),
+                'name': event['name'],
+                'attributes': _otlp_attributes(event['attributes'])
+            }
+            for event in span.events
+        ],
+        'status': {'code': 2 if span.status == STATUS_ERROR else 1}
+    }
+    if span.parent_id:
+        otlp_span['parentSpanId'] = span.parent_id
+    return otlp_span
+
+
+class Tracer:
+    """Создание span'ов и экспорт завершенных"""
+
+    def __init__(self, traces_dir: Path = TRACES_DIR):
+        self.traces_dir = traces_dir
+        self.enabled = True
+        self.otlp_endpoint: Optional[str] = None
+        self._file_lock = threading.Lock()
+        self._otlp_queue: Optional[queue.Queue] = None
+        self._otlp_thread: Optional[threading.Thread] = None
+
+    def configure(self, web_config: Optional[Dict] = None):
+        """
+        Применяет настройки из раздела tracing веб-конфигурации
+
+        Args:
+            web_config: Конфигурация из веб-интерфейса
+        """
+        tracing_config = web_config.get('tracing', {}) if web_config else {}
+        self.enabled = tracing_config.get('enabled', True)
+
+        endpoint = tracing_config.get('otlp_endpoint')
+        if endpoint and requests is None:
+            logger.warning("⚠️ tracing.otlp_endpoint задан, но requests не установлен - отправка отключена")
+            endpoint = None
+        if endpoint and endpoint != self.otlp_endpoint:
+            self.otlp_endpoint = endpoint
+            self._start_otlp_worker()
+
+    # ------------------------------------------------------------------
+    # Создание span'ов
+    # ------------------------------------------------------------------
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   parent: Optional[Span] = None, context: Optional[Dict[str, str]] = None) -> Span:
+        """
+        Создает span, не делая его текущим (завершается вызовом end())
+
+        Args:
+            name: Название операции
+            attributes: Атрибуты (модель, размер, приоритет...)
+            parent: Родительский span (по умолчанию текущий)
+            context: Сохраненный контекст {'trace_id', 'span_id'} для продолжения trace
+
+        Returns:
+            Span
+        """
+        if context and context.get('trace_id'):
+            return Span(self, name, context['trace_id'], context.get('span_id'), attributes)
+
+        parent = parent or _current_span.get()
+        if parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, attributes)
+        return Span(self, name, secrets.token_hex(16), None, attributes)
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        """Делает span текущим внутри блока (не завершая его)"""
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+             parent: Optional[Span] = None, context: Optional[Dict[str, str]] = None) -> Iterator[Span]:
+        """
+        Span на время блока: текущий внутри блока, завершается на выходе
+
+        Исключение из блока отмечает span как ошибочный и пробрасывается дальше.
+        """
+        span = self.start_span(name, attributes, parent, context)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    # ------------------------------------------------------------------
+    # Экспорт
+    # ------------------------------------------------------------------
+
+    def trace_file(self, date: Optional[datetime] = None) -> Path:
+        return self.traces_dir / f"{TRACE_FILE_PREFIX}{(date or datetime.now()).strftime('%Y-%m-%d')}.jsonl"
+
+    def _export(self, span: Span):
+        if not self.enabled:
+            return
+
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n'
+        try:
+            with self._file_lock:
+                ensure_directory(self.traces_dir)
+                with open(self.trace_file(), 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            logger.debug(f"Ошибка записи trace: {e}")
+
+        if self._otlp_queue is not None:
+            try:
+                self._otlp_queue.put_nowait(span)
+            except queue.Full:
+                pass
+
+    def _start_otlp_worker(self):
+        if self._otlp_thread is not None and self._otlp_thread.is_alive():
+            return
+        self._otlp_queue = queue.Queue(maxsize=OTLP_QUEUE_SIZE)
+        self._otlp_thread = threading.Thread(target=self._otlp_loop, name="otlp-exporter", daemon=True)
+        self._otlp_thread.start()
+        logger.info(f"🔭 Trace'ы отправляются в {self.otlp_endpoint}")
+
+    def _otlp_loop(self):
+        while True:
+            batch = [self._otlp_queue.get()]
+            deadline = time.monotonic() + OTLP_FLUSH_INTERVAL
+            while len(batch) < OTLP_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._otlp_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._send_otlp(batch)
+
+    def _send_otlp(self, batch: List[Span]):
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': _otlp_attributes({'service.name': SERVICE_NAME})},
+                'scopeSpans': [{
+                    'scope': {'name': SERVICE_NAME},
+                    'spans': [span_to_otlp(span) for span in batch]
+                }]
+            }]
+        }
+        try:
+            response = requests.post(self.otlp_endpoint, json=payload, timeout=OTLP_TIMEOUT)
+            if response.status_code >= 400:
+                logger.debug(f"OTLP коллектор ответил {response.status_code}: {response.text[:200]}")
+        except Exception as e:
+            logger.debug(f"Ошибка отправки trace'ов в OTLP коллектор: {e}")
+
+
+# Глобальный трассировщик
+tracer = Tracer()
+
+
+def current_span() -> Optional[Span]:
+    """Текущий span (None вне трассировки)"""
+    return _current_span.get()
+
+
+def set_attribute(key: str, value: Any):
+    """Устанавливает атрибут текущего span, если он есть"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def add_event(name: str, **attributes):
+    """Добавляет событие в текущий span, если он есть"""
+    span = _current_span.get()
+    if span is not None:
+        span.add_event(name, **attributes)
+
+
+def configure_tracing(web_config: Optional[Dict] = None):
+    """Применяет настройки трассировки (раздел tracing в config_web.json)"""
+    tracer.configure(web_config)
+
+
+def cleanup_old_traces(cutoff_date: datetime, traces_dir: Path = TRACES_DIR):
+    """
+    Удаляет файлы trace'ов старше указанной даты
+
+    Args:
+        cutoff_date: Граничная дата
+        traces_dir: Папка с trace'ами
+    """
+    for file_path in Path(traces_dir).glob(f"{TRACE_FILE_PREFIX}*.jsonl"):
+        try:
+            file_date = datetime.strptime(file_path.stem[len(TRACE_FILE_PREFIX):], '%Y-%m-%d').date()
+            if file_date < cutoff_date.date():
+                file_path.unlink()
+                logger.info(f"Удален старый файл trace'ов: {file_path.name}")
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ошибка при обработке файла {file_path}: {e}")
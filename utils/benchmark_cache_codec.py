@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Сравнивает формат записей файлового кеша: прежний (JSON с отступами /
+pickle) и cache_codec - время записи, чтения и размер на диске.
+
+Запуск из корня проекта: python utils/benchmark_cache_codec.py [--rounds N]
+"""
+
+import argparse
+import json
+import os
+import pickle
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cache_codec
+from file_utils import atomic_write, safe_json_read, safe_json_write
+
+
+def make_samples():
+    """Типичные значения кеша: ответ Deep Research, список новостей, изображение"""
+    rnd = random.Random(42)
+    words = ["закон", "постановление", "суд", "налог", "штраф", "Минфин", "ВС РФ",
+             "изменения", "вступает", "силу", "гражданин", "работодатель", "КоАП"]
+
+    raw_answer = ' '.join(rnd.choice(words) for _ in range(5000))
+    news = [
+        {
+            'id': f"news_{i}",
+            'title': ' '.join(rnd.choice(words) for _ in range(8)),
+            'content': ' '.join(rnd.choice(words) for _ in range(300)),
+            'source': f"https://publication.pravo.gov.ru/document/{rnd.randint(10**9, 10**10)}",
+            'priority': rnd.randint(1, 7),
+            'published': False
+        }
+        for i in range(7)
+    ]
+    api_response = {'choices': [{'message': {'content': raw_answer}}], 'citations': [n['source'] for n in news]}
+    image = rnd.randbytes(1536 * 1024)  # Уже сжатые данные PNG/WebP почти не сжимаются
+
+    return {
+        'deep_research_text': raw_answer,
+        'api_response': api_response,
+        'news_list': news,
+        'image_bytes': image
+    }
+
+
+def legacy_write(path: Path, value):
+    """Прежний формат: JSON с отступами через safe_json_write или pickle"""
+    if isinstance(value, (dict, list, str, int, float, bool, type(None))):
+        path = path.with_suffix('.json')
+        safe_json_write(path, value)
+    else:
+        path = path.with_suffix('.cache')
+        with atomic_write(path, 'wb', encoding=None) as f:
+            f.write(pickle.dumps(value))
+    return path
+
+
+def legacy_read(path: Path):
+    if path.suffix == '.json':
+        return safe_json_read(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def codec_write(path: Path, value):
+    path = path.with_suffix('.bin')
+    with atomic_write(path, 'wb', encoding=None) as f:
+        f.write(cache_codec.encode(value))
+    return path
+
+
+def measure(write, read, directory: Path, value, rounds: int):
+    """Возвращает медианы записи/чтения в мс и размер файла"""
+    write_times, read_times = [], []
+    path = None
+    for i in range(rounds):
+        start = time.perf_counter()
+        path = write(directory / f"entry_{i}", value)
+        write_times.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        restored = read(path)
+        read_times.append((time.perf_counter() - start) * 1000)
+
+        if restored != value:
+            raise AssertionError(f"Значение не восстановилось: {path.name}")
+
+    return statistics.median(write_times), statistics.median(read_times), os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк кодека файлового кеша")
+    parser.add_argument('--rounds', type=int, default=20, help="Повторов на каждый образец")
+    args = parser.parse_args()
+
+    print("📦 БЕНЧМАРК КОДЕКА ФАЙЛОВОГО КЕША")
+    print("=" * 78)
+    print(f"Библиотеки: {cache_codec.available_codecs()}")
+    print(f"{'образец':<20}{'формат':<10}{'запись, мс':>12}{'чтение, мс':>12}{'размер, КБ':>12}{'× размер':>10}")
+    print("-" * 78)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for name, value in make_samples().items():
+            legacy_dir, codec_dir = tmp / f"legacy_{name}", tmp / f"codec_{name}"
+            legacy_dir.mkdir()
+            codec_dir.mkdir()
+
+            legacy = measure(legacy_write, legacy_read, legacy_dir, value, args.rounds)
+            codec = measure(codec_write, cache_codec.read_file, codec_dir, value, args.rounds)
+
+            for label, (write_ms, read_ms, size) in (('прежний', legacy), ('codec', codec)):
+                ratio = size / legacy[2]
+                print(f"{name:<20}{label:<10}{write_ms:>12.2f}{read_ms:>12.2f}{size / 1024:>12.1f}{ratio:>10.2f}")
+            print("-" * 78)
+
+
+if __name__ == "__main__":
+    main()